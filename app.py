@@ -1,21 +1,798 @@
 # Updated Flask App with AI-Powered Transaction Categorization - COMPLETE
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import (Flask, render_template, request, jsonify, redirect, url_for, g, Response,
+                   stream_with_context, send_file, has_app_context)
 import sqlite3
 import json
 from datetime import datetime, date, timedelta
 import os
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 import calendar
+import click
+import cProfile
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import csv
+import functools
+import hashlib
+import io
+import itertools
+import math
+import queue
 import random
 import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from array import array
+from xml.sax.saxutils import escape as xml_escape
+import zipfile
+import zlib
+
+import numpy as np
+import prometheus_client
+from prometheus_client import multiprocess
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'your-secret-key-change-this-in-production'
+app.config['DATABASE'] = os.environ.get('MY_MONEY_DATABASE', 'database.db')
+app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.environ.get('MY_MONEY_SQLITE_BUSY_TIMEOUT_MS', 5000))
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('MY_MONEY_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['REPORTS_DIR'] = os.environ.get('MY_MONEY_REPORTS_DIR', os.path.join(app.root_path, 'report_artifacts'))
+app.config['REPORT_WORKERS'] = int(os.environ.get('MY_MONEY_REPORT_WORKERS', 2))
+app.config['REPORT_CACHE_SIZE'] = int(os.environ.get('MY_MONEY_REPORT_CACHE_SIZE', 50))
+app.config['METRICS_ENABLED'] = os.environ.get('MY_MONEY_METRICS', '0') == '1'
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('MY_MONEY_PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_SLOW_MS'] = float(os.environ.get('MY_MONEY_PROFILE_SLOW_MS', 500))
+app.config['PROFILE_DIR'] = os.environ.get('MY_MONEY_PROFILE_DIR', os.path.join(app.root_path, 'profiles'))
+# Multi-tenant mode: one SQLite file per tenant under SHARD_DIR (unset = single DATABASE)
+app.config['SHARD_DIR'] = os.environ.get('MY_MONEY_SHARD_DIR')
+app.config['SHARD_CONNECTIONS'] = int(os.environ.get('MY_MONEY_SHARD_CONNECTIONS', 32))
+app.config['TENANT_HEADER'] = os.environ.get('MY_MONEY_TENANT_HEADER', 'X-Tenant-ID')
+app.config['DEFAULT_TENANT'] = os.environ.get('MY_MONEY_DEFAULT_TENANT', 'default')
+# Other tenants' shards are created with `flask create-tenant` unless this is set
+app.config['SHARD_AUTO_CREATE'] = os.environ.get('MY_MONEY_SHARD_AUTO_CREATE', '0') == '1'
+# Opt-in in-memory columnar copy of transactions for analytics (about 25 bytes
+# per row per worker); databases with more rows than the cap use the rollups
+app.config['ANALYTICS_SNAPSHOT'] = os.environ.get('MY_MONEY_ANALYTICS_SNAPSHOT', '0') == '1'
+app.config['ANALYTICS_SNAPSHOT_MAX_ROWS'] = int(os.environ.get('MY_MONEY_ANALYTICS_SNAPSHOT_MAX_ROWS', 1000000))
+# Opt-in group commit: single-row POSTs are written by one thread per database,
+# many requests per transaction
+app.config['GROUP_COMMIT'] = os.environ.get('MY_MONEY_GROUP_COMMIT', '0') == '1'
+app.config['GROUP_COMMIT_DELAY_MS'] = float(os.environ.get('MY_MONEY_GROUP_COMMIT_DELAY_MS', 2))
+app.config['GROUP_COMMIT_MAX_BATCH'] = int(os.environ.get('MY_MONEY_GROUP_COMMIT_MAX_BATCH', 256))
+# Seconds a request waits for the writer to start on its write before giving up
+app.config['GROUP_COMMIT_TIMEOUT'] = float(os.environ.get('MY_MONEY_GROUP_COMMIT_TIMEOUT', 30))
+
+# Instrumentation (opt-in with MY_MONEY_METRICS=1): route latency, SQL work per
+# request and categorizer time, served on /metrics in Prometheus text format
+metrics_registry = prometheus_client.CollectorRegistry()
+REQUEST_SECONDS = prometheus_client.Histogram(
+    'my_money_request_duration_seconds', 'Time to build a response', ['method', 'endpoint'],
+    registry=metrics_registry
+)
+REQUESTS = prometheus_client.Counter(
+    'my_money_requests', 'Responses sent', ['method', 'endpoint', 'status'], registry=metrics_registry
+)
+SQL_QUERIES_PER_REQUEST = prometheus_client.Histogram(
+    'my_money_sql_queries_per_request', 'SQL statements executed per request', ['endpoint'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 1000), registry=metrics_registry
+)
+SQL_SECONDS_PER_REQUEST = prometheus_client.Histogram(
+    'my_money_sql_seconds_per_request', 'Time spent executing SQL per request', ['endpoint'],
+    registry=metrics_registry
+)
+SQL_STATEMENT_SECONDS = prometheus_client.Histogram(
+    'my_money_sql_statement_seconds', 'Time per SQL execute call, by statement kind', ['statement'],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5), registry=metrics_registry
+)
+CATEGORIZE_SECONDS = prometheus_client.Histogram(
+    'my_money_categorize_seconds', 'Time per single categorization, by result source', ['source'],
+    buckets=(0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.025), registry=metrics_registry
+)
+CATEGORIZER_SECONDS = prometheus_client.Counter(
+    'my_money_categorizer_seconds', 'Categorizer time by result source (single and batch calls)', ['source'],
+    registry=metrics_registry
+)
+CATEGORIZATIONS = prometheus_client.Counter(
+    'my_money_categorizations', 'Descriptions categorized, by result source', ['source'], registry=metrics_registry
+)
+SQL_STATEMENT_KINDS = {'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'PRAGMA', 'CREATE'}
+
+# [statement count, seconds] for the request the current thread is serving
+_request_sql = threading.local()
+_profiler_lock = threading.Lock()
+
+def record_sql(sql, seconds):
+    words = sql.split(None, 1)
+    kind = words[0].upper() if words else ''
+    SQL_STATEMENT_SECONDS.labels(kind if kind in SQL_STATEMENT_KINDS else 'OTHER').observe(seconds)
+    totals = getattr(_request_sql, 'totals', None)
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += seconds
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute calls (the statement's first step, not later fetches)"""
+    
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_sql(sql, time.perf_counter() - started)
+    
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_sql(sql, time.perf_counter() - started)
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors, including conn.execute shortcuts, record SQL metrics"""
+    
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def observe_categorization(source, seconds, count=1):
+    CATEGORIZER_SECONDS.labels(source).inc(seconds)
+    CATEGORIZATIONS.labels(source).inc(count)
+    if count == 1:
+        CATEGORIZE_SECONDS.labels(source).observe(seconds)
+
+# Database connection management
+_thread_connections = threading.local()
+
+def connect_db(path=None, check_same_thread=True):
+    """Open a SQLite connection tuned for concurrent readers and a single writer"""
+    busy_timeout_ms = app.config['SQLITE_BUSY_TIMEOUT_MS']
+    conn = sqlite3.connect(path or app.config['DATABASE'], timeout=busy_timeout_ms / 1000,
+                           check_same_thread=check_same_thread,
+                           factory=InstrumentedConnection if app.config['METRICS_ENABLED'] else sqlite3.Connection)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}")
+    conn.execute(f'PRAGMA busy_timeout={int(busy_timeout_ms)}')
+    return conn
+
+def current_db_path():
+    """Database file of the current request: the tenant's shard, or DATABASE"""
+    return (has_app_context() and g.get('db_path')) or app.config['DATABASE']
+
+def get_db():
+    """Return the connection for the current request.
+
+    Connections are opened once per thread and reused by every request that
+    thread serves, so requests skip the connect/PRAGMA setup. Each thread keeps
+    at most SHARD_CONNECTIONS of them open, closing the least recently used.
+    """
+    if 'db' not in g:
+        path = current_db_path()
+        connections = getattr(_thread_connections, 'by_path', None)
+        if connections is None:
+            connections = _thread_connections.by_path = OrderedDict()
+        conn = connections.get(path)
+        if conn is None:
+            conn = connections[path] = connect_db(path)
+            while len(connections) > app.config['SHARD_CONNECTIONS']:
+                connections.popitem(last=False)[1].close()
+        else:
+            connections.move_to_end(path)
+        g.db = conn
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exception):
+    """Hand the connection back, discarding any transaction a failed request left open"""
+    conn = g.pop('db', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+class GroupCommitWriter:
+    """One writer thread that commits many requests' writes in a single transaction.
+
+    Handlers submit a function that does their writes on the writer's
+    connection and block until it has been committed. The writer takes
+    everything already queued, waits up to max_delay seconds for more (at most
+    max_batch items), runs each item under its own savepoint so one failure
+    does not undo the others, commits once, and then hands every caller its
+    result. A request is still answered only after the commit holding its rows.
+
+    A write the thread has not picked up within timeout seconds is withdrawn
+    and raises TimeoutError. close() lets the thread finish what is queued and
+    exit; submitting to a closed writer raises WriterClosed.
+    """
+    
+    class WriterClosed(RuntimeError):
+        pass
+    
+    def __init__(self, path, max_delay=0.002, max_batch=256, timeout=30.0):
+        self.path = path
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+    
+    def submit(self, work, *args):
+        """Run work(conn, *args) in the next batch; returns its result or raises its error"""
+        future = Future()
+        with self.lock:
+            if self.closed:
+                raise self.WriterClosed(self.path)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self.thread.start()
+            self.queue.put((work, args, future))
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise TimeoutError(f'group commit writer for {self.path} did not start the write '
+                                   f'within {self.timeout}s')
+            # Already in a batch: its commit is on the way
+            return future.result()
+    
+    def close(self):
+        """Stop the thread once everything already submitted has been committed"""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if self.thread is not None:
+                self.queue.put(None)
+    
+    def _run(self):
+        conn = None
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                stopping = True
+                batch.pop()
+            # Writes whose callers gave up waiting are dropped; the rest can no longer be withdrawn
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                if conn is None:
+                    conn = connect_db(self.path)
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self._commit(conn, batch)
+        if conn is not None:
+            conn.close()
+    
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for work, args, future in batch:
+                conn.execute('SAVEPOINT group_item')
+                try:
+                    outcomes.append((future, work(conn, *args), None))
+                    conn.execute('RELEASE group_item')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO group_item')
+                    conn.execute('RELEASE group_item')
+                    outcomes.append((future, None, e))
+            conn.commit()
+        except BaseException as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            if not isinstance(e, Exception):
+                raise
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+# Group-commit writers by database path (one per shard)
+group_writers = {}
+group_writers_lock = threading.Lock()
+
+def run_write(work, *args):
+    """Run work(conn, *args) and commit: through the group-commit writer when
+    enabled, else on the request's own connection"""
+    if not app.config['GROUP_COMMIT']:
+        conn = get_db()
+        result = work(conn, *args)
+        conn.commit()
+        return result
+    path = current_db_path()
+    while True:
+        writer = group_writers.get(path)
+        if writer is None:
+            with group_writers_lock:
+                writer = group_writers.setdefault(path, GroupCommitWriter(
+                    path, app.config['GROUP_COMMIT_DELAY_MS'] / 1000,
+                    app.config['GROUP_COMMIT_MAX_BATCH'], app.config['GROUP_COMMIT_TIMEOUT']
+                ))
+        try:
+            return writer.submit(work, *args)
+        except GroupCommitWriter.WriterClosed:
+            # Closed by close_group_writer after we looked it up: the next lookup starts a new one
+            continue
+
+def close_group_writer(path):
+    """Stop the group-commit writer of a database (its thread and connection), if any"""
+    with group_writers_lock:
+        writer = group_writers.pop(path, None)
+    if writer is not None:
+        writer.close()
+
+
+# Compiled keyword automaton behind the rule-based categorizer
+class CategoryRuleEngine:
+    """Aho-Corasick automaton compiled once from the category patterns.
+
+    Every pattern is an alternation of plain keywords, so a single scan of the
+    description finds all matching patterns, and a token -> pattern map gives
+    the exact-word boost without re-splitting anything per call.
+    """
+
+    def __init__(self, category_patterns):
+        self.categories = list(category_patterns)
+        self.pattern_categories = []
+        keyword_patterns = defaultdict(set)
+
+        for category_index, patterns in enumerate(category_patterns.values()):
+            for pattern in patterns:
+                pattern_index = len(self.pattern_categories)
+                self.pattern_categories.append(category_index)
+                for keyword in pattern.split('|'):
+                    if not keyword or re.search(r'[.^$*+?{}\[\]\\()]', keyword):
+                        raise ValueError(f"Unsupported keyword in category pattern: {keyword!r}")
+                    keyword_patterns[keyword].add(pattern_index)
+
+        self.token_patterns = {
+            keyword: frozenset(indexes) for keyword, indexes in keyword_patterns.items()
+        }
+        self._build_automaton(keyword_patterns)
+
+        # Identifies this rule set in cached categorization results
+        self.version = hashlib.sha1(
+            json.dumps(category_patterns, sort_keys=True).encode('utf-8')
+        ).hexdigest()[:12]
+
+        # Pattern -> category membership, used to score whole batches at once
+        self.membership = np.zeros((len(self.pattern_categories), len(self.categories)), dtype=np.int32)
+        self.membership[np.arange(len(self.pattern_categories)), self.pattern_categories] = 1
+
+    def _build_automaton(self, keyword_patterns):
+        """Build the trie, failure links and a fully resolved transition table"""
+        goto = [{}]
+        outputs = [set()]
+        for keyword, indexes in keyword_patterns.items():
+            state = 0
+            for ch in keyword:
+                next_state = goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][ch] = next_state
+                    goto.append({})
+                    outputs.append(set())
+                state = next_state
+            outputs[state] |= indexes
+
+        # Breadth-first pass: failure links, inherited outputs, resolved transitions
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        delta[0] = dict(goto[0])
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = {**delta[fail[state]], **goto[state]}
+            for ch, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(ch, 0)
+                outputs[child] |= outputs[fail[child]]
+                queue.append(child)
+
+        self._delta = delta
+        self._outputs = [frozenset(out) if out else None for out in outputs]
+
+    def matched_patterns(self, text):
+        """Return indexes of every pattern with a keyword occurring in text"""
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        hits = set()
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            out = outputs[state]
+            if out:
+                hits |= out
+        return hits
+
+    def pattern_weights(self, text):
+        """Map each matching pattern to its weight for a lower-cased description.
+
+        A pattern weighs 2 when one of its keywords is a whole word of the
+        description and 1 when a keyword only occurs inside a longer word.
+        """
+        hits = self.matched_patterns(text)
+        if not hits:
+            return {}
+
+        exact = set()
+        token_patterns = self.token_patterns
+        for token in text.split():
+            indexes = token_patterns.get(token)
+            if indexes:
+                exact |= indexes
+
+        return {pattern_index: 2 if pattern_index in exact else 1 for pattern_index in hits}
+
+    def score(self, text):
+        """Score categories for a lower-cased description, in declared category order"""
+        scores = [0] * len(self.categories)
+        pattern_categories = self.pattern_categories
+        for pattern_index, weight in self.pattern_weights(text).items():
+            scores[pattern_categories[pattern_index]] += weight
+
+        return {
+            self.categories[index]: score for index, score in enumerate(scores) if score
+        }
+
+    def score_matrix(self, texts):
+        """Score many lower-cased descriptions as one (texts x categories) matrix"""
+        weights = np.zeros((len(texts), len(self.pattern_categories)), dtype=np.int32)
+        for row, text in enumerate(texts):
+            for pattern_index, weight in self.pattern_weights(text).items():
+                weights[row, pattern_index] = weight
+        return weights @ self.membership
+
+# Learned categorization corrections, stored append-only in the app database
+USER_CORRECTIONS_TABLE_SQL = '''
+        CREATE TABLE IF NOT EXISTS user_corrections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT NOT NULL,
+            keywords TEXT NOT NULL,
+            category TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    '''
+
+# Per-user learned corrections, indexed by keyword
+class LearnedRuleStore:
+    """Inverted index of keyword -> category built from user corrections.
+
+    Each correction becomes a rule of up to three keywords. Lookup tokenizes
+    the description and checks each token against the user's index, so its
+    cost depends on the description length, not on how many corrections the
+    user has made. When several rules match, the most recent correction wins.
+    """
+
+    token_pattern = re.compile(r'\w+')
+
+    def __init__(self):
+        self._rules = defaultdict(dict)  # user_id -> {keywords: category}, oldest first
+        self._index = defaultdict(dict)  # user_id -> {keyword: (sequence, category)}
+        self._versions = {}  # user_id -> sequence of the user's latest rule
+        self._sequence = 0
+
+    @classmethod
+    def keywords_for(cls, description):
+        """Extract the first 3 distinct significant words of a description"""
+        keywords = []
+        for token in cls.token_pattern.findall(description.lower()):
+            if len(token) > 3 and token not in keywords:
+                keywords.append(token)
+                if len(keywords) == 3:
+                    break
+        return tuple(keywords)
+
+    def add(self, user_id, keywords, category, sequence=None):
+        """Record a rule; returns False when there is nothing to index.
+
+        sequence orders rules for precedence (the stored row id when rules come
+        from the database); by default the rule is newer than everything seen.
+        """
+        keywords = tuple(keywords)
+        if not keywords:
+            return False
+
+        rules = self._rules[user_id]
+        rules.pop(keywords, None)
+        rules[keywords] = category
+
+        if sequence is None:
+            sequence = self._sequence + 1
+        self._sequence = max(self._sequence, sequence)
+        self._versions[user_id] = max(self._versions.get(user_id, 0), sequence)
+        index = self._index[user_id]
+        for keyword in keywords:
+            index[keyword] = (sequence, category)
+        return True
+
+    def lookup(self, user_id, description_lower):
+        """Return the category of the most recent rule matching a description"""
+        index = self._index.get(user_id)
+        if not index:
+            return None
+
+        best = None
+        for token in self.token_pattern.findall(description_lower):
+            hit = index.get(token)
+            if hit is not None and (best is None or hit[0] > best[0]):
+                best = hit
+        return best[1] if best else None
+
+    def rule_count(self, user_id):
+        return len(self._rules.get(user_id, ()))
+
+    def version(self, user_id):
+        """Changes whenever the user learns a new correction"""
+        return self._versions.get(user_id, 0)
+
+    @classmethod
+    def keywords_from_pattern(cls, pattern):
+        """Split a stored 'kw1|kw2|kw3' pattern (or a legacy raw regex) into keywords"""
+        keywords = []
+        for part in pattern.split('|'):
+            for token in cls.token_pattern.findall(part.lower()):
+                if token not in keywords:
+                    keywords.append(token)
+        return tuple(keywords)
 
 # AI Transaction Categorizer Class
+class CategoryModel:
+    """Multinomial Naive Bayes over description tokens, trained from stored transactions.
+
+    A model is never modified once it has been handed out: trained() builds a
+    new one and updated() returns a copy with more documents counted (a
+    negative weight removes one). The categorizer publishes a model with one
+    reference assignment, so a prediction on another thread always reads one
+    consistent set of arrays. Confidences are softmax(log-joint / temperature),
+    with the temperature fitted on a held-out tenth of the training data so
+    that a 0.8 means right about 80% of the time.
+
+    Only a calibrated model (trained on at least min_calibration_rows
+    descriptions) predicts, and only when its top category is at least halfway
+    from uniform to certain: (1 + 1/K) / 2 for K categories, which also puts it
+    at least 1/K ahead of the runner-up.
+    """
+    token_pattern = re.compile(r'[^\W\d_]{2,}')
+    # Fewer labelled descriptions than this and the model stays uncalibrated and silent
+    min_calibration_rows = 200
+    # Every new model takes the next version; updated() copies keep their
+    # trained model's generation, so incremental updates don't invalidate caches
+    _versions = itertools.count(1)
+
+    def __init__(self, alpha=1.0):
+        self.alpha = alpha
+        self.tokens = {}
+        self.categories = []
+        self.category_ids = {}
+        self.counts = np.zeros((0, 0))
+        self.category_tokens = np.zeros(0)
+        self.category_documents = np.zeros(0)
+        self.documents = 0.0
+        self.temperature = 1.0
+        self.calibrated = False
+        self._log_tables = None
+        self.version = next(self._versions)
+        self.generation = self.version
+
+    @classmethod
+    def tokenize(cls, text_lower):
+        return cls.token_pattern.findall(text_lower)
+
+    def updated(self, documents):
+        """Return a new model with (tokens, category, weight) documents added"""
+        model = CategoryModel(self.alpha)
+        model.tokens = dict(self.tokens)
+        model.categories = list(self.categories)
+        model.category_ids = dict(self.category_ids)
+        # Shared until _add_many, which builds new arrays instead of writing into these
+        model.counts = self.counts
+        model.category_tokens = self.category_tokens
+        model.category_documents = self.category_documents
+        model.documents = self.documents
+        model.temperature = self.temperature
+        model.calibrated = self.calibrated
+        model.generation = self.generation
+        model._add_many(documents)
+        return model
+
+    def _add_many(self, documents):
+        """Count documents into freshly allocated arrays, with one bincount per batch"""
+        token_ids, category_ids, weights = [], [], []
+        document_weights = defaultdict(float)
+        for tokens, category, weight in documents:
+            if not tokens:
+                continue
+            category_id = self.category_ids.get(category)
+            if category_id is None:
+                category_id = self.category_ids[category] = len(self.categories)
+                self.categories.append(category)
+            for token in tokens:
+                token_id = self.tokens.get(token)
+                if token_id is None:
+                    token_id = self.tokens[token] = len(self.tokens)
+                token_ids.append(token_id)
+            category_ids.extend([category_id] * len(tokens))
+            weights.extend([weight] * len(tokens))
+            document_weights[category_id] += weight
+        if not token_ids:
+            return
+        vocabulary, category_count = len(self.tokens), len(self.categories)
+        category_ids = np.array(category_ids, dtype=np.int64)
+        weights = np.array(weights)
+        flat = np.array(token_ids, dtype=np.int64) * category_count + category_ids
+        counts = np.bincount(flat, weights=weights, minlength=vocabulary * category_count)
+        counts = counts.reshape(vocabulary, category_count)
+        counts[:self.counts.shape[0], :self.counts.shape[1]] += self.counts
+        category_tokens = np.bincount(category_ids, weights=weights, minlength=category_count)
+        category_tokens[:len(self.category_tokens)] += self.category_tokens
+        category_documents = np.zeros(category_count)
+        category_documents[:len(self.category_documents)] = self.category_documents
+        for category_id, weight in document_weights.items():
+            category_documents[category_id] += weight
+        self.counts, self.category_tokens, self.category_documents = counts, category_tokens, category_documents
+        self.documents += sum(document_weights.values())
+        self._log_tables = None
+
+    def log_tables(self):
+        """(log prior per category, log likelihood per token and category), built once per model"""
+        tables = self._log_tables
+        if tables is None:
+            category_count = len(self.categories)
+            log_prior = (np.log(self.category_documents + self.alpha)
+                         - np.log(self.documents + self.alpha * category_count))
+            log_likelihood = (np.log(self.counts + self.alpha)
+                              - np.log(self.category_tokens + self.alpha * len(self.tokens)))
+            tables = self._log_tables = (log_prior, log_likelihood)
+        return tables
+
+    def log_joint(self, token_id_lists):
+        """Unnormalized log P(category, tokens) for each non-empty list of known token ids"""
+        log_prior, log_likelihood = self.log_tables()
+        flat = np.fromiter(itertools.chain.from_iterable(token_id_lists), dtype=np.int64)
+        lengths = np.array([len(ids) for ids in token_id_lists])
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        return log_prior + np.add.reduceat(log_likelihood[flat], offsets, axis=0)
+
+    def probabilities(self, log_joint):
+        scaled = log_joint / self.temperature
+        scaled -= scaled.max(axis=1, keepdims=True)
+        probabilities = np.exp(scaled)
+        return probabilities / probabilities.sum(axis=1, keepdims=True)
+
+    def predict_many(self, texts_lower):
+        """Return (category, confidence, alternatives) per text, or None where the
+        model has no signal (uncalibrated, no known words, or too small a margin)"""
+        predictions = [None] * len(texts_lower)
+        if not self.calibrated:
+            return predictions
+        known = []
+        for index, text in enumerate(texts_lower):
+            ids = [self.tokens[token] for token in self.tokenize(text) if token in self.tokens]
+            if ids:
+                known.append((index, ids))
+        if not known:
+            return predictions
+        probabilities = self.probabilities(self.log_joint([ids for _, ids in known]))
+        ranked = np.argsort(-probabilities, axis=1, kind='stable')[:, :3]
+        min_confidence = (1 + 1 / len(self.categories)) / 2
+        for row, (index, _) in enumerate(known):
+            confidence = float(probabilities[row, ranked[row, 0]])
+            if confidence >= min_confidence:
+                predictions[index] = (self.categories[ranked[row, 0]], round(confidence, 4),
+                                      [self.categories[column] for column in ranked[row]])
+        return predictions
+
+    def predict(self, text_lower):
+        """predict_many for a single text, without the batch bookkeeping"""
+        if not self.calibrated:
+            return None
+        tokens = self.tokens
+        ids = [tokens[token] for token in self.tokenize(text_lower) if token in tokens]
+        if not ids:
+            return None
+        log_prior, log_likelihood = self.log_tables()
+        scaled = (log_prior + log_likelihood[ids].sum(axis=0)) / self.temperature
+        scaled -= scaled.max()
+        probabilities = np.exp(scaled)
+        probabilities /= probabilities.sum()
+        ranked = np.argsort(-probabilities, kind='stable')[:3]
+        confidence = float(probabilities[ranked[0]])
+        if confidence < (1 + 1 / len(self.categories)) / 2:
+            return None
+        return (self.categories[ranked[0]], round(confidence, 4), [self.categories[column] for column in ranked])
+
+    @classmethod
+    def trained(cls, rows, corrections=(), correction_weight=3.0):
+        """Build a model from (description, category, count) rows and (keywords, category) corrections.
+
+        A tenth of the distinct descriptions (chosen by hash, so it is stable)
+        is held out to fit the temperature, then added to the counts as well.
+        Returns (model, summary statistics including the held-out accuracy).
+        """
+        model = cls()
+        train_documents, held_out = [], []
+        for description, category, count in rows:
+            tokens = model.tokenize(description.lower())
+            if not tokens:
+                continue
+            document = (tokens, category, float(count))
+            if zlib.crc32(description.lower().encode('utf-8')) % 10 == 0:
+                held_out.append(document)
+            else:
+                train_documents.append(document)
+        model._add_many(train_documents)
+
+        accuracy = None
+        if len(held_out) >= model.min_calibration_rows // 10 and len(train_documents) >= model.min_calibration_rows:
+            accuracy = model._calibrate(held_out)
+        model._add_many(held_out)
+        model._add_many((keywords, category, correction_weight) for keywords, category in corrections)
+        return model, {
+            'documents': int(model.documents),
+            'tokens': len(model.tokens),
+            'categories': len(model.categories),
+            'temperature': round(model.temperature, 4),
+            'held_out_accuracy': accuracy
+        }
+
+    def _calibrate(self, held_out):
+        """Fit the softmax temperature minimizing held-out log loss; returns held-out accuracy"""
+        samples = []
+        for tokens, category, weight in held_out:
+            ids = [self.tokens[token] for token in tokens if token in self.tokens]
+            if ids and category in self.category_ids:
+                samples.append((ids, self.category_ids[category], weight))
+        if not samples:
+            return None
+        log_joint = self.log_joint([ids for ids, _, _ in samples])
+        labels = np.array([label for _, label, _ in samples])
+        weights = np.array([weight for _, _, weight in samples])
+        rows = np.arange(len(samples))
+
+        def log_loss(log_temperature):
+            scaled = log_joint / np.exp(log_temperature)
+            scaled -= scaled.max(axis=1, keepdims=True)
+            log_probabilities = scaled[rows, labels] - np.log(np.exp(scaled).sum(axis=1))
+            return -(weights * log_probabilities).sum()
+
+        # Golden-section search over log(temperature) in [log 0.05, log 100]
+        low, high = np.log(0.05), np.log(100.0)
+        ratio = (np.sqrt(5) - 1) / 2
+        for _ in range(40):
+            left, right = high - ratio * (high - low), low + ratio * (high - low)
+            if log_loss(left) < log_loss(right):
+                high = right
+            else:
+                low = left
+        self.temperature = float(np.exp((low + high) / 2))
+        self.calibrated = True
+        correct = log_joint.argmax(axis=1) == labels
+        return round(float((weights * correct).sum() / weights.sum()), 4)
+
 class TransactionCategorizer:
-    def __init__(self):
+    def __init__(self, db_path=None, legacy_learning_path='user_learning.json',
+                 learning_refresh_interval=1.0, rule_engine=None):
         # Rule-based categorization patterns
         self.category_patterns = {
             'Food & Dining': [
@@ -67,54 +844,180 @@ class TransactionCategorizer:
                 r'massage|therapy|wellness|selfcare'
             ]
         }
-        # Load user learning data
-        self.user_corrections = defaultdict(dict)
-        self.load_user_learning()
+        # Compile the rule tables once; every categorization reuses them
+        self.rule_engine = rule_engine or CategoryRuleEngine(self.category_patterns)
+
+        # User learning data, loaded from the database on first use (None: DATABASE)
+        self.db_path = db_path
+        self.legacy_learning_path = legacy_learning_path
+        self.learned_rules = LearnedRuleStore()
+        self._learning_lock = threading.Lock()
+        self._learning_conn = None
+        self._learning_loaded = False
+        self._learning_data_version = None
+        self._learning_checked_at = 0.0
+        self.learning_refresh_interval = learning_refresh_interval
+        self._last_correction_id = 0
+        # Called with (source, seconds, count) after each categorization when metrics are on
+        self.observer = None
+        # Statistical model over stored transactions, silent until trained;
+        # _model_transaction_id None marks "not trained yet"
+        self.model = CategoryModel()
+        self.model_correction_weight = 3.0
+        self._model_transaction_id = None
+        self._model_log_id = 0
+        self._model_correction_id = 0
+        self._model_trained_documents = 0.0
+        # One model thread at a time trains or syncs; a sync asked for while it
+        # runs is done by that thread before it exits
+        self._training_lock = threading.Lock()
+        self._training_thread = None
+        self._model_sync_requested = False
 
     def categorize_transaction(self, description, amount=None, user_id=None):
         """Auto-categorize a transaction based on description and learned patterns"""
+        if self.observer is None:
+            return self._categorize(description, amount, user_id)
+        started = time.perf_counter()
+        result = self._categorize(description, amount, user_id)
+        self.observer(result['source'], time.perf_counter() - started)
+        return result
+
+    def _categorize(self, description, amount, user_id):
         description_lower = description.lower()
+        self.refresh_user_learning()
         
         # First, check user-specific learned patterns
-        if user_id and user_id in self.user_corrections:
-            user_patterns = self.user_corrections[user_id]
-            for pattern, category in user_patterns.items():
-                if re.search(pattern, description_lower):
-                    return {
-                        'suggested_category': category,
-                        'confidence': 0.95,
-                        'source': 'user_learned'
-                    }
-        
-        # Rule-based categorization
-        category_scores = {}
-        for category, patterns in self.category_patterns.items():
-            score = 0
-            matches = 0
-            for pattern in patterns:
-                if re.search(pattern, description_lower):
-                    matches += 1
-                    # Boost score for exact matches
-                    if any(word in description_lower.split() for word in pattern.split('|')):
-                        score += 2
-                    else:
-                        score += 1
-            
-            if matches > 0:
-                category_scores[category] = score
+        learned_category = self._learned_category(description_lower, user_id)
+        if learned_category is not None:
+            return self._learned_result(learned_category)
+        
+        # Rule-based categorization (single pass over the compiled automaton)
+        category_scores = self.rule_engine.score(description_lower)
+        # Stable sort: among equal scores the first declared category stays first
+        ranked = sorted(category_scores.items(), key=lambda x: x[1], reverse=True)
+        
+        # The model trained on stored transactions only speaks where the rules
+        # have no match or a tie between their top two categories
+        if not ranked or (len(ranked) > 1 and ranked[0][1] == ranked[1][1]):
+            prediction = self.model.predict(description_lower)
+            if prediction is not None:
+                return self._model_result(*prediction)
         
         # Determine best category
-        if category_scores:
-            best_category = max(category_scores.items(), key=lambda x: x[1])
-            confidence = min(0.9, best_category[1] * 0.15)  # Scale confidence
-            return {
-                'suggested_category': best_category[0],
-                'confidence': confidence,
-                'source': 'rule_based',
-                'alternatives': [cat for cat, score in sorted(category_scores.items(), key=lambda x: x[1], reverse=True)[:3]]
-            }
+        if ranked:
+            alternatives = [cat for cat, score in ranked[:3]]
+            return self._rule_based_result(ranked[0][0], ranked[0][1], alternatives)
         
-        # Default category for unknown transactions
+        return self._default_result(description_lower, amount)
+
+    def categorize_many(self, descriptions, amounts=None, user_id=None):
+        """Categorize a batch of descriptions; same results as categorize_transaction per row.
+
+        Identical descriptions are scored once, and rule scores for the whole
+        batch come from a single pattern-weight x category-membership product.
+        """
+        if self.observer is None or not descriptions:
+            return self._categorize_batch(descriptions, amounts, user_id)
+        started = time.perf_counter()
+        results = self._categorize_batch(descriptions, amounts, user_id)
+        elapsed = time.perf_counter() - started
+        # Batch time is shared out by how many rows each source resolved
+        counts = defaultdict(int)
+        for result in results:
+            counts[result['source']] += 1
+        for source, count in counts.items():
+            self.observer(source, elapsed * count / len(results), count)
+        return results
+
+    def _categorize_batch(self, descriptions, amounts, user_id):
+        if amounts is None:
+            amounts = [None] * len(descriptions)
+        self.refresh_user_learning()
+        lowered = [description.lower() for description in descriptions]
+
+        # Resolve learned patterns; the rest go through the rules, then the model where they are unsure
+        learned = {}
+        unresolved = {}
+        for description_lower in lowered:
+            if description_lower in learned or description_lower in unresolved:
+                continue
+            learned_category = self._learned_category(description_lower, user_id)
+            if learned_category is not None:
+                learned[description_lower] = learned_category
+            else:
+                unresolved[description_lower] = None
+
+        unique_texts = list(unresolved)
+        scores = self.rule_engine.score_matrix(unique_texts)
+        best_indexes = scores.argmax(axis=1)
+        best_scores = scores.max(axis=1)
+        # Stable sort keeps declared category order among equal scores
+        ranked = np.argsort(-scores, axis=1, kind='stable')[:, :3]
+
+        # Same rule as the single path: the model only for no match or a tie
+        second_scores = scores[np.arange(len(unique_texts)), ranked[:, 1]]
+        unsure = [text for row, text in enumerate(unique_texts)
+                  if best_scores[row] == 0 or best_scores[row] == second_scores[row]]
+        model_results = {}
+        for text, prediction in zip(unsure, self.model.predict_many(unsure)):
+            if prediction is not None:
+                model_results[text] = self._model_result(*prediction)
+
+        categories = self.rule_engine.categories
+        rule_results = {}
+        for row, text in enumerate(unique_texts):
+            if best_scores[row] > 0 and text not in model_results:
+                alternatives = [categories[index] for index in ranked[row] if scores[row, index] > 0]
+                rule_results[text] = self._rule_based_result(
+                    categories[best_indexes[row]], int(best_scores[row]), alternatives
+                )
+
+        results = []
+        for description_lower, amount in zip(lowered, amounts):
+            if description_lower in learned:
+                results.append(self._learned_result(learned[description_lower]))
+            elif description_lower in model_results:
+                result = model_results[description_lower]
+                results.append(dict(result, alternatives=list(result['alternatives'])))
+            elif description_lower in rule_results:
+                result = rule_results[description_lower]
+                results.append(dict(result, alternatives=list(result['alternatives'])))
+            else:
+                results.append(self._default_result(description_lower, amount))
+        return results
+
+    def _learned_category(self, description_lower, user_id):
+        """Return the user's learned category for a description, if any"""
+        if not user_id:
+            return None
+        return self.learned_rules.lookup(user_id, description_lower)
+
+    def _learned_result(self, category):
+        return {
+            'suggested_category': category,
+            'confidence': 0.95,
+            'source': 'user_learned'
+        }
+
+    def _model_result(self, category, confidence, alternatives):
+        return {
+            'suggested_category': category,
+            'confidence': confidence,
+            'source': 'model',
+            'alternatives': alternatives
+        }
+
+    def _rule_based_result(self, category, score, alternatives):
+        return {
+            'suggested_category': category,
+            'confidence': min(0.9, score * 0.15),  # Scale confidence
+            'source': 'rule_based',
+            'alternatives': alternatives
+        }
+
+    def _default_result(self, description_lower, amount):
+        """Default category for unknown transactions"""
         default_category = 'Other'
         if amount and amount > 0:
             default_category = 'Income' if self._is_likely_income(description_lower) else 'Other'
@@ -132,34 +1035,292 @@ class TransactionCategorizer:
         return any(indicator in description for indicator in income_indicators)
 
     def learn_from_user_correction(self, user_id, description, correct_category):
-        """Learn from user's manual category corrections"""
-        description_lower = description.lower()
-        # Extract key words from description
-        key_words = [word for word in description_lower.split() if len(word) > 3]
-        pattern = '|'.join(key_words[:3])  # Use first 3 significant words
-        
-        if user_id not in self.user_corrections:
-            self.user_corrections[user_id] = {}
+        """Learn from user's manual category corrections.
+
+        Returns False when the description has no significant words to learn.
+        """
+        # Use the first 3 significant words of the description
+        key_words = LearnedRuleStore.keywords_for(description)
+        if not key_words:
+            return False
+        if not self._learning_loaded:
+            self.load_user_learning()
         
-        self.user_corrections[user_id][pattern] = correct_category
-        self.save_user_learning()
+        # One small append per correction; the refresh picks up our row along
+        # with anything other workers wrote since the last sync
+        with self._learning_lock:
+            conn = self._learning_connection()
+            conn.execute(
+                'INSERT INTO user_corrections (user_id, keywords, category) VALUES (?, ?, ?)',
+                (user_id, '|'.join(key_words), correct_category)
+            )
+            conn.commit()
+            self._sync_user_learning(conn)
+        self.sync_model_in_background()
+        return True
 
     def load_user_learning(self):
-        """Load user learning data from file"""
+        """Load learned corrections from the database, migrating a legacy JSON file"""
         try:
-            with open('user_learning.json', 'r') as f:
-                data = json.load(f)
-                self.user_corrections = defaultdict(dict, data)
-        except (FileNotFoundError, json.JSONDecodeError):
-            pass
-
-    def save_user_learning(self):
-        """Save user learning data to file"""
+            with self._learning_lock:
+                conn = self._learning_connection()
+                self._migrate_legacy_learning(conn)
+                self._sync_user_learning(conn)
+                self._learning_loaded = True
+        except sqlite3.Error as e:
+            print(f"Error loading user learning data: {e}")
+
+    def refresh_user_learning(self):
+        """Pick up corrections committed by other workers since the last sync.
+
+        Checked at most once per learning_refresh_interval seconds. PRAGMA
+        data_version only changes when another connection commits, so a check
+        with nothing new costs a single pragma. The first call loads everything.
+        When anything changed, the category model is brought up to date on the
+        model thread; categorization keeps using the current model meanwhile.
+        """
+        if not self._learning_loaded:
+            self.load_user_learning()
+            self.sync_model_in_background()
+            return
+        now = time.monotonic()
+        if now - self._learning_checked_at < self.learning_refresh_interval:
+            return
+        self._learning_checked_at = now
+        changed = False
         try:
-            with open('user_learning.json', 'w') as f:
-                json.dump(dict(self.user_corrections), f, indent=2)
-        except Exception as e:
-            print(f"Error saving user learning data: {e}")
+            with self._learning_lock:
+                conn = self._learning_connection()
+                data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+                if data_version != self._learning_data_version:
+                    self._sync_user_learning(conn)
+                    changed = True
+        except sqlite3.Error as e:
+            print(f"Error refreshing user learning data: {e}")
+        if changed:
+            self.sync_model_in_background()
+
+    def _learning_connection(self):
+        if self._learning_conn is None:
+            conn = connect_db(self.db_path, check_same_thread=False)
+            conn.execute(USER_CORRECTIONS_TABLE_SQL)
+            conn.commit()
+            self._learning_conn = conn
+        return self._learning_conn
+
+    def close_learning_connection(self):
+        """Close the learning connection, e.g. in a server master before it forks.
+
+        Learned rules stay in memory; the next refresh reopens the connection and
+        catches up from the last correction id seen.
+        """
+        with self._learning_lock:
+            if self._learning_conn is not None:
+                self._learning_conn.close()
+                self._learning_conn = None
+            # data_version values are per connection, so force the next check to sync
+            self._learning_data_version = None
+
+    def _sync_user_learning(self, conn):
+        """Apply correction rows newer than the last one seen, in id order"""
+        self._learning_data_version = conn.execute('PRAGMA data_version').fetchone()[0]
+        rows = conn.execute(
+            'SELECT id, user_id, keywords, category FROM user_corrections WHERE id > ? ORDER BY id',
+            (self._last_correction_id,)
+        )
+        for row_id, user_id, keywords, category in rows:
+            keywords = LearnedRuleStore.keywords_from_pattern(keywords)
+            self.learned_rules.add(user_id, keywords, category, sequence=row_id)
+            self._last_correction_id = row_id
+
+    def train_model(self, conn=None):
+        """Train the model on every stored transaction and correction, then swap it in.
+
+        Reads one snapshot (on a connection of its own unless one is given) and
+        builds the model without holding the learning lock, so categorization
+        carries on meanwhile. Later inserts, edits, deletes and corrections are
+        applied incrementally by _sync_category_model, which also prunes the
+        edit log it has applied. Returns the training summary.
+        """
+        own_connection = conn is None
+        if own_connection:
+            conn = connect_db(self.db_path)
+        try:
+            conn.execute('BEGIN')
+            try:
+                transaction_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+                log_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM category_model_log').fetchone()[0]
+                correction_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM user_corrections').fetchone()[0]
+                labelled = defaultdict(int)
+                for description, category in conn.execute(
+                    'SELECT description, category FROM transactions WHERE id <= ?', (transaction_id,)
+                ):
+                    labelled[description, category] += 1
+                corrections = [
+                    (CategoryModel.tokenize(' '.join(LearnedRuleStore.keywords_from_pattern(keywords))), category)
+                    for keywords, category in conn.execute(
+                        'SELECT keywords, category FROM user_corrections WHERE id <= ?', (correction_id,)
+                    )
+                ]
+            finally:
+                conn.rollback()
+        finally:
+            if own_connection:
+                conn.close()
+        
+        model, summary = CategoryModel.trained(
+            ((description, category, count) for (description, category), count in labelled.items()),
+            corrections, self.model_correction_weight
+        )
+        with self._learning_lock:
+            self.model = model
+            self._model_transaction_id = transaction_id
+            self._model_log_id = log_id
+            self._model_correction_id = correction_id
+            self._model_trained_documents = model.documents
+        return summary
+
+    def train_model_in_background(self):
+        """Start train_model on the model thread, unless it is already running"""
+        self._start_model_thread(train=True)
+
+    def sync_model_in_background(self):
+        """Run _sync_category_model on the model thread (once more if it is busy)"""
+        self._start_model_thread(train=False)
+
+    def _start_model_thread(self, train):
+        with self._training_lock:
+            if self._training_thread is not None and self._training_thread.is_alive():
+                self._model_sync_requested = True
+                return
+            self._model_sync_requested = False
+            self._training_thread = threading.Thread(target=self._update_model_quietly, args=(train,),
+                                                     name='category-model', daemon=True)
+            self._training_thread.start()
+
+    def _update_model_quietly(self, train):
+        """Train or sync on a connection of its own until no further sync is asked for"""
+        try:
+            while True:
+                if train:
+                    self.train_model()
+                    train = False
+                else:
+                    conn = connect_db(self.db_path)
+                    try:
+                        train = self._sync_category_model(conn)
+                    finally:
+                        conn.close()
+                    if train:
+                        continue
+                with self._training_lock:
+                    if not self._model_sync_requested:
+                        self._training_thread = None
+                        return
+                    self._model_sync_requested = False
+        except sqlite3.Error as e:
+            print(f"Error updating category model: {e}")
+
+    def _sync_category_model(self, conn):
+        """Apply transactions and corrections written since the last sync to the model.
+
+        Runs on the model thread. Returns True when the model should be trained
+        from scratch instead: it never was, other workers pruned edits it has
+        not seen, or its data has doubled since it was trained (which also
+        calibrates a model that started out on too few rows). The rules answer
+        meanwhile.
+        """
+        if conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'category_model_log'"
+        ).fetchone() is None:
+            # Schema not migrated yet (fresh database before init_db)
+            return False
+        if self._model_transaction_id is None:
+            return True
+        
+        # Edits and deletes come from the trigger-fed log, inserts and
+        # corrections from id high-water marks; one snapshot keeps them consistent
+        conn.execute('BEGIN')
+        try:
+            first_change = conn.execute('SELECT MIN(id) FROM category_model_log').fetchone()[0]
+            if first_change is not None and first_change > self._model_log_id + 1:
+                # Other workers pruned edits this model never saw: start afresh
+                return True
+            changes = conn.execute(
+                'SELECT id, transaction_id, description, category, delta FROM category_model_log '
+                'WHERE id > ? ORDER BY id', (self._model_log_id,)
+            ).fetchall()
+            inserted = conn.execute(
+                'SELECT id, description, category FROM transactions WHERE id > ? ORDER BY id',
+                (self._model_transaction_id,)
+            ).fetchall()
+            corrections = conn.execute(
+                'SELECT id, keywords, category FROM user_corrections WHERE id > ? ORDER BY id',
+                (self._model_correction_id,)
+            ).fetchall()
+        finally:
+            conn.rollback()
+        
+        documents = []
+        for log_id, transaction_id, description, category, delta in changes:
+            # Rows past the high-water mark are picked up below with their current values
+            if transaction_id <= self._model_transaction_id:
+                documents.append((CategoryModel.tokenize(description.lower()), category, float(delta)))
+            self._model_log_id = log_id
+        for transaction_id, description, category in inserted:
+            documents.append((CategoryModel.tokenize(description.lower()), category, 1.0))
+            self._model_transaction_id = transaction_id
+        for correction_id, keywords, category in corrections:
+            keywords = LearnedRuleStore.keywords_from_pattern(keywords)
+            documents.append((CategoryModel.tokenize(' '.join(keywords)), category, self.model_correction_weight))
+            self._model_correction_id = correction_id
+        if documents:
+            # Built aside and swapped in, so concurrent predictions never see a half-update
+            self.model = self.model.updated(documents)
+        prune_change_log(conn, 'category_model_log', self._model_log_id)
+        return self.model.documents >= 2 * max(self._model_trained_documents, CategoryModel.min_calibration_rows)
+
+    def _migrate_legacy_learning(self, conn):
+        """Import user_learning.json once, then move it aside.
+
+        The file is renamed inside the write transaction so a second worker
+        starting at the same time finds it gone and does not import it twice.
+        """
+        path = self.legacy_learning_path
+        if not path or not os.path.exists(path):
+            return
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            try:
+                with open(path, 'r') as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                conn.rollback()
+                return
+            except json.JSONDecodeError as e:
+                print(f"Skipping unreadable user learning file {path}: {e}")
+                conn.rollback()
+                return
+
+            rows = []
+            for user_id, patterns in data.items():
+                for pattern, category in patterns.items():
+                    keywords = LearnedRuleStore.keywords_from_pattern(pattern)
+                    if keywords:
+                        rows.append((user_id, '|'.join(keywords), category))
+            conn.executemany(
+                'INSERT INTO user_corrections (user_id, keywords, category) VALUES (?, ?, ?)', rows
+            )
+            os.replace(path, path + '.migrated')
+        except Exception:
+            conn.rollback()
+            raise
+        try:
+            conn.commit()
+        except sqlite3.Error:
+            os.replace(path + '.migrated', path)
+            raise
 
     def get_spending_insights(self, transactions, user_id=None):
         """Generate AI-powered spending insights"""
@@ -186,7 +1347,10 @@ class TransactionCategorizer:
                 categorized[category].append(transaction)
                 category_totals[category] += amount
         
-        # Generate insights
+        return self.insights_from_category_totals(category_totals)
+
+    def insights_from_category_totals(self, category_totals):
+        """Generate insights and recommendations from expense totals per category"""
         insights = []
         recommendations = []
         
@@ -223,11 +1387,13 @@ class TransactionCategorizer:
 
 # Initialize AI Categorizer
 transaction_categorizer = TransactionCategorizer()
+if app.config['METRICS_ENABLED']:
+    transaction_categorizer.observer = observe_categorization
 
 # Database initialization
-def init_db():
-    """Initialize the database with required tables"""
-    conn = sqlite3.connect('database.db')
+def init_db(path=None):
+    """Initialize the database (or a tenant's shard) with required tables"""
+    conn = connect_db(path)
     cursor = conn.cursor()
     
     # Personal transactions table
@@ -270,6 +1436,9 @@ def init_db():
         )
     ''')
     
+    # Learned categorization corrections (append-only)
+    cursor.execute(USER_CORRECTIONS_TABLE_SQL)
+    
     # Business invoices table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS invoices (
@@ -291,97 +1460,1079 @@ def init_db():
     ''')
     
     conn.commit()
+    migrate_db(conn)
     conn.close()
 
-# Routes
-@app.route('/')
-def index():
-    """Homepage route"""
-    return render_template('index.html')
+# Tables whose writes bump their row in data_versions (by trigger), so caches can
+# tell whether anything they were built from has changed since
+DATA_VERSION_TABLES = ('transactions', 'customers', 'customer_transactions', 'invoices')
 
-@app.route('/personal')
-def personal():
-    """Personal finance page"""
-    return render_template('personal.html')
+# Word search with diacritics folded; prefix indexes make 2- and 3-letter
+# prefix queries (typeahead) index lookups instead of term scans
+SEARCH_FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
 
-@app.route('/personal/analytics')
-def personal_analytics():
-    """Personal analytics page"""
-    return render_template('personal-analytics.html')
+# Versioned schema migrations, tracked in PRAGMA user_version. Each entry runs
+# once, in order, on top of the base tables created by init_db.
+MIGRATIONS = [
+    (1, 'Indexes for listing and khatabook hot queries', [
+        # Keyset-paginated listings: index entries end with the rowid, so this
+        # serves ORDER BY date DESC, id DESC (analytics read daily_rollups instead)
+        'CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions (date)',
+        # Khatabook history: WHERE customer_id = ? ORDER BY date DESC
+        'CREATE INDEX IF NOT EXISTS idx_customer_transactions_customer_date '
+        'ON customer_transactions (customer_id, date)',
+    ]),
+    (2, 'Materialized daily rollups of transactions', [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_rollups (
+            date TEXT NOT NULL,
+            type TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (date, type, category)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        INSERT OR REPLACE INTO daily_rollups (date, type, category, total, count)
+        SELECT date, type, category, SUM(amount), COUNT(*)
+        FROM transactions
+        GROUP BY date, type, category
+        ''',
+    ]),
+    (3, 'Cached categorization results and totals for spending insights', [
+        '''
+        CREATE TABLE IF NOT EXISTS insight_category_cache (
+            user_id TEXT NOT NULL,
+            description_hash TEXT NOT NULL,
+            ruleset_version TEXT NOT NULL,
+            corrections_version INTEGER NOT NULL,
+            category TEXT,
+            PRIMARY KEY (user_id, description_hash)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS insight_totals (
+            user_id TEXT NOT NULL,
+            category TEXT NOT NULL,
+            total REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, category)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS insight_state (
+            user_id TEXT PRIMARY KEY,
+            ruleset_version TEXT NOT NULL,
+            corrections_version INTEGER NOT NULL
+        )
+        ''',
+    ]),
+    (4, 'Invoice number sequences and invoice indexes', [
+        '''
+        CREATE TABLE IF NOT EXISTS invoice_sequences (
+            series TEXT PRIMARY KEY,
+            last_number INTEGER NOT NULL
+        )
+        ''',
+        # Continue any INV-YYYY-NNN series already present in the invoices table
+        '''
+        INSERT OR IGNORE INTO invoice_sequences (series, last_number)
+        SELECT substr(number, 5, 4), MAX(CAST(substr(number, 10) AS INTEGER))
+        FROM invoices
+        WHERE number GLOB 'INV-[0-9][0-9][0-9][0-9]-[0-9]*'
+        GROUP BY substr(number, 5, 4)
+        ''',
+        # Receivables aging: status IN (...) AND date <= ?, covering the totals
+        'CREATE INDEX IF NOT EXISTS idx_invoices_status_date '
+        'ON invoices (status, date, customer_id, total)',
+        'CREATE INDEX IF NOT EXISTS idx_invoices_customer_date ON invoices (customer_id, date)',
+        'CREATE INDEX IF NOT EXISTS idx_invoices_date ON invoices (date)',
+    ]),
+    (5, 'Per-table data versions bumped by triggers', [
+        '''
+        CREATE TABLE IF NOT EXISTS data_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        *[f"INSERT OR IGNORE INTO data_versions (table_name) VALUES ('{table}')"
+          for table in DATA_VERSION_TABLES],
+        *[f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_{operation.lower()}_version AFTER {operation} ON {table}
+        BEGIN
+            UPDATE data_versions SET version = version + 1 WHERE table_name = '{table}';
+        END
+        ''' for table in DATA_VERSION_TABLES for operation in ('INSERT', 'UPDATE', 'DELETE')],
+    ]),
+    (6, 'Date index for khatabook ledger reports', [
+        'CREATE INDEX IF NOT EXISTS idx_customer_transactions_date ON customer_transactions (date)',
+    ]),
+    (7, 'Report jobs shared by all server workers', [
+        '''
+        CREATE TABLE IF NOT EXISTS report_jobs (
+            id TEXT PRIMARY KEY,
+            type TEXT NOT NULL,
+            format TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            status TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            cached INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            path TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            finished_at REAL,
+            -- The worker process building the job, and when it last reported progress
+            pid INTEGER,
+            heartbeat_at REAL
+        )
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_report_jobs_finished_at ON report_jobs (finished_at)',
+    ]),
+    (8, 'Change log feeding the category model', [
+        '''
+        CREATE TABLE IF NOT EXISTS category_model_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            description TEXT NOT NULL,
+            category TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_category_model_update
+        AFTER UPDATE OF description, category ON transactions
+        WHEN OLD.description IS NOT NEW.description OR OLD.category IS NOT NEW.category
+        BEGIN
+            INSERT INTO category_model_log (transaction_id, description, category, delta)
+            VALUES (OLD.id, OLD.description, OLD.category, -1);
+            INSERT INTO category_model_log (transaction_id, description, category, delta)
+            VALUES (NEW.id, NEW.description, NEW.category, 1);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_category_model_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO category_model_log (transaction_id, description, category, delta)
+            VALUES (OLD.id, OLD.description, OLD.category, -1);
+        END
+        ''',
+    ]),
+    (9, 'Full-text search over transaction and khatabook descriptions', [
+        # Personal transactions: external-content index, the text stays in transactions
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            description, content='transactions', content_rowid='id', {SEARCH_FTS_OPTIONS}
+        )
+        ''',
+        "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')",
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF description ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', OLD.id, OLD.description);
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.id, NEW.description);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', OLD.id, OLD.description);
+        END
+        ''',
+        # Khatabook entries also index the customer's name, which lives in customers
+        f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS customer_transactions_fts USING fts5(
+            description, customer_name, {SEARCH_FTS_OPTIONS}
+        )
+        ''',
+        '''
+        INSERT INTO customer_transactions_fts (rowid, description, customer_name)
+        SELECT ct.id, ct.description, COALESCE(c.name, '')
+        FROM customer_transactions ct LEFT JOIN customers c ON c.id = ct.customer_id
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customer_transactions_fts_insert AFTER INSERT ON customer_transactions
+        BEGIN
+            INSERT INTO customer_transactions_fts (rowid, description, customer_name)
+            VALUES (NEW.id, NEW.description,
+                    COALESCE((SELECT name FROM customers WHERE id = NEW.customer_id), ''));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customer_transactions_fts_update
+        AFTER UPDATE OF description, customer_id ON customer_transactions
+        BEGIN
+            UPDATE customer_transactions_fts
+            SET description = NEW.description,
+                customer_name = COALESCE((SELECT name FROM customers WHERE id = NEW.customer_id), '')
+            WHERE rowid = NEW.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customer_transactions_fts_delete AFTER DELETE ON customer_transactions
+        BEGIN
+            DELETE FROM customer_transactions_fts WHERE rowid = OLD.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customers_fts_rename AFTER UPDATE OF name ON customers
+        WHEN OLD.name IS NOT NEW.name
+        BEGIN
+            UPDATE customer_transactions_fts SET customer_name = NEW.name
+            WHERE rowid IN (SELECT id FROM customer_transactions WHERE customer_id = NEW.id);
+        END
+        ''',
+    ]),
+    (10, 'Customer directory indexes and maintained receivable/payable counters', [
+        'CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (name COLLATE NOCASE, id)',
+        'CREATE INDEX IF NOT EXISTS idx_customers_phone ON customers (phone)',
+        'CREATE INDEX IF NOT EXISTS idx_customers_balance ON customers (balance, id)',
+        '''
+        CREATE TABLE IF NOT EXISTS customer_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            customer_count INTEGER NOT NULL,
+            total_receivables REAL NOT NULL,
+            total_payables REAL NOT NULL
+        )
+        ''',
+        '''
+        INSERT OR REPLACE INTO customer_stats (id, customer_count, total_receivables, total_payables)
+        SELECT 1, COUNT(*), COALESCE(SUM(MAX(COALESCE(balance, 0), 0)), 0),
+               COALESCE(SUM(MAX(-COALESCE(balance, 0), 0)), 0)
+        FROM customers
+        ''',
+        # Every balance change (single entries, bulk posting, reconciliation)
+        # adjusts the counters inside the same database transaction
+        '''
+        CREATE TRIGGER IF NOT EXISTS customers_stats_insert AFTER INSERT ON customers
+        BEGIN
+            UPDATE customer_stats
+            SET customer_count = customer_count + 1,
+                total_receivables = total_receivables + MAX(COALESCE(NEW.balance, 0), 0),
+                total_payables = total_payables + MAX(-COALESCE(NEW.balance, 0), 0)
+            WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customers_stats_update AFTER UPDATE OF balance ON customers
+        WHEN OLD.balance IS NOT NEW.balance
+        BEGIN
+            UPDATE customer_stats
+            SET total_receivables = total_receivables
+                    + MAX(COALESCE(NEW.balance, 0), 0) - MAX(COALESCE(OLD.balance, 0), 0),
+                total_payables = total_payables
+                    + MAX(-COALESCE(NEW.balance, 0), 0) - MAX(-COALESCE(OLD.balance, 0), 0)
+            WHERE id = 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customers_stats_delete AFTER DELETE ON customers
+        BEGIN
+            UPDATE customer_stats
+            SET customer_count = customer_count - 1,
+                total_receivables = total_receivables - MAX(COALESCE(OLD.balance, 0), 0),
+                total_payables = total_payables - MAX(-COALESCE(OLD.balance, 0), 0)
+            WHERE id = 1;
+        END
+        ''',
+    ]),
+    (11, 'Change log of edited and deleted transactions for analytics snapshots', [
+        '''
+        CREATE TABLE IF NOT EXISTS transaction_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id INTEGER NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_changes_update AFTER UPDATE ON transactions
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id) VALUES (OLD.id);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS transactions_changes_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transaction_changes (transaction_id) VALUES (OLD.id);
+        END
+        ''',
+    ]),
+]
 
-@app.route('/business')
-def business():
-    """Business dashboard page"""
-    return render_template('business.html')
+def migrate_db(conn):
+    """Apply pending schema migrations; safe to call from several workers at once"""
+    # A version listed out of order would be skipped on fresh databases
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert all(a < b for a, b in zip(versions, versions[1:])), \
+        f'MIGRATIONS versions must strictly increase: {versions}'
+    for version, description, statements in MIGRATIONS:
+        if conn.execute('PRAGMA user_version').fetchone()[0] >= version:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another worker may have applied it while we waited for the lock
+            if conn.execute('PRAGMA user_version').fetchone()[0] < version:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {int(version)}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
-@app.route('/business/analytics')
-def business_analytics():
-    """Business analytics page"""
-    return render_template('business-analytics.html')
+def data_versions(conn, tables=DATA_VERSION_TABLES):
+    """Return the current write counters of the given tables, in order"""
+    versions = dict(conn.execute('SELECT table_name, version FROM data_versions'))
+    return tuple(versions.get(table, 0) for table in tables)
 
-@app.route('/khatabook')
-def khatabook():
-    """Dedicated Khatabook service page"""
-    return render_template('khatabook.html')
+# Trigger-fed change logs are read by every worker's in-memory copy. Each
+# worker prunes what it has applied, keeping this many of the newest rows for
+# workers that are behind; one that falls further behind reloads instead.
+CHANGE_LOG_RETENTION = 10000
 
-@app.route('/reports')
-def reports():
-    """Advanced Reports page"""
-    return render_template('reports.html')
+def prune_change_log(conn, table, applied_id, keep=CHANGE_LOG_RETENTION):
+    """Delete change-log rows older than the newest `keep` before applied_id.
 
-# AI Categorization API Routes
-@app.route('/api/ai/categorize-transaction', methods=['POST'])
-def categorize_transaction_api():
-    """AI-powered transaction categorization endpoint"""
+    Runs once another `keep` rows have piled up, and gives up at once instead
+    of waiting when another writer holds the lock; a later call catches up.
+    """
+    if conn.in_transaction or conn.execute(
+        f'SELECT 1 FROM {table} WHERE id <= ? LIMIT 1', (applied_id - 2 * keep,)
+    ).fetchone() is None:
+        return 0
+    conn.execute('PRAGMA busy_timeout = 0')
     try:
-        data = request.get_json()
-        description = data.get('description', '').strip()
-        amount = data.get('amount')
-        user_id = data.get('user_id', 'default')  # For demo purposes
-        
-        if not description:
-            return jsonify({
-                'success': False,
-                'error': 'Description is required'
-            }), 400
-        
-        # Get AI categorization
-        result = transaction_categorizer.categorize_transaction(
-            description, amount, user_id
-        )
-        
-        return jsonify({
-            'success': True,
-            'suggestion': result
-        })
-        
-    except Exception as e:
-        print(f"Error in AI categorization: {e}")
-        return jsonify({
-            'success': False,
-            'error': 'Failed to categorize transaction'
-        }), 500
+        deleted = conn.execute(f'DELETE FROM {table} WHERE id <= ?', (applied_id - keep,)).rowcount
+        conn.commit()
+        return deleted
+    except sqlite3.OperationalError:
+        conn.rollback()
+        return 0
+    finally:
+        conn.execute(f"PRAGMA busy_timeout = {int(app.config['SQLITE_BUSY_TIMEOUT_MS'])}")
 
-@app.route('/api/ai/learn-correction', methods=['POST'])
-def learn_correction_api():
-    """Learn from user's manual category corrections"""
+# Daily rollups: one row per (date, type, category), kept in step with every
+# write to transactions inside the same database transaction
+def apply_rollup_delta(cursor, date, type_, category, amount, count):
+    """Add (or with negative values, remove) transactions from a rollup row"""
+    cursor.execute('''
+        INSERT INTO daily_rollups (date, type, category, total, count)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (date, type, category) DO UPDATE SET
+            total = total + excluded.total,
+            count = count + excluded.count
+    ''', (date, type_, category, amount, count))
+    if count < 0:
+        cursor.execute('''
+            DELETE FROM daily_rollups
+            WHERE date = ? AND type = ? AND category = ? AND count <= 0
+        ''', (date, type_, category))
+
+def rebuild_rollups(conn):
+    """Regenerate daily_rollups from the transactions table"""
+    conn.execute('BEGIN IMMEDIATE')
     try:
-        data = request.get_json()
-        description = data.get('description', '').strip()
-        correct_category = data.get('correct_category', '').strip()
-        user_id = data.get('user_id', 'default')
-        
-        if not description or not correct_category:
-            return jsonify({
+        conn.execute('DELETE FROM daily_rollups')
+        conn.execute('''
+            INSERT INTO daily_rollups (date, type, category, total, count)
+            SELECT date, type, category, SUM(amount), COUNT(*)
+            FROM transactions
+            GROUP BY date, type, category
+        ''')
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Regenerate the daily_rollups table from scratch."""
+    init_db()
+    conn = connect_db()
+    rebuild_rollups(conn)
+    count = conn.execute('SELECT COUNT(*) FROM daily_rollups').fetchone()[0]
+    conn.close()
+    print(f"Rebuilt daily_rollups: {count} rows")
+
+# Spending insights: per-user expense totals by AI category, kept up to date
+# incrementally and rebuilt only when the rules or the user's corrections change
+class SpendingInsightsCache:
+    """Cached categorization results and category totals for spending insights.
+
+    insight_category_cache holds one categorizer result per (user, description
+    hash), tagged with the rule set (and category model generation) and
+    correction versions it was computed under. insight_totals holds the
+    expense totals per category, and
+    insight_state records which versions those totals are valid for. Writes to
+    transactions adjust the totals of every user whose state is current; a
+    version change makes the next read rebuild that user's totals.
+    """
+
+    def __init__(self, categorizer):
+        self.categorizer = categorizer
+
+    @staticmethod
+    def description_hash(description):
+        return hashlib.sha1(description.lower().encode('utf-8')).hexdigest()
+
+    def current_versions(self, user_id):
+        # An uncalibrated model never answers, so its generation can't change results
+        model = self.categorizer.model
+        generation = model.generation if model.calibrated else 0
+        return (f'{self.categorizer.rule_engine.version}:m{generation}',
+                self.categorizer.learned_rules.version(user_id))
+
+    def category_totals(self, conn, user_id):
+        """Return {category: total} of expenses for insights, rebuilding if stale"""
+        self.categorizer.refresh_user_learning()
+        versions = self.current_versions(user_id)
+        state = conn.execute(
+            'SELECT ruleset_version, corrections_version FROM insight_state WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+        if state is None or tuple(state) != versions:
+            self.rebuild(conn, user_id)
+        rows = conn.execute(
+            'SELECT category, total FROM insight_totals WHERE user_id = ? AND total > 0',
+            (user_id,)
+        )
+        return dict(rows.fetchall())
+
+    def rebuild(self, conn, user_id):
+        """Recompute a user's totals, categorizing only descriptions not cached yet"""
+        ruleset_version, corrections_version = self.current_versions(user_id)
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute('''
+                SELECT description, category, SUM(amount), COUNT(*) FROM transactions
+                WHERE type = 'expense' AND amount > 0
+                GROUP BY description, category
+            ''').fetchall()
+            hashes = [self.description_hash(row[0]) for row in rows]
+            cached = self._cached_categories(conn, user_id, set(hashes),
+                                             ruleset_version, corrections_version)
+
+            missing = {}
+            for row, description_hash in zip(rows, hashes):
+                if description_hash not in cached and description_hash not in missing:
+                    missing[description_hash] = row[0]
+            if missing:
+                results = self.categorizer.categorize_many(list(missing.values()), None, user_id)
+                for description_hash, result in zip(missing, results):
+                    cached[description_hash] = self._cacheable_category(result)
+                conn.executemany('''
+                    INSERT OR REPLACE INTO insight_category_cache
+                        (user_id, description_hash, ruleset_version, corrections_version, category)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(user_id, description_hash, ruleset_version, corrections_version,
+                       cached[description_hash]) for description_hash in missing])
+
+            totals = defaultdict(lambda: [0.0, 0])
+            for (description, stored_category, total, count), description_hash in zip(rows, hashes):
+                category = cached[description_hash] or stored_category
+                totals[category][0] += total
+                totals[category][1] += count
+
+            conn.execute('DELETE FROM insight_totals WHERE user_id = ?', (user_id,))
+            conn.executemany(
+                'INSERT INTO insight_totals (user_id, category, total, count) VALUES (?, ?, ?, ?)',
+                [(user_id, category, total, count) for category, (total, count) in totals.items()]
+            )
+            conn.execute('''
+                INSERT OR REPLACE INTO insight_state (user_id, ruleset_version, corrections_version)
+                VALUES (?, ?, ?)
+            ''', (user_id, ruleset_version, corrections_version))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def apply_change(self, cursor, old=None, new=None):
+        """Move a transaction between category totals for every user with current totals.
+
+        old and new are (description, amount, category, type) before and after
+        the write; either may be None for inserts and deletes. Call inside the
+        write's own transaction.
+        """
+        old = old if old and old[3] == 'expense' and old[1] > 0 else None
+        new = new if new and new[3] == 'expense' and new[1] > 0 else None
+        if old is None and new is None:
+            return
+
+        states = cursor.execute(
+            'SELECT user_id, ruleset_version, corrections_version FROM insight_state'
+        ).fetchall()
+        for user_id, ruleset_version, corrections_version in states:
+            if (ruleset_version, corrections_version) != self.current_versions(user_id):
+                continue  # stale: the next read rebuilds this user
+            for row, sign in ((old, -1), (new, 1)):
+                if row is None:
+                    continue
+                category = self._category_for(cursor, user_id, row[0], ruleset_version,
+                                              corrections_version) or row[2]
+                cursor.execute('''
+                    INSERT INTO insight_totals (user_id, category, total, count)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user_id, category) DO UPDATE SET
+                        total = total + excluded.total,
+                        count = count + excluded.count
+                ''', (user_id, category, sign * row[1], sign))
+
+    def _category_for(self, cursor, user_id, description, ruleset_version, corrections_version):
+        description_hash = self.description_hash(description)
+        cached = self._cached_categories(cursor, user_id, {description_hash},
+                                         ruleset_version, corrections_version)
+        if description_hash in cached:
+            return cached[description_hash]
+        category = self._cacheable_category(
+            self.categorizer.categorize_transaction(description, None, user_id)
+        )
+        cursor.execute('''
+            INSERT OR REPLACE INTO insight_category_cache
+                (user_id, description_hash, ruleset_version, corrections_version, category)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (user_id, description_hash, ruleset_version, corrections_version, category))
+        return category
+
+    @staticmethod
+    def _cached_categories(conn, user_id, hashes, ruleset_version, corrections_version):
+        """Look up valid cached results; None values mean 'no signal, use the stored category'"""
+        cached = {}
+        hashes = list(hashes)
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows = conn.execute(f'''
+                SELECT description_hash, category FROM insight_category_cache
+                WHERE user_id = ? AND ruleset_version = ? AND corrections_version = ?
+                  AND description_hash IN ({','.join('?' * len(chunk))})
+            ''', (user_id, ruleset_version, corrections_version, *chunk))
+            cached.update(rows.fetchall())
+        return cached
+
+    @staticmethod
+    def _cacheable_category(result):
+        # Without any rule or learned signal, the user's stored category is a better answer
+        return None if result['source'] == 'default' else result['suggested_category']
+
+spending_insights_cache = SpendingInsightsCache(transaction_categorizer)
+
+# Per-tenant shards: with SHARD_DIR set, every tenant gets its own SQLite file,
+# so one busy shop's writes never wait on another's
+class ShardRouter:
+    """Map tenants to shard files, bringing each shard's schema up to date on first use.
+
+    Every shard also gets its own categorizer (its corrections and model come
+    from that shard's tables) sharing the compiled rule engine, and its own
+    analytics snapshot; the least recently used ones are dropped past
+    max_tenants, and their group-commit writers stopped.
+    """
+    tenant_pattern = re.compile(r'[A-Za-z0-9_-]{1,64}')
+    
+    def __init__(self, shard_dir, max_tenants=32):
+        self.shard_dir = shard_dir
+        self.max_tenants = max_tenants
+        self.lock = threading.Lock()
+        self.initialized = set()
+        self.tenants = OrderedDict()
+    
+    def path_for(self, tenant):
+        """Shard file of a tenant; raises ValueError for ids that are not safe file names"""
+        if not self.tenant_pattern.fullmatch(tenant):
+            raise ValueError('tenant id must be 1-64 letters, digits, - or _')
+        return os.path.join(self.shard_dir, f'{tenant}.db')
+    
+    def shard_paths(self):
+        """Every existing shard file, sorted"""
+        if not os.path.isdir(self.shard_dir):
+            return []
+        return sorted(os.path.join(self.shard_dir, name) for name in os.listdir(self.shard_dir)
+                      if name.endswith('.db') and self.tenant_pattern.fullmatch(name[:-3]))
+    
+    def ensure_schema(self, path):
+        """Run init_db on a shard once per process (migrate_db is safe across processes)"""
+        if path in self.initialized:
+            return
+        with self.lock:
+            if path not in self.initialized:
+                os.makedirs(self.shard_dir, exist_ok=True)
+                init_db(path)
+                self.initialized.add(path)
+    
+    def tenant_state(self, path):
+        """Return (categorizer, spending insights cache, analytics snapshot) for a shard"""
+        with self.lock:
+            state = self.tenants.get(path)
+            if state is not None:
+                self.tenants.move_to_end(path)
+                return state
+        categorizer = TransactionCategorizer(db_path=path, legacy_learning_path=None,
+                                             rule_engine=transaction_categorizer.rule_engine)
+        categorizer.observer = transaction_categorizer.observer
+        with self.lock:
+            state = self.tenants.setdefault(
+                path, (categorizer, SpendingInsightsCache(categorizer), AnalyticsSnapshot())
+            )
+            self.tenants.move_to_end(path)
+            evicted = []
+            evicted_paths = []
+            while len(self.tenants) > self.max_tenants:
+                evicted_path, evicted_state = self.tenants.popitem(last=False)
+                evicted.append(evicted_state[0])
+                evicted_paths.append(evicted_path)
+        if state[0] is not categorizer:
+            # Another thread created it first
+            evicted.append(categorizer)
+        for stale in evicted:
+            stale.close_learning_connection()
+        for evicted_path in evicted_paths:
+            close_group_writer(evicted_path)
+        return state
+
+shard_router = ShardRouter(app.config['SHARD_DIR'], app.config['SHARD_CONNECTIONS']) if app.config['SHARD_DIR'] else None
+
+def current_categorizer():
+    """Categorizer for the current request's shard (the default one outside requests)"""
+    return (has_app_context() and g.get('categorizer')) or transaction_categorizer
+
+def current_insights_cache():
+    """Spending insights cache for the current request's shard (the default one outside requests)"""
+    return (has_app_context() and g.get('insights_cache')) or spending_insights_cache
+
+@app.before_request
+def route_tenant():
+    """Resolve the tenant (header, then cookie, then DEFAULT_TENANT) to its shard.
+
+    Only the default tenant's shard is created here; requests for any other
+    tenant without a shard get 404, so clients can't create databases at will.
+    """
+    if shard_router is None or request.endpoint == 'static':
+        return
+    tenant = (request.headers.get(app.config['TENANT_HEADER']) or request.cookies.get('tenant')
+              or app.config['DEFAULT_TENANT'])
+    try:
+        path = shard_router.path_for(tenant)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    if (path not in shard_router.initialized and not os.path.exists(path)
+            and tenant != app.config['DEFAULT_TENANT'] and not app.config['SHARD_AUTO_CREATE']):
+        return jsonify({'success': False, 'error': 'Unknown tenant'}), 404
+    shard_router.ensure_schema(path)
+    g.tenant = tenant
+    g.db_path = path
+    g.categorizer, g.insights_cache, g.analytics = shard_router.tenant_state(path)
+
+@app.cli.command('create-tenant')
+@click.argument('tenant')
+def create_tenant_command(tenant):
+    """Create a tenant's shard (or bring an existing one up to date)."""
+    if shard_router is None:
+        raise click.ClickException('MY_MONEY_SHARD_DIR is not set')
+    try:
+        path = shard_router.path_for(tenant)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    existed = os.path.exists(path)
+    shard_router.ensure_schema(path)
+    print(f"{'Updated' if existed else 'Created'} tenant {tenant} at {path}")
+
+@app.cli.command('migrate-shards')
+@click.option('--workers', default=4, show_default=True, help='Shards migrated at the same time.')
+def migrate_shards_command(workers):
+    """Create tables and apply pending migrations on every tenant shard."""
+    if shard_router is None:
+        raise click.ClickException('MY_MONEY_SHARD_DIR is not set')
+    paths = shard_router.shard_paths()
+    
+    def migrate(path):
+        started = time.perf_counter()
+        init_db(path)
+        conn = connect_db(path)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        conn.close()
+        return version, time.perf_counter() - started
+    
+    # SQLite releases the GIL while it works, so threads migrate shards in parallel
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {path: executor.submit(migrate, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                version, seconds = future.result()
+                print(f"ok   {path}: schema version {version} ({seconds:.2f}s)")
+            except Exception as e:
+                failed += 1
+                print(f"FAIL {path}: {e}")
+    print(f"Migrated {len(paths) - failed} of {len(paths)} shards")
+    if failed:
+        raise SystemExit(1)
+
+# Hot queries whose plans must stay index-backed as the tables grow
+HOT_QUERIES = {
+    'analytics_totals': (
+        'SELECT type, SUM(total), SUM(count) FROM daily_rollups '
+        'WHERE date >= ? AND date <= ? GROUP BY type', ('2000-01-01', '2100-01-01')
+    ),
+    'analytics_categories': (
+        "SELECT category, SUM(total) FROM daily_rollups "
+        "WHERE type = 'expense' AND date >= ? AND date <= ? GROUP BY category",
+        ('2000-01-01', '2100-01-01')
+    ),
+    'customer_transactions': (
+        'SELECT * FROM customer_transactions WHERE customer_id = ? ORDER BY date DESC', (1,)
+    ),
+    'transactions_page': (
+        'SELECT * FROM transactions WHERE (date, id) < (?, ?) '
+        'ORDER BY date DESC, id DESC LIMIT ?', ('2100-01-01', 0, 100)
+    ),
+    'invoice_aging': (
+        "SELECT customer_id, COUNT(*), SUM(total) FROM invoices "
+        "WHERE status IN ('pending', 'overdue') AND date <= ? GROUP BY customer_id",
+        ('2100-01-01',)
+    ),
+    'customer_invoices_page': (
+        'SELECT * FROM invoices WHERE customer_id = ? AND (date, id) < (?, ?) '
+        'ORDER BY date DESC, id DESC LIMIT ?', (1, '2100-01-01', 0, 100)
+    ),
+    'customer_transactions_page': (
+        'SELECT * FROM customer_transactions WHERE customer_id = ? AND (date, id) < (?, ?) '
+        'ORDER BY date DESC, id DESC LIMIT ?', (1, '2100-01-01', 0, 100)
+    ),
+    'customer_name_prefix': (
+        "SELECT * FROM customers WHERE name LIKE ? ESCAPE '\\' "
+        'ORDER BY name COLLATE NOCASE, id LIMIT ?', ('ra%', 20)
+    ),
+    'customer_phone_prefix': (
+        'SELECT * FROM customers WHERE phone GLOB ? ORDER BY phone, id LIMIT ?', ('98*', 20)
+    ),
+    'top_debtors_page': (
+        'SELECT * FROM customers WHERE balance > 0 AND (balance, id) < (?, ?) '
+        'ORDER BY balance DESC, id DESC LIMIT ?', (1e18, 0, 20)
+    ),
+}
+
+def check_query_plans(conn):
+    """Return {query name: (uses_index, plan lines)} from EXPLAIN QUERY PLAN"""
+    results = {}
+    for name, (sql, params) in HOT_QUERIES.items():
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+        table_steps = [step for step in plan if step.startswith(('SCAN', 'SEARCH'))]
+        # A temp b-tree for GROUP BY only sorts the groups; one for ORDER BY sorts rows
+        uses_index = (bool(table_steps) and all('USING' in step for step in table_steps)
+                      and not any('TEMP B-TREE' in step and 'ORDER BY' in step for step in plan))
+        results[name] = (uses_index, plan)
+    return results
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create the tables and apply pending migrations."""
+    init_db()
+    print(f"Database ready at {app.config['DATABASE']}")
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """Fail if any hot query would scan a table instead of using an index."""
+    init_db()
+    conn = connect_db()
+    failed = False
+    for name, (uses_index, plan) in check_query_plans(conn).items():
+        print(f"{'ok  ' if uses_index else 'SCAN'} {name}: {' | '.join(plan)}")
+        failed = failed or not uses_index
+    conn.close()
+    if failed:
+        raise SystemExit(1)
+
+@app.cli.command('train-category-model')
+def train_category_model_command():
+    """Train the category model on stored transactions and report held-out accuracy."""
+    init_db()
+    started = time.perf_counter()
+    summary = transaction_categorizer.train_model()
+    accuracy = summary['held_out_accuracy']
+    print(f"Trained on {summary['documents']} transactions: {summary['tokens']} words, "
+          f"{summary['categories']} categories in {time.perf_counter() - started:.2f}s")
+    print(f"Temperature {summary['temperature']}, held-out accuracy "
+          f"{'n/a (too little data)' if accuracy is None else f'{accuracy:.1%}'}")
+
+# Response cache: rendered GET payloads, validated by the data versions of the
+# tables they read (bumped by triggers on every write)
+class ResponseCache:
+    """Bounded LRU of response bodies keyed by endpoint and query string"""
+    
+    def __init__(self, max_entries=256, max_body_bytes=1024 * 1024):
+        self.max_entries = max_entries
+        self.max_body_bytes = max_body_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+    
+    def get(self, key, etag):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != etag:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+    
+    def put(self, key, etag, body, mimetype):
+        if len(body) > self.max_body_bytes:
+            return
+        with self.lock:
+            self.entries[key] = (etag, body, mimetype)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+response_cache = ResponseCache()
+
+def cached_response(*tables):
+    """Serve GET requests from response_cache and answer If-None-Match with 304.
+
+    The ETag covers the request, the versions of `tables` and today's date (for
+    windows relative to today), so any write to those tables invalidates it.
+    Streamed responses get an ETag but are not stored.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            
+            key = (current_db_path(), request.path, tuple(sorted(request.args.items(multi=True))))
+            versions = data_versions(get_db(), tables)
+            etag = hashlib.sha1(repr((key, versions, date.today().isoformat())).encode()).hexdigest()[:32]
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                entry = response_cache.get(key, etag)
+                if entry is not None:
+                    response = Response(entry[1], mimetype=entry[2])
+                else:
+                    response = app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    if not response.is_streamed:
+                        response_cache.put(key, etag, response.get_data(), response.mimetype)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+# Request instrumentation: metrics when enabled, and cProfile dumps of sampled
+# requests slower than PROFILE_SLOW_MS (one profiled request at a time)
+@app.before_request
+def start_request_instrumentation():
+    if not app.config['METRICS_ENABLED'] and not app.config['PROFILE_SAMPLE_RATE']:
+        return
+    g.request_started = time.perf_counter()
+    _request_sql.totals = [0, 0.0]
+    if (app.config['PROFILE_SAMPLE_RATE'] and random.random() < app.config['PROFILE_SAMPLE_RATE']
+            and _profiler_lock.acquire(blocking=False)):
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    # Unrouted paths share one label so 404 probes cannot blow up cardinality
+    endpoint = request.endpoint or 'unmatched'
+    
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+        if elapsed * 1000 >= app.config['PROFILE_SLOW_MS']:
+            dump_profile(profiler, endpoint, elapsed)
+    
+    if app.config['METRICS_ENABLED']:
+        queries, sql_seconds = getattr(_request_sql, 'totals', None) or (0, 0.0)
+        REQUEST_SECONDS.labels(request.method, endpoint).observe(elapsed)
+        REQUESTS.labels(request.method, endpoint, str(response.status_code)).inc()
+        SQL_QUERIES_PER_REQUEST.labels(endpoint).observe(queries)
+        SQL_SECONDS_PER_REQUEST.labels(endpoint).observe(sql_seconds)
+    return response
+
+@app.teardown_request
+def finish_request_instrumentation(exception):
+    _request_sql.totals = None
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+
+def dump_profile(profiler, endpoint, elapsed):
+    """Write a slow request's profile as a pstats file in PROFILE_DIR"""
+    directory = app.config['PROFILE_DIR']
+    try:
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{endpoint}-"
+                                       f"{elapsed * 1000:.0f}ms-{os.getpid()}.pstats")
+        profiler.dump_stats(path)
+        print(f"Slow request {request.method} {request.path} took {elapsed * 1000:.0f}ms; profile at {path}")
+    except OSError as e:
+        print(f"Could not write profile for {endpoint}: {e}")
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus metrics (enable with MY_MONEY_METRICS=1)"""
+    if not app.config['METRICS_ENABLED']:
+        return jsonify({'success': False, 'error': 'Metrics are disabled'}), 404
+    registry = metrics_registry
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        # gunicorn workers: merge the per-process metric files
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(prometheus_client.generate_latest(registry),
+                    content_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+# Routes
+@app.route('/')
+def index():
+    """Homepage route"""
+    return render_template('index.html')
+
+@app.route('/personal')
+def personal():
+    """Personal finance page"""
+    return render_template('personal.html')
+
+@app.route('/personal/analytics')
+def personal_analytics():
+    """Personal analytics page"""
+    return render_template('personal-analytics.html')
+
+@app.route('/business')
+def business():
+    """Business dashboard page"""
+    return render_template('business.html')
+
+@app.route('/business/analytics')
+def business_analytics():
+    """Business analytics page"""
+    return render_template('business-analytics.html')
+
+@app.route('/khatabook')
+def khatabook():
+    """Dedicated Khatabook service page"""
+    return render_template('khatabook.html')
+
+@app.route('/reports')
+def reports():
+    """Advanced Reports page"""
+    return render_template('reports.html')
+
+# AI Categorization API Routes
+@app.route('/api/ai/categorize-transaction', methods=['POST'])
+def categorize_transaction_api():
+    """AI-powered transaction categorization endpoint"""
+    try:
+        data = request.get_json()
+        description = data.get('description', '').strip()
+        amount = data.get('amount')
+        user_id = data.get('user_id', 'default')  # For demo purposes
+        
+        if not description:
+            return jsonify({
+                'success': False,
+                'error': 'Description is required'
+            }), 400
+        
+        # Get AI categorization
+        result = current_categorizer().categorize_transaction(
+            description, amount, user_id
+        )
+        
+        return jsonify({
+            'success': True,
+            'suggestion': result
+        })
+        
+    except Exception as e:
+        print(f"Error in AI categorization: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to categorize transaction'
+        }), 500
+
+@app.route('/api/ai/categorize-batch', methods=['POST'])
+def categorize_batch_api():
+    """Categorize many descriptions in one call (e.g. imported bank statements)"""
+    try:
+        data = request.get_json()
+        descriptions = data.get('descriptions')
+        amounts = data.get('amounts')
+        user_id = data.get('user_id', 'default')
+        
+        if not isinstance(descriptions, list):
+            return jsonify({
+                'success': False,
+                'error': 'descriptions must be a list'
+            }), 400
+        
+        if amounts is not None and (not isinstance(amounts, list) or len(amounts) != len(descriptions)):
+            return jsonify({
+                'success': False,
+                'error': 'amounts must be a list with one entry per description'
+            }), 400
+        
+        results = current_categorizer().categorize_many(
+            [str(description or '').strip() for description in descriptions], amounts, user_id
+        )
+        
+        return jsonify({
+            'success': True,
+            'suggestions': results
+        })
+        
+    except Exception as e:
+        print(f"Error in AI batch categorization: {e}")
+        return jsonify({
+            'success': False,
+            'error': 'Failed to categorize transactions'
+        }), 500
+
+@app.route('/api/ai/learn-correction', methods=['POST'])
+def learn_correction_api():
+    """Learn from user's manual category corrections"""
+    try:
+        data = request.get_json()
+        description = data.get('description', '').strip()
+        correct_category = data.get('correct_category', '').strip()
+        user_id = data.get('user_id', 'default')
+        
+        if not description or not correct_category:
+            return jsonify({
                 'success': False,
                 'error': 'Description and correct category are required'
             }), 400
         
         # Learn from correction
-        transaction_categorizer.learn_from_user_correction(
+        learned = current_categorizer().learn_from_user_correction(
             user_id, description, correct_category
         )
         
+        if not learned:
+            return jsonify({
+                'success': False,
+                'error': 'Description has no significant words to learn from'
+            }), 400
+        
         return jsonify({
             'success': True,
             'message': 'AI has learned from your correction'
@@ -400,29 +2551,11 @@ def spending_insights_api():
     try:
         user_id = request.args.get('user_id', 'default')
         
-        # Get user transactions
-        conn = sqlite3.connect('database.db')
-        cursor = conn.cursor()
-        cursor.execute('SELECT * FROM transactions ORDER BY date DESC')
-        transactions = cursor.fetchall()
-        conn.close()
-        
-        # Convert to dict format
-        transaction_dicts = []
-        for t in transactions:
-            transaction_dicts.append({
-                'id': t[0],
-                'date': t[1],
-                'amount': t[2],
-                'description': t[3],
-                'category': t[4],
-                'type': t[5]
-            })
+        # Expense totals per AI category, maintained incrementally per user
+        category_totals = current_insights_cache().category_totals(get_db(), user_id)
         
         # Get insights
-        insights = transaction_categorizer.get_spending_insights(
-            transaction_dicts, user_id
-        )
+        insights = current_categorizer().insights_from_category_totals(category_totals)
         
         return jsonify({
             'success': True,
@@ -436,158 +2569,1093 @@ def spending_insights_api():
             'error': 'Failed to generate insights'
         }), 500
 
+# Listing helpers shared by the transaction endpoints
+TRANSACTION_COLUMNS = 'id, date, amount, description, category, type, created_at'
+CUSTOMER_TRANSACTION_COLUMNS = 'id, customer_id, date, amount, description, type, created_at'
+LISTING_DEFAULT_LIMIT = 100
+LISTING_MAX_LIMIT = 1000
+
+def transaction_to_dict(t):
+    return {
+        'id': t[0],
+        'date': t[1],
+        'amount': t[2],
+        'description': t[3],
+        'category': t[4],
+        'type': t[5],
+        'created_at': t[6]
+    }
+
+def customer_transaction_to_dict(t):
+    return {
+        'id': t[0],
+        'customer_id': t[1],
+        'date': t[2],
+        'amount': t[3],
+        'description': t[4],
+        'type': t[5],
+        'created_at': t[6]
+    }
+
+def parse_listing_args():
+    """Read ?after=<date,id>&limit=&format=json|ndjson; raises ValueError on bad input"""
+    output_format = request.args.get('format', 'json')
+    if output_format not in ('json', 'ndjson'):
+        raise ValueError('format must be json or ndjson')
+
+    after = request.args.get('after')
+    if after:
+        after_date, _, after_id = after.rpartition(',')
+        if not after_date or not after_id.isdigit():
+            raise ValueError('after must look like <date>,<id>')
+        after = (after_date, int(after_id))
+
+    limit = request.args.get('limit')
+    if limit is not None:
+        if not limit.isdigit() or int(limit) < 1:
+            raise ValueError('limit must be a positive integer')
+        limit = min(int(limit), LISTING_MAX_LIMIT)
+    elif after:
+        limit = LISTING_DEFAULT_LIMIT
+
+    return after, limit, output_format
+
+def keyset_listing_response(key, cursor, to_dict, limit, output_format):
+    """Build a listing response from a cursor ordered by (date DESC, id DESC).
+
+    - ndjson: one row per line, streamed straight from the cursor
+    - json with limit: one page plus next_cursor (the query fetched limit + 1 rows)
+    - json without limit: the full {key: [...]} document, streamed in chunks
+    """
+    if output_format == 'ndjson':
+        def generate_ndjson():
+            for rows in iter(lambda: cursor.fetchmany(500), []):
+                yield ''.join(json.dumps(to_dict(row), sort_keys=True) + '\n' for row in rows)
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+
+    if limit is not None:
+        items = [to_dict(row) for row in cursor.fetchall()]
+        next_cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_cursor = f"{items[-1]['date']},{items[-1]['id']}"
+        return jsonify({key: items, 'next_cursor': next_cursor})
+
+    def generate_json():
+        yield '{"%s": [' % key
+        separator = ''
+        for rows in iter(lambda: cursor.fetchmany(500), []):
+            chunk = ','.join(json.dumps(to_dict(row), sort_keys=True) for row in rows)
+            yield separator + chunk
+            separator = ','
+        yield ']}\n'
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
+
+def keyset_query(sql, params, after, limit, output_format, filters=()):
+    """Append keyset WHERE/ORDER BY/LIMIT clauses to a listing query"""
+    conditions = list(filters)
+    params = list(params)
+    if after:
+        conditions.append('(date, id) < (?, ?)')
+        params.extend(after)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY date DESC, id DESC'
+    if limit is not None:
+        # Fetch one extra row for JSON pages to know whether a next page exists
+        sql += ' LIMIT ?'
+        params.append(limit + 1 if output_format == 'json' else limit)
+    return sql, params
+
+# Full-text search over personal transactions and khatabook entries
+SEARCH_TYPES = {
+    'personal': ('transactions', None),
+    'income': ('transactions', 'income'),
+    'expense': ('transactions', 'expense'),
+    'khatabook': ('customer_transactions', None),
+    'credit': ('customer_transactions', 'credit'),
+    'payment': ('customer_transactions', 'payment'),
+}
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+SEARCH_MAX_TERMS = 8
+
+def search_match_expression(query):
+    """Turn free text into an FTS5 query where every word must match as a prefix.
+
+    Words are quoted, so FTS5 operators and punctuation in the input are
+    treated as plain text. Returns None when there is nothing to search for.
+    """
+    words = re.findall(r'\w+', query.lower())[:SEARCH_MAX_TERMS]
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_subquery(table, entry_type, match, start, end):
+    """Ranked matches from one table as (source, id, date, amount, description,
+    type, category, customer_id, customer_name, rank) rows"""
+    if table == 'transactions':
+        sql = '''
+            SELECT 'personal', t.id, t.date, t.amount, t.description, t.type, t.category,
+                   NULL, NULL, transactions_fts.rank
+            FROM transactions_fts JOIN transactions t ON t.id = transactions_fts.rowid
+            WHERE transactions_fts MATCH ?
+        '''
+        alias = 't'
+    else:
+        sql = '''
+            SELECT 'khatabook', ct.id, ct.date, ct.amount, ct.description, ct.type, NULL,
+                   ct.customer_id, customer_transactions_fts.customer_name, customer_transactions_fts.rank
+            FROM customer_transactions_fts JOIN customer_transactions ct ON ct.id = customer_transactions_fts.rowid
+            WHERE customer_transactions_fts MATCH ?
+        '''
+        alias = 'ct'
+    params = [match]
+    if entry_type:
+        sql += f' AND {alias}.type = ?'
+        params.append(entry_type)
+    if start:
+        sql += f' AND {alias}.date >= ?'
+        params.append(start)
+    if end:
+        sql += f' AND {alias}.date <= ?'
+        params.append(end)
+    return sql, params
+
+def search_result_to_dict(row):
+    """Convert a search row to a dictionary"""
+    result = {
+        'source': row[0],
+        'id': row[1],
+        'date': row[2],
+        'amount': row[3],
+        'description': row[4],
+        'type': row[5]
+    }
+    if row[0] == 'personal':
+        result['category'] = row[6]
+    else:
+        result['customer_id'] = row[7]
+        result['customer_name'] = row[8]
+    return result
+
+@app.route('/api/search')
+@cached_response('transactions', 'customer_transactions', 'customers')
+def search_api():
+    """Search transaction and khatabook descriptions (and customer names) by word prefix.
+
+    ?q= is required; ?type= narrows to personal, income, expense, khatabook,
+    credit or payment; ?from=&to= bound the date. Results are ordered by
+    relevance (BM25), then newest first, and paged with ?limit=&offset=.
+    """
+    match = search_match_expression(request.args.get('q', ''))
+    if match is None:
+        return jsonify({'success': False, 'error': 'q must contain at least one word'}), 400
+    
+    entry_type = request.args.get('type')
+    if entry_type and entry_type not in SEARCH_TYPES:
+        return jsonify({'success': False, 'error': f"type must be one of {', '.join(SEARCH_TYPES)}"}), 400
+    start, end = request.args.get('from'), request.args.get('to')
+    try:
+        for value in (start, end):
+            if value:
+                datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from and to must be YYYY-MM-DD dates'}), 400
+    
+    limit, offset = request.args.get('limit', str(SEARCH_DEFAULT_LIMIT)), request.args.get('offset', '0')
+    if not limit.isdigit() or int(limit) < 1 or not offset.isdigit():
+        return jsonify({'success': False, 'error': 'limit must be a positive integer and offset a non-negative one'}), 400
+    limit, offset = min(int(limit), SEARCH_MAX_LIMIT), int(offset)
+    
+    if entry_type:
+        sources = [SEARCH_TYPES[entry_type]]
+    else:
+        sources = [('transactions', None), ('customer_transactions', None)]
+    subqueries, params = [], []
+    for table, row_type in sources:
+        sql, subquery_params = search_subquery(table, row_type, match, start, end)
+        subqueries.append(sql)
+        params.extend(subquery_params)
+    sql = ' UNION ALL '.join(subqueries) + ' ORDER BY 10, 3 DESC, 2 DESC LIMIT ? OFFSET ?'
+    # One extra row tells whether there is a next page
+    params.extend([limit + 1, offset])
+    
+    rows = get_db().execute(sql, params).fetchall()
+    results = [search_result_to_dict(row) for row in rows[:limit]]
+    return jsonify({
+        'success': True,
+        'results': results,
+        'next_offset': offset + limit if len(rows) > limit else None
+    })
+
 # API Routes for Personal Finance
+def insert_transaction(conn, data, insights_cache):
+    """Insert one personal transaction with its rollup and insight updates; returns the stored row"""
+    cursor = conn.cursor()
+    cursor.execute('''
+        INSERT INTO transactions (date, amount, description, category, type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (data['date'], data['amount'], data['description'], 
+          data['category'], data['type']))
+    
+    # Get the new transaction ID
+    transaction_id = cursor.lastrowid
+    
+    # Return the created transaction (as stored, so the rollup sees the same values)
+    cursor.execute(f'SELECT {TRANSACTION_COLUMNS} FROM transactions WHERE id = ?', (transaction_id,))
+    transaction = cursor.fetchone()
+    apply_rollup_delta(cursor, transaction[1], transaction[5], transaction[4], transaction[2], 1)
+    insights_cache.apply_change(
+        cursor, new=(transaction[3], transaction[2], transaction[4], transaction[5])
+    )
+    return transaction
+
 @app.route('/api/transactions', methods=['GET', 'POST'])
+@cached_response('transactions')
 def transactions_api():
     """Handle personal transactions"""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         data = request.get_json()
-        cursor.execute('''
-            INSERT INTO transactions (date, amount, description, category, type)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (data['date'], data['amount'], data['description'], 
-              data['category'], data['type']))
-        conn.commit()
-        
-        # Get the new transaction ID
-        transaction_id = cursor.lastrowid
-        
-        # Return the created transaction
-        cursor.execute('SELECT * FROM transactions WHERE id = ?', (transaction_id,))
-        transaction = cursor.fetchone()
+        transaction = run_write(insert_transaction, data, current_insights_cache())
         
-        conn.close()
         return jsonify({
             'success': True,
-            'transaction': {
-                'id': transaction[0],
-                'date': transaction[1],
-                'amount': transaction[2],
-                'description': transaction[3],
-                'category': transaction[4],
-                'type': transaction[5],
-                'created_at': transaction[6]
-            }
+            'transaction': transaction_to_dict(transaction)
         })
     
-    # GET request - return all transactions
-    cursor.execute('SELECT * FROM transactions ORDER BY date DESC')
-    transactions = cursor.fetchall()
-    
-    result = []
-    for t in transactions:
-        result.append({
-            'id': t[0],
-            'date': t[1],
-            'amount': t[2],
-            'description': t[3],
-            'category': t[4],
-            'type': t[5],
-            'created_at': t[6]
-        })
+    # GET request - all transactions, or one keyset page with ?limit=&after=
+    try:
+        after, limit, output_format = parse_listing_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     
-    conn.close()
-    return jsonify({'transactions': result})
+    sql, params = keyset_query(f'SELECT {TRANSACTION_COLUMNS} FROM transactions', (),
+                               after, limit, output_format)
+    cursor.execute(sql, params)
+    return keyset_listing_response('transactions', cursor, transaction_to_dict, limit, output_format)
 
 @app.route('/api/transactions/<int:transaction_id>', methods=['PUT', 'DELETE'])
 def transaction_detail(transaction_id):
     """Handle individual transaction updates/deletes"""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
+    data = request.get_json() if request.method == 'PUT' else None
     
-    if request.method == 'PUT':
-        data = request.get_json()
-        cursor.execute('''
-            UPDATE transactions 
-            SET date=?, amount=?, description=?, category=?, type=? 
-            WHERE id=?
-        ''', (data['date'], data['amount'], data['description'],
-              data['category'], data['type'], transaction_id))
+    # Take the write lock before reading the current values, so no other
+    # writer can change the row between that read and the rollup and insight
+    # deltas computed from it
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        cursor.execute('SELECT date, amount, category, type, description FROM transactions WHERE id=?',
+                       (transaction_id,))
+        existing = cursor.fetchone()
+        
+        if request.method == 'PUT':
+            cursor.execute('''
+                UPDATE transactions 
+                SET date=?, amount=?, description=?, category=?, type=? 
+                WHERE id=?
+            ''', (data['date'], data['amount'], data['description'],
+                  data['category'], data['type'], transaction_id))
+            if existing:
+                apply_rollup_delta(cursor, existing[0], existing[3], existing[2], -existing[1], -1)
+                cursor.execute('SELECT date, amount, category, type, description FROM transactions WHERE id=?',
+                               (transaction_id,))
+                updated = cursor.fetchone()
+                apply_rollup_delta(cursor, updated[0], updated[3], updated[2], updated[1], 1)
+                current_insights_cache().apply_change(
+                    cursor,
+                    old=(existing[4], existing[1], existing[2], existing[3]),
+                    new=(updated[4], updated[1], updated[2], updated[3])
+                )
+        else:
+            cursor.execute('DELETE FROM transactions WHERE id=?', (transaction_id,))
+            if existing:
+                apply_rollup_delta(cursor, existing[0], existing[3], existing[2], -existing[1], -1)
+                current_insights_cache().apply_change(
+                    cursor, old=(existing[4], existing[1], existing[2], existing[3])
+                )
         conn.commit()
-        conn.close()
-        return jsonify({'success': True})
+    except Exception:
+        conn.rollback()
+        raise
+    return jsonify({'success': True})
+
+# Bank statement import (CSV / OFX)
+STATEMENT_COLUMNS = {
+    'date': ('date', 'transaction date', 'txn date', 'value date', 'posting date', 'posted date'),
+    'description': ('description', 'narration', 'details', 'particulars', 'remarks', 'memo', 'name'),
+    'amount': ('amount', 'transaction amount', 'amt'),
+    'debit': ('debit', 'debit amount', 'withdrawal', 'withdrawal amt', 'withdrawal amount', 'dr'),
+    'credit': ('credit', 'credit amount', 'deposit', 'deposit amt', 'deposit amount', 'cr'),
+    'type': ('type', 'transaction type', 'dr/cr', 'cr/dr'),
+    'category': ('category',),
+}
+STATEMENT_DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y', '%d-%m-%y',
+                          '%d %b %Y', '%d-%b-%Y', '%d-%b-%y', '%Y/%m/%d')
+INCOME_TYPE_WORDS = ('income', 'credit', 'cr', 'deposit')
+EXPENSE_TYPE_WORDS = ('expense', 'debit', 'dr', 'withdrawal')
+
+def parse_statement_date(value):
+    value = value.strip()
+    for date_format in STATEMENT_DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    raise ValueError(f'unrecognised date {value!r}')
+
+def parse_statement_amount(value):
+    """Parse '1,234.50', '₹ 99', '(12.00)' or '45.00 Dr' into a signed float"""
+    text = value.strip().replace(',', '').replace('₹', '').replace('INR', '').replace('Rs.', '').strip()
+    sign = 1
+    if text.startswith('(') and text.endswith(')'):
+        text, sign = text[1:-1], -1
+    lowered = text.lower()
+    if lowered.endswith('dr'):
+        text, sign = text[:-2], -1
+    elif lowered.endswith('cr'):
+        text = text[:-2]
+    return sign * float(text.strip())
+
+def parse_csv_statement(stream):
+    """Yield (line, row, error) from a CSV bank statement, one record at a time.
+
+    row is a dict with date, amount (positive), description, type and category
+    (None when the file has no category column); error is set instead of row
+    when a record cannot be parsed.
+    """
+    reader = csv.reader(stream)
+    header = [name.strip().lower() for name in next(reader, [])]
+    columns = {}
+    for field, candidates in STATEMENT_COLUMNS.items():
+        for candidate in candidates:
+            if candidate in header:
+                columns[field] = header.index(candidate)
+                break
+    if 'date' not in columns or 'description' not in columns:
+        raise ValueError('CSV needs date and description columns')
+    if 'amount' not in columns and 'debit' not in columns and 'credit' not in columns:
+        raise ValueError('CSV needs an amount column or debit/credit columns')
+
+    def cell(record, field):
+        index = columns.get(field)
+        return record[index].strip() if index is not None and index < len(record) else ''
+
+    for line, record in enumerate(reader, start=2):
+        if not any(value.strip() for value in record):
+            continue
+        try:
+            debit, credit = cell(record, 'debit'), cell(record, 'credit')
+            if debit and parse_statement_amount(debit):
+                amount, type_ = abs(parse_statement_amount(debit)), 'expense'
+            elif credit and parse_statement_amount(credit):
+                amount, type_ = abs(parse_statement_amount(credit)), 'income'
+            else:
+                signed = parse_statement_amount(cell(record, 'amount'))
+                type_word = cell(record, 'type').lower()
+                if type_word in INCOME_TYPE_WORDS:
+                    type_ = 'income'
+                elif type_word in EXPENSE_TYPE_WORDS:
+                    type_ = 'expense'
+                else:
+                    type_ = 'expense' if signed < 0 else 'income'
+                amount = abs(signed)
+            if not amount:
+                raise ValueError('zero amount')
+            description = cell(record, 'description')
+            if not description:
+                raise ValueError('missing description')
+            yield line, {
+                'date': parse_statement_date(cell(record, 'date')),
+                'amount': amount,
+                'description': description,
+                'type': type_,
+                'category': cell(record, 'category') or None
+            }, None
+        except ValueError as e:
+            yield line, None, f'line {line}: {e}'
+
+OFX_TAG_PATTERN = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+def parse_ofx_statement(stream):
+    """Yield (line, row, error) for each <STMTTRN> in an OFX file (SGML or XML)"""
+    current = None
+    for line, text in enumerate(stream, start=1):
+        for closing, tag, value in OFX_TAG_PATTERN.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current = {'line': line}
+                    continue
+                if current is not None:
+                    yield _ofx_transaction(current)
+                current = None
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+    if current is not None:
+        yield _ofx_transaction(current)
+
+def _ofx_transaction(fields):
+    line = fields['line']
+    try:
+        signed = parse_statement_amount(fields.get('TRNAMT', ''))
+        if not signed:
+            raise ValueError('zero amount')
+        posted = fields.get('DTPOSTED', '')
+        date_value = datetime.strptime(posted[:8], '%Y%m%d').strftime('%Y-%m-%d')
+        parts = [fields.get('NAME'), fields.get('MEMO')]
+        description = ' '.join(dict.fromkeys(part for part in parts if part))
+        if not description:
+            raise ValueError('missing NAME/MEMO')
+        return line, {
+            'date': date_value,
+            'amount': abs(signed),
+            'description': description,
+            'type': 'expense' if signed < 0 else 'income',
+            'category': None
+        }, None
+    except ValueError as e:
+        return line, None, f'line {line}: {e}'
+
+def detect_statement_format(filename, first_chunk):
+    """Pick 'ofx' or 'csv' from the file name, falling back to sniffing the content"""
+    name = (filename or '').lower()
+    if name.endswith(('.ofx', '.qfx')):
+        return 'ofx'
+    if name.endswith('.csv'):
+        return 'csv'
+    head = first_chunk.lstrip().upper()
+    return 'ofx' if head.startswith(('OFXHEADER', '<OFX', '<?XML')) else 'csv'
+
+def iter_import_transactions(conn, records, user_id='default', batch_size=2000, categorizer=None):
+    """Insert parsed statement records in batches, yielding running stats after each.
+
+    Each batch is categorized with one categorize_many call, deduplicated
+    against rows already stored for the same dates, inserted with executemany
+    and folded into daily_rollups, all in one database transaction. Identical
+    rows within the file are kept as long as they outnumber the stored copies,
+    so re-importing a statement inserts nothing while genuine repeats survive.
+    The last item yielded is the final summary, with 'done' set. categorizer
+    defaults to the current request's (or, outside a request, the default one).
+    """
+    categorizer = categorizer or current_categorizer()
+    started = time.monotonic()
+    stats = {'rows_read': 0, 'inserted': 0, 'duplicates': 0, 'invalid': 0, 'errors': [], 'done': False}
+    existing_by_date = {}
+    seen = defaultdict(int)
+
+    def flush(batch):
+        if not batch:
+            return
+        missing = [row for row in batch if not row['category']]
+        if missing:
+            suggestions = categorizer.categorize_many(
+                [row['description'] for row in missing],
+                [row['amount'] if row['type'] == 'income' else -row['amount'] for row in missing],
+                user_id
+            )
+            for row, suggestion in zip(missing, suggestions):
+                row['category'] = suggestion['suggested_category']
+
+        new_dates = sorted({row['date'] for row in batch} - existing_by_date.keys())
+        for date_value in new_dates:
+            existing_by_date[date_value] = defaultdict(int)
+        for start in range(0, len(new_dates), 500):
+            chunk = new_dates[start:start + 500]
+            for key in conn.execute(f'''
+                SELECT date, amount, description, type FROM transactions
+                WHERE date IN ({','.join('?' * len(chunk))})
+            ''', chunk):
+                existing_by_date[key[0]][key] += 1
+
+        to_insert = []
+        rollups = defaultdict(lambda: [0.0, 0])
+        for row in batch:
+            key = (row['date'], row['amount'], row['description'], row['type'])
+            seen[key] += 1
+            if seen[key] <= existing_by_date[row['date']][key]:
+                stats['duplicates'] += 1
+                continue
+            to_insert.append((row['date'], row['amount'], row['description'], row['category'], row['type']))
+            rollup = rollups[(row['date'], row['type'], row['category'])]
+            rollup[0] += row['amount']
+            rollup[1] += 1
+
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('''
+                INSERT INTO transactions (date, amount, description, category, type)
+                VALUES (?, ?, ?, ?, ?)
+            ''', to_insert)
+            cursor = conn.cursor()
+            for (date_value, type_, category), (total, count) in rollups.items():
+                apply_rollup_delta(cursor, date_value, type_, category, total, count)
+            if to_insert:
+                # Cheaper to let the next insights read rebuild from the cache
+                conn.execute('DELETE FROM insight_state')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        stats['inserted'] += len(to_insert)
+
+    batch = []
+    for line, row, error in records:
+        stats['rows_read'] += 1
+        if error:
+            stats['invalid'] += 1
+            if len(stats['errors']) < 20:
+                stats['errors'].append(error)
+            continue
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+            yield dict(stats, errors=list(stats['errors']),
+                       elapsed=round(time.monotonic() - started, 3))
+    flush(batch)
+
+    elapsed = time.monotonic() - started
+    stats['elapsed'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['rows_read'] / elapsed, 1) if elapsed else None
+    stats['done'] = True
+    yield stats
+
+def import_transactions(conn, records, user_id='default', batch_size=2000, progress=None,
+                        categorizer=None):
+    """Run a whole import; progress(stats) is called after every batch. Returns the summary."""
+    for stats in iter_import_transactions(conn, records, user_id, batch_size, categorizer):
+        if stats['done']:
+            return stats
+        if progress:
+            progress(stats)
+
+def open_statement(binary_stream, filename=None, statement_format=None):
+    """Wrap an uploaded/opened binary file and return (format, record iterator)"""
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8-sig', errors='replace', newline='')
+    first_chunk = text_stream.readline()
+    statement_format = statement_format or detect_statement_format(filename, first_chunk)
+    lines = itertools.chain([first_chunk], text_stream)
+    if statement_format == 'ofx':
+        return statement_format, parse_ofx_statement(lines)
+    if statement_format == 'csv':
+        return statement_format, parse_csv_statement(lines)
+    raise ValueError('format must be csv or ofx')
+
+@app.route('/api/transactions/import', methods=['POST'])
+def import_transactions_api():
+    """Import a CSV/OFX bank statement uploaded as multipart field 'file'.
+
+    ?format=csv|ofx overrides detection, ?user_id= picks whose learned
+    categories apply, and ?progress=ndjson streams a progress line per batch
+    followed by the summary.
+    """
+    upload = request.files.get('file')
+    if upload is None:
+        return jsonify({'success': False, 'error': 'Upload the statement as form field "file"'}), 400
     
-    if request.method == 'DELETE':
-        cursor.execute('DELETE FROM transactions WHERE id=?', (transaction_id,))
-        conn.commit()
-        conn.close()
-        return jsonify({'success': True})
+    user_id = request.args.get('user_id', 'default')
+    stream_progress = request.args.get('progress') == 'ndjson'
+    source = upload.stream
+    if stream_progress:
+        # Uploaded files are closed when the view returns, before a streamed
+        # body is consumed, so spool the upload to a temporary file we own
+        source = tempfile.TemporaryFile()
+        shutil.copyfileobj(upload.stream, source)
+        source.seek(0)
+    try:
+        statement_format, records = open_statement(source, upload.filename,
+                                                   request.args.get('format'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    conn = get_db()
+    
+    if stream_progress:
+        def generate():
+            try:
+                for stats in iter_import_transactions(conn, records, user_id):
+                    if stats['done']:
+                        yield json.dumps({'success': True, 'format': statement_format,
+                                          'summary': stats}, sort_keys=True) + '\n'
+                    else:
+                        yield json.dumps({'progress': stats}, sort_keys=True) + '\n'
+            except ValueError as e:
+                yield json.dumps({'success': False, 'error': str(e)}) + '\n'
+            except Exception as e:
+                # The 200 status has gone out; end the stream with an error line
+                # (batches already committed stay imported)
+                print(f"Error importing statement: {e}")
+                if conn.in_transaction:
+                    conn.rollback()
+                yield json.dumps({'success': False, 'error': 'Failed to import statement'}) + '\n'
+            finally:
+                source.close()
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    
+    try:
+        summary = import_transactions(conn, records, user_id)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        print(f"Error importing statement: {e}")
+        return jsonify({'success': False, 'error': 'Failed to import statement'}), 500
+    
+    return jsonify({'success': True, 'format': statement_format, 'summary': summary})
 
 # Analytics API Routes
-@app.route('/api/analytics/personal')
-def personal_analytics_api():
-    """Get personal finance analytics data"""
-    conn = sqlite3.connect('database.db')
+ANALYTICS_PERIODS = {'7d': 7, '30d': 30, '90d': 90, '1y': 365}
+
+# SQL expression bucketing a date column by trend granularity
+# (weeks are keyed by their Monday, months by YYYY-MM)
+TREND_BUCKETS = {
+    'day': 'date',
+    'week': "date(date, '-6 days', 'weekday 1')",
+    'month': 'substr(date, 1, 7)',
+}
+
+def personal_analytics_summary(conn, start_date, end_date=None, granularity='day'):
+    """Aggregate personal transactions between two dates (inclusive) in SQL.
+
+    Reads the daily rollups, so the cost follows the number of days in the
+    window rather than the number of transactions. Only grouped totals leave
+    the database: one row per type, per trend bucket and per expense category.
+    """
+    conditions = 'date >= ?'
+    params = [start_date]
+    if end_date:
+        conditions += ' AND date <= ?'
+        params.append(end_date)
+    
     cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT type, SUM(total), SUM(count) FROM daily_rollups
+        WHERE {conditions}
+        GROUP BY type
+    ''', params)
+    totals_by_type = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    income_total = totals_by_type.get('income', (0, 0))[0]
+    expense_total = totals_by_type.get('expense', (0, 0))[0]
+    transaction_count = sum(count for _, count in totals_by_type.values())
     
-    period = request.args.get('period', '30d')
+    # Spending trend
+    bucket = TREND_BUCKETS[granularity]
+    cursor.execute(f'''
+        SELECT {bucket} AS bucket, SUM(total) FROM daily_rollups
+        WHERE type = 'expense' AND {conditions}
+        GROUP BY bucket
+    ''', params)
+    daily_spending = dict(cursor.fetchall())
     
-    # Calculate date range
-    end_date = datetime.now()
-    if period == '7d':
-        start_date = end_date - timedelta(days=7)
-    elif period == '30d':
-        start_date = end_date - timedelta(days=30)
-    elif period == '90d':
-        start_date = end_date - timedelta(days=90)
-    elif period == '1y':
-        start_date = end_date - timedelta(days=365)
-    else:
-        start_date = end_date - timedelta(days=30)
+    # Category breakdown
+    cursor.execute(f'''
+        SELECT category, SUM(total) FROM daily_rollups
+        WHERE type = 'expense' AND {conditions}
+        GROUP BY category
+    ''', params)
+    category_spending = dict(cursor.fetchall())
     
-    start_date_str = start_date.strftime('%Y-%m-%d')
+    # Top categories
+    top_categories = sorted(category_spending.items(), key=lambda x: x[1], reverse=True)[:5]
     
-    # Get transactions in period
-    cursor.execute('''
-        SELECT * FROM transactions 
-        WHERE date >= ? 
-        ORDER BY date DESC
-    ''', (start_date_str,))
+    return {
+        'income_total': income_total,
+        'expense_total': expense_total,
+        'balance': income_total - expense_total,
+        'daily_spending': daily_spending,
+        'category_spending': category_spending,
+        'top_categories': top_categories,
+        'transaction_count': transaction_count,
+        'granularity': granularity,
+        'start': start_date,
+        'end': end_date
+    }
+
+def parse_iso_date(value, name):
+    """Validate a YYYY-MM-DD query parameter; raises ValueError with a clear message"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        raise ValueError(f'{name} must be a date in YYYY-MM-DD format')
+
+class AnalyticsSnapshot:
+    """Columnar in-memory copy of the transactions table for vectorized analytics.
+
+    Rows are kept in id order as numpy columns: the amount as float64, and the
+    date, type and category as int32 codes into small dictionaries. A date code
+    stands for the stored date text, so date windows and trend buckets follow
+    the same text comparisons and SQL bucket expressions as the daily rollups,
+    odd dates included. refresh() appends rows past the id high-water mark and
+    re-reads rows the transaction_changes log (filled by triggers) reports as
+    edited or deleted, so keeping up costs the number of writes, not the size
+    of the table.
+
+    From the columns, one bincount builds a (date, type, category) cube of
+    totals and counts; writes adjust a copy of it. Each refresh ends by
+    publishing the cube in a single assignment and summary() reads only what
+    was published, so readers never wait for a refresh, not even a full
+    reload. A table of more than max_rows live rows is not copied at all.
+    """
+    MISSING_DATE = -1
+    ROW_SQL = 'SELECT id, date, amount, type, category FROM transactions'
     
-    transactions = cursor.fetchall()
+    def __init__(self, max_rows=None):
+        self.max_rows = app.config['ANALYTICS_SNAPSHOT_MAX_ROWS'] if max_rows is None else max_rows
+        # Held by the one thread catching the columns up
+        self.refresh_lock = threading.Lock()
+        # (version, date labels by code, codes in label order, labels in order,
+        #  week buckets by code, totals, counts, type names, category names)
+        self.published = None
+        self.too_large = False
+        self.reset()
     
-    # Process data
-    income_total = sum(t[2] for t in transactions if t[5] == 'income')
-    expense_total = sum(t[2] for t in transactions if t[5] == 'expense')
+    def reset(self):
+        self.size = 0
+        self.ids = np.empty(0, dtype=np.int64)
+        self.dates = np.empty(0, dtype=np.int32)
+        self.amounts = np.empty(0, dtype=np.float64)
+        self.types = np.empty(0, dtype=np.int32)
+        self.categories = np.empty(0, dtype=np.int32)
+        self.live = np.empty(0, dtype=bool)
+        self.dead = 0
+        self.date_codes, self.date_names, self.date_weeks = {}, [], []
+        self.type_codes, self.type_names = {}, []
+        self.category_codes, self.category_names = {}, []
+        self.max_id = 0
+        self.change_id = 0
+        self.version = None
+        self.cube_totals = None
+        self.cube_counts = None
+        # True while the cube arrays are also the published ones
+        self.cube_shared = False
     
-    # Daily spending trend
-    daily_spending = defaultdict(float)
-    for t in transactions:
-        if t[5] == 'expense':
-            daily_spending[t[1]] += t[2]
+    @staticmethod
+    def _encode(codes, names, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
     
-    # Category breakdown
-    category_spending = defaultdict(float)
-    for t in transactions:
-        if t[5] == 'expense':
-            category_spending[t[4]] += t[2]
+    def _columns(self, rows):
+        """(ids, dates, amounts, types, categories) arrays for (id, date, amount, type, category) rows"""
+        count = len(rows)
+        return (
+            np.fromiter((row[0] for row in rows), dtype=np.int64, count=count),
+            # A date that isn't text never passes the rollups' text comparisons
+            np.fromiter((self._encode(self.date_codes, self.date_names, row[1]) if isinstance(row[1], str)
+                         else self.MISSING_DATE for row in rows), dtype=np.int32, count=count),
+            np.fromiter((row[2] or 0.0 for row in rows), dtype=np.float64, count=count),
+            np.fromiter((self._encode(self.type_codes, self.type_names, row[3]) for row in rows),
+                        dtype=np.int32, count=count),
+            np.fromiter((self._encode(self.category_codes, self.category_names, row[4]) for row in rows),
+                        dtype=np.int32, count=count),
+        )
     
-    # Top categories
-    top_categories = sorted(category_spending.items(), key=lambda x: x[1], reverse=True)[:5]
+    def _append(self, rows):
+        ids, dates, amounts, types, categories = self._columns(rows)
+        needed = self.size + len(ids)
+        if needed > len(self.ids):
+            capacity = max(needed, 2 * len(self.ids), 1024)
+            for name in ('ids', 'dates', 'amounts', 'types', 'categories', 'live'):
+                column = getattr(self, name)
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                setattr(self, name, grown)
+        window = slice(self.size, needed)
+        self.ids[window], self.dates[window], self.amounts[window] = ids, dates, amounts
+        self.types[window], self.categories[window] = types, categories
+        self.live[window] = True
+        self.size = needed
+        self.max_id = int(ids[-1])
+        self._cube_add(dates, types, categories, amounts, 1)
     
-    conn.close()
+    def _apply_changes(self, conn, changed_ids):
+        """Overwrite edited rows in place and mark deleted ones dead"""
+        positions = np.searchsorted(self.ids[:self.size], changed_ids)
+        found = (positions < self.size) & (self.ids[np.minimum(positions, self.size - 1)] == changed_ids)
+        positions, changed_ids = positions[found], changed_ids[found]
+        positions = positions[self.live[positions]]
+        current = {}
+        for start in range(0, len(changed_ids), 500):
+            chunk = [int(transaction_id) for transaction_id in changed_ids[start:start + 500]]
+            placeholders = ','.join('?' * len(chunk))
+            for row in conn.execute(f'{self.ROW_SQL} WHERE id IN ({placeholders})', chunk):
+                current[row[0]] = row
+        
+        # Take the old values out of the cube, then put the current ones back in
+        self._cube_add(self.dates[positions], self.types[positions], self.categories[positions],
+                       self.amounts[positions], -1)
+        deleted = np.array([int(self.ids[position]) not in current for position in positions], dtype=bool)
+        self.live[positions[deleted]] = False
+        self.dead += int(deleted.sum())
+        updated = positions[~deleted]
+        if len(updated):
+            _, dates, amounts, types, categories = self._columns([current[int(self.ids[position])]
+                                                                  for position in updated])
+            self.dates[updated], self.amounts[updated] = dates, amounts
+            self.types[updated], self.categories[updated] = types, categories
+            self._cube_add(dates, types, categories, amounts, 1)
     
-    return jsonify({
-        'success': True,
-        'data': {
+    def _cube_add(self, dates, types, categories, amounts, sign):
+        """Adjust the cube for some rows; marks it for a rebuild if a code has no slot"""
+        if self.cube_totals is None:
+            return
+        valid = dates != self.MISSING_DATE
+        dates, types, categories, amounts = dates[valid], types[valid], categories[valid], amounts[valid]
+        if not len(dates):
+            return
+        date_slots, type_slots, category_slots = self.cube_totals.shape
+        if dates.max() >= date_slots or types.max() >= type_slots or categories.max() >= category_slots:
+            # Out of spare slots: rebuild from the columns at the end of refresh()
+            self.cube_totals = None
+            return
+        if self.cube_shared:
+            # Readers may be using the published arrays; change a copy
+            self.cube_totals, self.cube_counts = self.cube_totals.copy(), self.cube_counts.copy()
+            self.cube_shared = False
+        np.add.at(self.cube_totals, (dates, types, categories), sign * amounts)
+        np.add.at(self.cube_counts, (dates, types, categories), sign)
+    
+    def _build_cube(self):
+        """One bincount over (date, type, category) keys of every live row"""
+        rows = self.live[:self.size] & (self.dates[:self.size] != self.MISSING_DATE)
+        # Spare slots so new dates, types or categories do not force a rebuild
+        shape = (len(self.date_names) * 5 // 4 + 64, len(self.type_names) + 2, len(self.category_names) + 8)
+        keys = (self.dates[:self.size][rows].astype(np.int64) * shape[1] + self.types[:self.size][rows]) \
+            * shape[2] + self.categories[:self.size][rows]
+        cells = shape[0] * shape[1] * shape[2]
+        self.cube_totals = np.bincount(keys, weights=self.amounts[:self.size][rows], minlength=cells).reshape(shape)
+        self.cube_counts = np.bincount(keys, minlength=cells).reshape(shape)
+        self.cube_shared = False
+    
+    def refresh(self, conn):
+        """Catch up with the table and publish the cube, after any refresh in progress"""
+        with self.refresh_lock:
+            self._refresh(conn)
+    
+    def _refresh(self, conn):
+        """Catch up with the table; a no-op unless the transactions version moved"""
+        if self.too_large:
+            return
+        version = data_versions(conn, ('transactions',))[0]
+        if version == self.version:
+            return
+        
+        # One read snapshot so the change log, new rows and version agree
+        conn.execute('BEGIN')
+        try:
+            version = data_versions(conn, ('transactions',))[0]
+            first_change, last_change = conn.execute(
+                'SELECT MIN(id), MAX(id) FROM transaction_changes'
+            ).fetchone()
+            # A full load when starting out, or if the log was pruned past what we applied;
+            # the published cube keeps answering until the new one replaces it
+            full = self.version is None or (first_change is not None and first_change > self.change_id + 1)
+            if full:
+                self.reset()
+            elif last_change is not None and last_change > self.change_id:
+                changed_ids = np.unique(np.fromiter((row[0] for row in conn.execute(
+                    'SELECT transaction_id FROM transaction_changes WHERE id > ? AND transaction_id <= ?',
+                    (self.change_id, self.max_id)
+                )), dtype=np.int64))
+                if len(changed_ids):
+                    self._apply_changes(conn, changed_ids)
+            
+            cursor = conn.execute(f'{self.ROW_SQL} WHERE id > ? ORDER BY id', (self.max_id,))
+            for rows in iter(lambda: cursor.fetchmany(50000), []):
+                self._append(rows)
+                if self.size - self.dead > self.max_rows:
+                    # Too big to copy into every worker: analytics read the rollups instead
+                    print(f"Analytics snapshot off: more than {self.max_rows} transactions")
+                    self.too_large = True
+                    self.published = None
+                    self.reset()
+                    return
+            self.change_id = last_change or 0
+            self.version = version
+        finally:
+            conn.rollback()
+        
+        prune_change_log(conn, 'transaction_changes', self.change_id)
+        if self.dead > max(1024, self.size // 4):
+            self._compact()
+        if self.cube_totals is None:
+            self._build_cube()
+        self._publish(conn)
+    
+    def _publish(self, conn):
+        """Make the current cube the one summary() reads, in one assignment"""
+        new_dates = self.date_names[len(self.date_weeks):]
+        if new_dates:
+            # Week buckets come from the same SQL expression the rollups group by
+            self.date_weeks.extend(week for _, week in conn.execute(
+                f"SELECT key, {TREND_BUCKETS['week']} FROM (SELECT key, value AS date FROM json_each(?)) ORDER BY key",
+                (json.dumps(new_dates),)
+            ))
+        published = self.published
+        if published is not None and not new_dates and len(published[1]) == len(self.date_names):
+            labels, order, sorted_labels, weeks = published[1:5]
+        else:
+            labels = np.array(self.date_names, dtype=str)
+            order = np.argsort(labels, kind='stable')
+            sorted_labels = labels[order]
+            weeks = np.array(self.date_weeks, dtype=object)
+        self.published = (self.version, labels, order, sorted_labels, weeks, self.cube_totals, self.cube_counts,
+                          list(self.type_names), list(self.category_names))
+        self.cube_shared = True
+    
+    def _compact(self):
+        keep = np.flatnonzero(self.live[:self.size])
+        for name in ('ids', 'dates', 'amounts', 'types', 'categories', 'live'):
+            setattr(self, name, getattr(self, name)[keep].copy())
+        self.size = len(keep)
+        self.dead = 0
+    
+    def summary(self, conn, start_date, end_date=None, granularity='day'):
+        """Same result as personal_analytics_summary, from the published cube.
+
+        Returns None when the cube can't answer: the table has more than
+        max_rows rows, or another request is still catching up (a full reload,
+        say) and the published cube is behind the table. Use the rollups then.
+        """
+        if self.refresh_lock.acquire(blocking=False):
+            try:
+                self._refresh(conn)
+            finally:
+                self.refresh_lock.release()
+            published = self.published
+        else:
+            published = self.published
+            if published is not None and published[0] != data_versions(conn, ('transactions',))[0]:
+                published = None
+        if published is None:
+            return None
+        
+        _, labels, order, sorted_labels, weeks, totals, counts, type_names, category_names = published
+        # Text comparison, as `date >= ? AND date <= ?` on the rollups
+        first = np.searchsorted(sorted_labels, start_date)
+        last = np.searchsorted(sorted_labels, end_date, side='right') if end_date else len(sorted_labels)
+        codes = order[first:last]
+        totals, counts = totals[codes], counts[codes]
+        
+        type_totals = totals.sum(axis=(0, 2))
+        type_counts = counts.sum(axis=(0, 2))
+        totals_by_type = {name: float(type_totals[code]) for code, name in enumerate(type_names)
+                          if type_counts[code]}
+        income_total = totals_by_type.get('income', 0)
+        expense_total = totals_by_type.get('expense', 0)
+        
+        if 'expense' in type_names:
+            expense_code = type_names.index('expense')
+            expense_totals, expense_counts = totals[:, expense_code, :], counts[:, expense_code, :]
+        else:
+            expense_totals = expense_counts = np.zeros((len(codes), 1))
+        
+        # Spending trend: per-date expense totals, regrouped as TREND_BUCKETS does
+        if granularity == 'week':
+            buckets = weeks[codes]
+        elif granularity == 'month':
+            buckets = [str(label)[:7] for label in labels[codes]]
+        else:
+            buckets = [str(label) for label in labels[codes]]
+        daily_spending = {}
+        for bucket, total, count in zip(buckets, expense_totals.sum(axis=1), expense_counts.sum(axis=1)):
+            if count:
+                daily_spending[bucket] = daily_spending.get(bucket, 0.0) + float(total)
+        
+        category_totals, category_counts = expense_totals.sum(axis=0), expense_counts.sum(axis=0)
+        category_spending = {category_names[code]: float(category_totals[code])
+                             for code in sorted(np.flatnonzero(category_counts),
+                                                key=lambda code: category_names[code])}
+        top_categories = sorted(category_spending.items(), key=lambda x: x[1], reverse=True)[:5]
+        
+        return {
             'income_total': income_total,
             'expense_total': expense_total,
             'balance': income_total - expense_total,
-            'daily_spending': dict(daily_spending),
-            'category_spending': dict(category_spending),
+            'daily_spending': daily_spending,
+            'category_spending': category_spending,
             'top_categories': top_categories,
-            'transaction_count': len(transactions)
+            'transaction_count': int(type_counts.sum()),
+            'granularity': granularity,
+            'start': start_date,
+            'end': end_date
         }
+
+# Snapshots of unsharded databases, by path (shards keep theirs in ShardRouter)
+analytics_snapshots = {}
+
+def current_analytics():
+    """Analytics snapshot for the current request's database"""
+    return ((has_app_context() and g.get('analytics'))
+            or analytics_snapshots.setdefault(current_db_path(), AnalyticsSnapshot()))
+
+@app.route('/api/analytics/personal')
+@cached_response('transactions')
+def personal_analytics_api():
+    """Get personal finance analytics data.
+
+    ?period=7d|30d|90d|1y picks a window ending today; ?start=&end= (YYYY-MM-DD,
+    inclusive) pick an arbitrary one. ?granularity=day|week|month sets the
+    spending trend buckets.
+    """
+    period = request.args.get('period', '30d')
+    granularity = request.args.get('granularity', 'day')
+    
+    try:
+        if granularity not in TREND_BUCKETS:
+            raise ValueError('granularity must be day, week or month')
+        
+        # Calculate date range
+        if request.args.get('start'):
+            start_date_str = parse_iso_date(request.args['start'], 'start')
+        else:
+            days = ANALYTICS_PERIODS.get(period, 30)
+            start_date_str = (datetime.now() - timedelta(days=days)).strftime('%Y-%m-%d')
+        end_date_str = None
+        if request.args.get('end'):
+            end_date_str = parse_iso_date(request.args['end'], 'end')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    data = None
+    if app.config['ANALYTICS_SNAPSHOT']:
+        # None while the snapshot can't answer (too many rows, or another request reloading it)
+        data = current_analytics().summary(get_db(), start_date_str, end_date_str, granularity)
+    if data is None:
+        data = personal_analytics_summary(get_db(), start_date_str, end_date_str, granularity)
+    return jsonify({
+        'success': True,
+        'data': data
     })
 
 # API Routes for Customers (Khatabook)
+CUSTOMER_COLUMNS = 'id, name, phone, business, email, balance, created_at'
+CUSTOMER_SEARCH_DEFAULT_LIMIT = 20
+CUSTOMER_SEARCH_MAX_LIMIT = 100
+
+def customer_to_dict(c):
+    """Convert a customer row to a dictionary"""
+    return {
+        'id': c[0],
+        'name': c[1],
+        'phone': c[2],
+        'business': c[3],
+        'email': c[4],
+        'balance': c[5],
+        'created_at': c[6]
+    }
+
 @app.route('/api/customers', methods=['GET', 'POST'])
+@cached_response('customers')
 def customers_api():
     """Handle customer management"""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     if request.method == 'POST':
@@ -600,137 +3668,1055 @@ def customers_api():
         conn.commit()
         
         customer_id = cursor.lastrowid
-        cursor.execute('SELECT * FROM customers WHERE id = ?', (customer_id,))
+        cursor.execute(f'SELECT {CUSTOMER_COLUMNS} FROM customers WHERE id = ?', (customer_id,))
         customer = cursor.fetchone()
         
-        conn.close()
         return jsonify({
             'success': True,
-            'customer': {
-                'id': customer[0],
-                'name': customer[1],
-                'phone': customer[2],
-                'business': customer[3],
-                'email': customer[4],
-                'balance': customer[5],
-                'created_at': customer[6]
-            }
+            'customer': customer_to_dict(customer)
         })
     
-    # GET request
-    cursor.execute('SELECT * FROM customers ORDER BY name')
-    customers = cursor.fetchall()
-    
-    result = []
-    for c in customers:
-        result.append({
-            'id': c[0],
-            'name': c[1],
-            'phone': c[2],
-            'business': c[3],
-            'email': c[4],
-            'balance': c[5],
-            'created_at': c[6]
-        })
+    # GET request - typeahead on name or phone prefix with ?q=
+    query = request.args.get('q', '').strip()
+    if query:
+        limit = request.args.get('limit', str(CUSTOMER_SEARCH_DEFAULT_LIMIT))
+        if not limit.isdigit() or int(limit) < 1:
+            return jsonify({'success': False, 'error': 'limit must be a positive integer'}), 400
+        limit = min(int(limit), CUSTOMER_SEARCH_MAX_LIMIT)
+        
+        phone = re.sub(r'[\s-]', '', query)
+        if re.fullmatch(r'\+?\d+', phone):
+            # Phone numbers: GLOB is case-sensitive, so it can use the plain phone index
+            cursor.execute(f'''
+                SELECT {CUSTOMER_COLUMNS} FROM customers WHERE phone GLOB ?
+                ORDER BY phone, id LIMIT ?
+            ''', (phone + '*', limit))
+        else:
+            # LIKE is case-insensitive, served by the NOCASE name index
+            pattern = re.sub(r'([\\%_])', r'\\\1', query) + '%'
+            cursor.execute(f'''
+                SELECT {CUSTOMER_COLUMNS} FROM customers WHERE name LIKE ? ESCAPE '\\'
+                ORDER BY name COLLATE NOCASE, id LIMIT ?
+            ''', (pattern, limit))
+        return jsonify({'customers': [customer_to_dict(c) for c in cursor.fetchall()]})
     
-    conn.close()
-    return jsonify({'customers': result})
+    cursor.execute(f'SELECT {CUSTOMER_COLUMNS} FROM customers ORDER BY name')
+    return jsonify({'customers': [customer_to_dict(c) for c in cursor.fetchall()]})
+
+@app.route('/api/customers/top')
+@cached_response('customers')
+def top_customers_api():
+    """Customers with the largest balances, paged from the balance index.
+
+    ?side=debtors (default) lists who owes you most; ?side=creditors lists whom
+    you owe most. ?limit= and ?after=<balance>,<id> (the next_cursor of the
+    previous page) page through the list.
+    """
+    side = request.args.get('side', 'debtors')
+    if side not in ('debtors', 'creditors'):
+        return jsonify({'success': False, 'error': 'side must be debtors or creditors'}), 400
+    
+    limit = request.args.get('limit', str(CUSTOMER_SEARCH_DEFAULT_LIMIT))
+    if not limit.isdigit() or int(limit) < 1:
+        return jsonify({'success': False, 'error': 'limit must be a positive integer'}), 400
+    limit = min(int(limit), LISTING_MAX_LIMIT)
+    
+    after = request.args.get('after')
+    if after:
+        after_balance, _, after_id = after.rpartition(',')
+        try:
+            after = (float(after_balance), int(after_id))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'after must look like <balance>,<id>'}), 400
+    
+    if side == 'debtors':
+        sql = f'SELECT {CUSTOMER_COLUMNS} FROM customers WHERE balance > 0'
+        if after:
+            sql += ' AND (balance, id) < (?, ?)'
+        sql += ' ORDER BY balance DESC, id DESC LIMIT ?'
+    else:
+        sql = f'SELECT {CUSTOMER_COLUMNS} FROM customers WHERE balance < 0'
+        if after:
+            sql += ' AND (balance, id) > (?, ?)'
+        sql += ' ORDER BY balance, id LIMIT ?'
+    params = (*(after or ()), limit + 1)
+    
+    customers = [customer_to_dict(c) for c in get_db().execute(sql, params).fetchall()]
+    next_cursor = None
+    if len(customers) > limit:
+        customers = customers[:limit]
+        next_cursor = f"{customers[-1]['balance']!r},{customers[-1]['id']}"
+    return jsonify({'customers': customers, 'next_cursor': next_cursor})
+
+def insert_customer_transaction(conn, customer_id, data):
+    """Record a credit/payment entry and move the customer's balance; returns the entry id"""
+    cursor = conn.cursor()
+    
+    # Add transaction
+    cursor.execute('''
+        INSERT INTO customer_transactions (customer_id, date, amount, description, type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (customer_id, data['date'], data['amount'], 
+          data['description'], data['type']))
+    transaction_id = cursor.lastrowid
+    
+    # Update customer balance
+    if data['type'] == 'credit':
+        # You gave credit - they owe you more
+        cursor.execute('UPDATE customers SET balance = balance + ? WHERE id = ?',
+                     (data['amount'], customer_id))
+    else:  # payment
+        # You received payment - they owe you less
+        cursor.execute('UPDATE customers SET balance = balance - ? WHERE id = ?',
+                     (data['amount'], customer_id))
+    return transaction_id
 
 @app.route('/api/customers/<int:customer_id>/transactions', methods=['GET', 'POST'])
 def customer_transactions_api(customer_id):
     """Handle customer transactions (Give Credit / Receive Payment)"""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     
     if request.method == 'POST':
         data = request.get_json()
-        
-        # Add transaction
-        cursor.execute('''
+        transaction_id = run_write(insert_customer_transaction, customer_id, data)
+        return jsonify({'success': True, 'transaction_id': transaction_id})
+    
+    # GET request - customer's transactions, optionally one keyset page
+    try:
+        after, limit, output_format = parse_listing_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    sql, params = keyset_query(f'SELECT {CUSTOMER_TRANSACTION_COLUMNS} FROM customer_transactions',
+                               (customer_id,), after, limit, output_format,
+                               filters=('customer_id = ?',))
+    cursor.execute(sql, params)
+    return keyset_listing_response('transactions', cursor, customer_transaction_to_dict,
+                                   limit, output_format)
+
+# Bulk khatabook entry and balance reconciliation
+KHATABOOK_ENTRY_TYPES = ('credit', 'payment')
+
+def validate_khatabook_entries(entries):
+    """Normalize bulk entries to insert tuples; returns (rows, errors)"""
+    rows = []
+    errors = []
+    for index, entry in enumerate(entries):
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError('entry must be an object')
+            customer_id = int(entry['customer_id'])
+            amount = float(entry['amount'])
+            # float() accepts 'nan', 'inf' and 1e309; none of them is an amount
+            if not math.isfinite(amount):
+                raise ValueError('amount must be a finite number')
+            if amount <= 0:
+                raise ValueError('amount must be positive')
+            if entry['type'] not in KHATABOOK_ENTRY_TYPES:
+                raise ValueError('type must be credit or payment')
+            date_value = parse_iso_date(str(entry['date']), 'date')
+            rows.append((customer_id, date_value, amount, str(entry.get('description') or ''), entry['type']))
+        except KeyError as e:
+            errors.append({'index': index, 'error': f'missing field {e.args[0]}'})
+        except (TypeError, ValueError) as e:
+            errors.append({'index': index, 'error': str(e)})
+    return rows, errors
+
+def post_khatabook_entries(conn, rows):
+    """Insert entries and apply one aggregated balance update per customer, atomically"""
+    balance_deltas = defaultdict(float)
+    for customer_id, _, amount, _, entry_type in rows:
+        # Credit given: they owe you more. Payment received: they owe you less.
+        balance_deltas[customer_id] += amount if entry_type == 'credit' else -amount
+    
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        conn.executemany('''
             INSERT INTO customer_transactions (customer_id, date, amount, description, type)
             VALUES (?, ?, ?, ?, ?)
-        ''', (customer_id, data['date'], data['amount'], 
-              data['description'], data['type']))
-        
-        # Update customer balance
-        if data['type'] == 'credit':
-            # You gave credit - they owe you more
-            cursor.execute('UPDATE customers SET balance = balance + ? WHERE id = ?',
-                         (data['amount'], customer_id))
-        else:  # payment
-            # You received payment - they owe you less
-            cursor.execute('UPDATE customers SET balance = balance - ? WHERE id = ?',
-                         (data['amount'], customer_id))
-        
+        ''', rows)
+        conn.executemany('UPDATE customers SET balance = balance + ? WHERE id = ?',
+                         [(delta, customer_id) for customer_id, delta in balance_deltas.items()])
         conn.commit()
-        conn.close()
-        return jsonify({'success': True})
+    except Exception:
+        conn.rollback()
+        raise
+    return len(balance_deltas)
+
+def reconcile_customer_balances(conn, tolerance=0.005):
+    """Recompute customers.balance from the ledger with one GROUP BY; returns the fixes made"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        drifted = conn.execute('''
+            SELECT c.id, c.balance, COALESCE(t.balance, 0)
+            FROM customers c
+            LEFT JOIN (
+                SELECT customer_id,
+                       SUM(CASE WHEN type = 'credit' THEN amount ELSE -amount END) AS balance
+                FROM customer_transactions
+                GROUP BY customer_id
+            ) t ON t.customer_id = c.id
+            WHERE ABS(COALESCE(c.balance, 0) - COALESCE(t.balance, 0)) > ?
+        ''', (tolerance,)).fetchall()
+        conn.executemany('UPDATE customers SET balance = ? WHERE id = ?',
+                         [(ledger_balance, customer_id) for customer_id, _, ledger_balance in drifted])
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return [
+        {'customer_id': customer_id, 'stored_balance': stored, 'ledger_balance': ledger_balance}
+        for customer_id, stored, ledger_balance in drifted
+    ]
+
+@app.route('/api/customers/transactions/bulk', methods=['POST'])
+def bulk_customer_transactions_api():
+    """Post many credit/payment entries across customers in one transaction"""
+    data = request.get_json(silent=True) or {}
+    entries = data.get('entries')
+    if not isinstance(entries, list) or not entries:
+        return jsonify({'success': False, 'error': 'entries must be a non-empty list'}), 400
     
-    # GET request - return customer's transactions
-    cursor.execute('''
-        SELECT * FROM customer_transactions 
-        WHERE customer_id = ? 
-        ORDER BY date DESC
-    ''', (customer_id,))
-    
-    transactions = cursor.fetchall()
-    
-    result = []
-    for t in transactions:
-        result.append({
-            'id': t[0],
-            'customer_id': t[1],
-            'date': t[2],
-            'amount': t[3],
-            'description': t[4],
-            'type': t[5],
-            'created_at': t[6]
-        })
+    rows, errors = validate_khatabook_entries(entries)
+    conn = get_db()
     
+    # Every referenced customer must exist
+    unknown = unknown_customer_ids(conn, [row[0] for row in rows])
+    if unknown:
+        errors.append({'error': 'unknown customer ids', 'customer_ids': unknown[:50]})
+    
+    if errors:
+        # All or nothing: a month-end batch is either posted whole or not at all
+        return jsonify({'success': False, 'error': 'Invalid entries', 'details': errors[:50]}), 400
+    
+    customers_updated = post_khatabook_entries(conn, rows)
+    return jsonify({
+        'success': True,
+        'entries_posted': len(rows),
+        'customers_updated': customers_updated
+    })
+
+@app.route('/api/customers/reconcile', methods=['POST'])
+def reconcile_customers_api():
+    """Recompute every customer's balance from their ledger entries"""
+    fixes = reconcile_customer_balances(get_db())
+    return jsonify({'success': True, 'customers_fixed': len(fixes), 'fixes': fixes[:100]})
+
+@app.cli.command('reconcile-balances')
+def reconcile_balances_command():
+    """Recompute customers.balance from customer_transactions."""
+    init_db()
+    conn = connect_db()
+    fixes = reconcile_customer_balances(conn)
     conn.close()
-    return jsonify({'transactions': result})
+    for fix in fixes[:20]:
+        print(f"customer {fix['customer_id']}: {fix['stored_balance']} -> {fix['ledger_balance']}")
+    print(f"Reconciled balances: {len(fixes)} customers corrected")
+
+# Invoices (GST)
+INVOICE_COLUMNS = ('id, number, customer_id, description, quantity, rate, subtotal, '
+                   'gst_rate, gst_amount, total, status, date, created_at')
+INVOICE_STATUSES = ('pending', 'paid', 'overdue', 'cancelled')
+OUTSTANDING_INVOICE_STATUSES = ('pending', 'overdue')
+INVOICE_GST_RATES = (0, 5, 12, 18, 28)
+AGING_BUCKETS = ('0-30', '31-60', '61-90', '90+')
+
+def invoice_to_dict(i):
+    return {
+        'id': i[0],
+        'number': i[1],
+        'customer_id': i[2],
+        'description': i[3],
+        'quantity': i[4],
+        'rate': i[5],
+        'subtotal': i[6],
+        'gst_rate': i[7],
+        'gst_amount': i[8],
+        'total': i[9],
+        'status': i[10],
+        'date': i[11],
+        'created_at': i[12]
+    }
+
+def validate_invoice(data):
+    """Compute amounts for one invoice request; raises ValueError on bad input"""
+    if not isinstance(data, dict):
+        raise ValueError('invoice must be an object')
+    try:
+        customer_id = int(data['customer_id'])
+        quantity = float(data.get('quantity', 1))
+        rate = float(data['rate'])
+        gst_rate = float(data.get('gst_rate', 18))
+    except KeyError as e:
+        raise ValueError(f'missing field {e.args[0]}')
+    except (TypeError, ValueError):
+        raise ValueError('customer_id, quantity, rate and gst_rate must be numbers')
+    description = str(data.get('description') or '').strip()
+    if not description:
+        raise ValueError('description is required')
+    # float() accepts 'nan' and 'inf', which would pass the checks below and
+    # store NaN totals under a real invoice number
+    if not (math.isfinite(quantity) and math.isfinite(rate) and math.isfinite(quantity * rate)):
+        raise ValueError('quantity and rate must be finite numbers')
+    if quantity <= 0 or rate <= 0:
+        raise ValueError('quantity and rate must be positive')
+    if gst_rate not in INVOICE_GST_RATES:
+        raise ValueError(f'gst_rate must be one of {", ".join(map(str, INVOICE_GST_RATES))}')
+    invoice_date = parse_iso_date(str(data['date']), 'date') if data.get('date') else date.today().isoformat()
+    
+    subtotal = round(quantity * rate, 2)
+    gst_amount = round(subtotal * gst_rate / 100, 2)
+    return {
+        'customer_id': customer_id,
+        'description': description,
+        'quantity': quantity,
+        'rate': rate,
+        'subtotal': subtotal,
+        'gst_rate': gst_rate,
+        'gst_amount': gst_amount,
+        'total': round(subtotal + gst_amount, 2),
+        'date': invoice_date
+    }
+
+def allocate_invoice_numbers(conn, series, count):
+    """Reserve the next count numbers of a series inside the caller's transaction.
+
+    The counter row is bumped with UPDATE ... RETURNING, so allocation costs one
+    primary-key write instead of a MAX(number) scan. It commits or rolls back
+    together with the invoices that use the numbers, so the series never has gaps.
+    """
+    conn.execute('INSERT OR IGNORE INTO invoice_sequences (series, last_number) VALUES (?, 0)', (series,))
+    last_number = conn.execute(
+        'UPDATE invoice_sequences SET last_number = last_number + ? WHERE series = ? RETURNING last_number',
+        (count, series)
+    ).fetchall()[0][0]
+    return [f'INV-{series}-{number:03d}' for number in range(last_number - count + 1, last_number + 1)]
+
+def create_invoices(conn, invoices):
+    """Insert validated invoices in one transaction; returns them with ids and numbers"""
+    by_series = defaultdict(list)
+    for invoice in invoices:
+        # One numbering series per calendar year, as the invoice form uses
+        by_series[invoice['date'][:4]].append(invoice)
+    
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        cursor = conn.cursor()
+        for series, series_invoices in sorted(by_series.items()):
+            numbers = allocate_invoice_numbers(conn, series, len(series_invoices))
+            for invoice, number in zip(series_invoices, numbers):
+                cursor.execute('''
+                    INSERT INTO invoices (number, customer_id, description, quantity, rate, subtotal,
+                                          gst_rate, gst_amount, total, status, date)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+                ''', (number, invoice['customer_id'], invoice['description'], invoice['quantity'],
+                      invoice['rate'], invoice['subtotal'], invoice['gst_rate'], invoice['gst_amount'],
+                      invoice['total'], invoice['date']))
+                invoice['id'] = cursor.lastrowid
+                invoice['number'] = number
+                invoice['status'] = 'pending'
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return invoices
+
+def unknown_customer_ids(conn, customer_ids):
+    """Return the ids in customer_ids that have no customers row"""
+    customer_ids = sorted(set(customer_ids))
+    known = set()
+    for start in range(0, len(customer_ids), 500):
+        chunk = customer_ids[start:start + 500]
+        known.update(row[0] for row in conn.execute(
+            f"SELECT id FROM customers WHERE id IN ({','.join('?' * len(chunk))})", chunk
+        ))
+    return [customer_id for customer_id in customer_ids if customer_id not in known]
+
+def receivables_aging(conn, as_of, by_customer=False):
+    """Outstanding invoice totals in 0-30 / 31-60 / 61-90 / 90+ day buckets"""
+    as_of_date = datetime.strptime(as_of, '%Y-%m-%d')
+    cutoffs = [(as_of_date - timedelta(days=days)).strftime('%Y-%m-%d') for days in (30, 60, 90)]
+    bucket_sql = '''
+        CASE WHEN date >= ? THEN '0-30'
+             WHEN date >= ? THEN '31-60'
+             WHEN date >= ? THEN '61-90'
+             ELSE '90+' END
+    '''
+    group_columns = 'customer_id, bucket' if by_customer else 'bucket'
+    placeholders = ','.join('?' * len(OUTSTANDING_INVOICE_STATUSES))
+    rows = conn.execute(f'''
+        SELECT {group_columns}, COUNT(*), SUM(total) FROM (
+            SELECT customer_id, total, {bucket_sql} AS bucket
+            FROM invoices
+            WHERE status IN ({placeholders}) AND date <= ?
+        )
+        GROUP BY {group_columns}
+    ''', (*cutoffs, *OUTSTANDING_INVOICE_STATUSES, as_of)).fetchall()
+    
+    def empty_buckets():
+        return {bucket: {'count': 0, 'total': 0} for bucket in AGING_BUCKETS}
+    
+    if by_customer:
+        customers = defaultdict(empty_buckets)
+        for customer_id, bucket, count, total in rows:
+            customers[customer_id][bucket] = {'count': count, 'total': total}
+        return {'as_of': as_of, 'customers': {str(k): v for k, v in customers.items()}}
+    
+    buckets = empty_buckets()
+    for bucket, count, total in rows:
+        buckets[bucket] = {'count': count, 'total': total}
+    return {
+        'as_of': as_of,
+        'buckets': buckets,
+        'total_outstanding': sum(bucket['total'] for bucket in buckets.values())
+    }
+
+@app.route('/api/invoices', methods=['GET', 'POST'])
+def invoices_api():
+    """Create an invoice, or list invoices (?status=&customer_id= plus keyset pagination)"""
+    conn = get_db()
+    
+    if request.method == 'POST':
+        try:
+            invoice = validate_invoice(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        if unknown_customer_ids(conn, [invoice['customer_id']]):
+            return jsonify({'success': False, 'error': 'Customer not found'}), 404
+        invoice = create_invoices(conn, [invoice])[0]
+        return jsonify({'success': True, 'invoice': invoice})
+    
+    try:
+        after, limit, output_format = parse_listing_args()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    filters, params = [], []
+    status = request.args.get('status')
+    if status:
+        if status not in INVOICE_STATUSES:
+            return jsonify({'success': False, 'error': 'Unknown status'}), 400
+        filters.append('status = ?')
+        params.append(status)
+    if request.args.get('customer_id', '').isdigit():
+        filters.append('customer_id = ?')
+        params.append(int(request.args['customer_id']))
+    
+    sql, params = keyset_query(f'SELECT {INVOICE_COLUMNS} FROM invoices', params,
+                               after, limit, output_format, filters=filters)
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    return keyset_listing_response('invoices', cursor, invoice_to_dict, limit, output_format)
+
+@app.route('/api/invoices/batch', methods=['POST'])
+def invoices_batch_api():
+    """Create many invoices at once; numbers are allocated in one step per series"""
+    data = request.get_json(silent=True) or {}
+    items = data.get('invoices')
+    if not isinstance(items, list) or not items:
+        return jsonify({'success': False, 'error': 'invoices must be a non-empty list'}), 400
+    
+    invoices, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            invoices.append(validate_invoice(item))
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    conn = get_db()
+    unknown = unknown_customer_ids(conn, [invoice['customer_id'] for invoice in invoices])
+    if unknown:
+        errors.append({'error': 'unknown customer ids', 'customer_ids': unknown[:50]})
+    if errors:
+        return jsonify({'success': False, 'error': 'Invalid invoices', 'details': errors[:50]}), 400
+    
+    created = create_invoices(conn, invoices)
+    return jsonify({'success': True, 'invoices': created})
+
+@app.route('/api/invoices/<int:invoice_id>/status', methods=['PUT'])
+def invoice_status_api(invoice_id):
+    """Update an invoice's status (pending, paid, overdue, cancelled)"""
+    status = (request.get_json(silent=True) or {}).get('status')
+    if status not in INVOICE_STATUSES:
+        return jsonify({'success': False, 'error': 'Unknown status'}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    cursor.execute('UPDATE invoices SET status = ? WHERE id = ?', (status, invoice_id))
+    if cursor.rowcount == 0:
+        conn.rollback()
+        return jsonify({'success': False, 'error': 'Invoice not found'}), 404
+    conn.commit()
+    return jsonify({'success': True})
+
+@app.route('/api/invoices/aging')
+def invoices_aging_api():
+    """Receivables aging of outstanding invoices (?as_of=YYYY-MM-DD&by_customer=1)"""
+    try:
+        as_of = parse_iso_date(request.args['as_of'], 'as_of') if request.args.get('as_of') \
+            else date.today().isoformat()
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    by_customer = request.args.get('by_customer') in ('1', 'true')
+    return jsonify({'success': True, 'aging': receivables_aging(get_db(), as_of, by_customer)})
+
+# Reports: built on a background thread pool, streamed from SQLite into CSV/XLSX/PDF
+# files, and cached on disk by request and by the data versions they were built from
+REPORT_TYPES = {
+    'monthly': ('transactions',),
+    'custom': ('transactions',),
+    'tax': ('transactions', 'customers', 'invoices'),
+    'business': ('customers', 'customer_transactions', 'invoices'),
+}
+REPORT_FORMATS = {
+    'csv': ('csv', 'text/csv'),
+    'excel': ('xlsx', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('pdf', 'application/pdf'),
+}
+REPORT_PERIODS = ('current-month', 'last-month', 'last-3-months', 'last-6-months',
+                  'current-year', 'last-year', 'custom')
+REPORT_FETCH_SIZE = 1000
+XLSX_INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# Landscape A4 in points; Courier is fixed-width, so cells are cut by character count
+PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, PDF_MARGIN = 842, 595, 36
+PDF_FONT_SIZE, PDF_LINE_HEIGHT = 7, 11
+PDF_CHAR_WIDTH = PDF_FONT_SIZE * 0.6
+
+def shift_months(day, months):
+    """First day of the month `months` away from day's month"""
+    year, month = divmod(day.year * 12 + day.month - 1 + months, 12)
+    return date(year, month + 1, 1)
+
+def report_period(period, start=None, end=None, today=None):
+    """Resolve a reports-page period into (start, end) ISO dates; raises ValueError"""
+    today = today or date.today()
+    if period == 'custom':
+        if not start or not end:
+            raise ValueError('from and to are required for a custom period')
+        start, end = parse_iso_date(start, 'from'), parse_iso_date(end, 'to')
+        if start > end:
+            raise ValueError('from must not be after to')
+        return start, end
+    if period == 'current-month':
+        return shift_months(today, 0).isoformat(), today.isoformat()
+    if period == 'last-month':
+        return shift_months(today, -1).isoformat(), (shift_months(today, 0) - timedelta(days=1)).isoformat()
+    if period == 'last-3-months':
+        return shift_months(today, -2).isoformat(), today.isoformat()
+    if period == 'last-6-months':
+        return shift_months(today, -5).isoformat(), today.isoformat()
+    if period == 'current-year':
+        return date(today.year, 1, 1).isoformat(), today.isoformat()
+    if period == 'last-year':
+        return date(today.year - 1, 1, 1).isoformat(), date(today.year - 1, 12, 31).isoformat()
+    raise ValueError(f'period must be one of {", ".join(REPORT_PERIODS)}')
+
+def report_sections(report_type, start, end):
+    """Return the (title, header, sql, params) sections that make up a report"""
+    period = (start, end)
+    category_summary = (
+        'Category Summary', ['Type', 'Category', 'Transactions', 'Amount'],
+        'SELECT type, category, SUM(count), ROUND(SUM(total), 2) FROM daily_rollups '
+        'WHERE date BETWEEN ? AND ? GROUP BY type, category ORDER BY type, SUM(total) DESC', period
+    )
+    transactions = (
+        'Transactions', ['Date', 'Description', 'Category', 'Type', 'Amount'],
+        'SELECT date, description, category, type, amount FROM transactions '
+        'WHERE date BETWEEN ? AND ? ORDER BY date, id', period
+    )
+    invoices = (
+        'Invoices', ['Number', 'Date', 'Customer', 'Description', 'Quantity', 'Rate', 'Subtotal',
+                     'GST %', 'GST Amount', 'Total', 'Status'],
+        'SELECT i.number, i.date, c.name, i.description, i.quantity, i.rate, i.subtotal, '
+        'i.gst_rate, i.gst_amount, i.total, i.status FROM invoices i '
+        'LEFT JOIN customers c ON c.id = i.customer_id WHERE i.date BETWEEN ? AND ? ORDER BY i.date, i.id', period
+    )
+    if report_type == 'tax':
+        return [
+            ('GST Summary', ['GST %', 'Invoices', 'Taxable Value', 'GST', 'Total'],
+             "SELECT gst_rate, COUNT(*), ROUND(SUM(subtotal), 2), ROUND(SUM(gst_amount), 2), "
+             "ROUND(SUM(total), 2) FROM invoices WHERE date BETWEEN ? AND ? AND status != 'cancelled' "
+             "GROUP BY gst_rate ORDER BY gst_rate", period),
+            invoices,
+            category_summary,
+        ]
+    if report_type == 'business':
+        return [
+            ('Invoice Status', ['Status', 'Invoices', 'Total'],
+             'SELECT status, COUNT(*), ROUND(SUM(total), 2) FROM invoices '
+             'WHERE date BETWEEN ? AND ? GROUP BY status ORDER BY status', period),
+            ('Customer Balances', ['Customer', 'Phone', 'Balance'],
+             'SELECT name, phone, balance FROM customers ORDER BY balance DESC', ()),
+            ('Khatabook Ledger', ['Date', 'Customer', 'Type', 'Amount', 'Description'],
+             'SELECT ct.date, c.name, ct.type, ct.amount, ct.description FROM customer_transactions ct '
+             'JOIN customers c ON c.id = ct.customer_id WHERE ct.date BETWEEN ? AND ? '
+             'ORDER BY ct.date, ct.id', period),
+            invoices,
+        ]
+    return [category_summary, transactions]
+
+def iter_report_rows(conn, sql, params):
+    """Yield batches of rows without materializing the result set"""
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(REPORT_FETCH_SIZE)
+        if not rows:
+            break
+        yield rows
+
+def write_csv_report(path, conn, sections, progress):
+    """Write the sections one after another into a single CSV file"""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        for index, (title, header, sql, params) in enumerate(sections):
+            if index:
+                writer.writerow([])
+            writer.writerow([title])
+            writer.writerow(header)
+            for rows in iter_report_rows(conn, sql, params):
+                writer.writerows(rows)
+                progress(len(rows))
+
+def xlsx_row(values):
+    cells = []
+    for value in values:
+        if value is None:
+            cells.append('<c/>')
+        elif isinstance(value, (int, float)) and value == value and abs(value) != float('inf'):
+            cells.append(f'<c><v>{value!r}</v></c>')
+        else:
+            text = xml_escape(XLSX_INVALID_CHARS.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+def write_xlsx_report(path, conn, sections, progress):
+    """Write one worksheet per section, streaming rows into the zip entry"""
+    spreadsheet_ns = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+    relationship_ns = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+    package_ns = 'http://schemas.openxmlformats.org/package/2006/relationships'
+    sheets = range(1, len(sections) + 1)
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            + ''.join(f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+                      'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for n in sheets)
+            + '</Types>'
+        ))
+        archive.writestr('_rels/.rels', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{package_ns}">'
+            f'<Relationship Id="rId1" Type="{relationship_ns}/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'
+        ))
+        archive.writestr('xl/workbook.xml', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<workbook xmlns="{spreadsheet_ns}" xmlns:r="{relationship_ns}"><sheets>'
+            + ''.join(f'<sheet name="{xml_escape(title[:31])}" sheetId="{n}" r:id="rId{n}"/>'
+                      for n, (title, *_) in zip(sheets, sections))
+            + '</sheets></workbook>'
+        ))
+        archive.writestr('xl/_rels/workbook.xml.rels', (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{package_ns}">'
+            + ''.join(f'<Relationship Id="rId{n}" Type="{relationship_ns}/worksheet" '
+                      f'Target="worksheets/sheet{n}.xml"/>' for n in sheets)
+            + '</Relationships>'
+        ))
+        for n, (title, header, sql, params) in zip(sheets, sections):
+            with archive.open(f'xl/worksheets/sheet{n}.xml', 'w') as sheet:
+                sheet.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                            f'<worksheet xmlns="{spreadsheet_ns}"><sheetData>{xlsx_row(header)}'.encode())
+                for rows in iter_report_rows(conn, sql, params):
+                    sheet.write(''.join(map(xlsx_row, rows)).encode())
+                    progress(len(rows))
+                sheet.write(b'</sheetData></worksheet>')
+
+def pdf_text(value, width):
+    """Format a value as an escaped PDF string of at most `width` characters"""
+    if value is None:
+        text = ''
+    elif isinstance(value, float):
+        text = f'{value:,.2f}'
+    else:
+        text = XLSX_INVALID_CHARS.sub('', str(value)).replace('\n', ' ').replace('\r', ' ')
+    if len(text) > width:
+        text = text[:max(width - 3, 0)] + '...'
+    text = text.encode('cp1252', 'replace').decode('latin-1')
+    return '(' + text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') + ')'
+
+def write_pdf_report(path, conn, sections, progress):
+    """Write the sections as landscape A4 tables, flushing each page to disk as it fills.
+
+    Only the byte offset of every object is kept (for the xref table), so memory
+    stays flat however many pages the report runs to.
+    """
+    # Objects 1-4 are the catalog, page tree and two fonts; each page then adds
+    # its content stream and page object, so page n's objects are 5 + 2n and 6 + 2n
+    offsets = array('q', [0] * 5)
+    top = PDF_PAGE_HEIGHT - PDF_MARGIN
+    lines = []
+    y = top
+
+    with open(path, 'wb') as f:
+        def write_object(number, body):
+            if number == len(offsets):
+                offsets.append(f.tell())
+            else:
+                offsets[number] = f.tell()
+            f.write(f'{number} 0 obj\n'.encode() + body + b'\nendobj\n')
+
+        def flush_page():
+            nonlocal y
+            content = zlib.compress(''.join(lines).encode('latin-1'))
+            number = len(offsets)
+            write_object(number, f'<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n'.encode()
+                         + content + b'\nendstream')
+            write_object(number + 1, (f'<< /Type /Page /Parent 2 0 R /Contents {number} 0 R '
+                                      f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>').encode())
+            lines.clear()
+            y = top
+
+        def draw(x, text, font, size=PDF_FONT_SIZE):
+            lines.append(f'BT /{font} {size} Tf {x:.1f} {y:.1f} Td {text} Tj ET\n')
+
+        f.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for number, name in ((3, 'Courier'), (4, 'Courier-Bold')):
+            write_object(number, (f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} '
+                                  f'/Encoding /WinAnsiEncoding >>').encode())
+        for index, (title, header, sql, params) in enumerate(sections):
+            if index and y < PDF_MARGIN + 4 * PDF_LINE_HEIGHT:
+                flush_page()
+            elif index:
+                y -= PDF_LINE_HEIGHT
+            column_width = (PDF_PAGE_WIDTH - 2 * PDF_MARGIN) / len(header)
+            column_chars = int(column_width / PDF_CHAR_WIDTH) - 1
+
+            def draw_row(values, font):
+                nonlocal y
+                for n, value in enumerate(values):
+                    draw(PDF_MARGIN + n * column_width, pdf_text(value, column_chars), font)
+                y -= PDF_LINE_HEIGHT
+
+            draw(PDF_MARGIN, pdf_text(title, 100), 'F2', 11)
+            y -= PDF_LINE_HEIGHT * 1.5
+            draw_row(header, 'F2')
+            for rows in iter_report_rows(conn, sql, params):
+                for row in rows:
+                    if y < PDF_MARGIN:
+                        flush_page()
+                        draw_row(header, 'F2')
+                    draw_row(row, 'F1')
+                progress(len(rows))
+        flush_page()
+
+        pages = (len(offsets) - 5) // 2
+        kids = ' '.join(f'{6 + 2 * n} 0 R' for n in range(pages))
+        write_object(2, (f'<< /Type /Pages /Count {pages} /MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] '
+                         f'/Kids [{kids}] >>').encode())
+        write_object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = f.tell()
+        f.write(f'xref\n0 {len(offsets)}\n0000000000 65535 f \n'.encode())
+        for offset in offsets[1:]:
+            f.write(f'{offset:010d} 00000 n \n'.encode())
+        f.write(f'trailer\n<< /Size {len(offsets)} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+
+REPORT_WRITERS = {'csv': write_csv_report, 'excel': write_xlsx_report, 'pdf': write_pdf_report}
+
+def process_alive(pid):
+    """True/False when the local process can be probed, None when it cannot.
+
+    On Windows os.kill(pid, 0) terminates the process instead of probing it.
+    """
+    if os.name == 'nt':
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+class ReportQueue:
+    """Report jobs run on a small thread pool so request workers never build reports.
+
+    Finished files are kept in REPORTS_DIR under a key made from the request and
+    the data versions of the tables the report reads, so an identical request
+    against unchanged data is served from disk instead of being rebuilt. Job
+    state lives in the report_jobs table, so any server worker can answer a poll.
+    Each job records the pid of the worker building it and a heartbeat; a poll
+    marks a job failed once its worker has exited or its heartbeat is older
+    than stale_after seconds.
+    """
+    ABANDONED = 'Report worker stopped before finishing; please generate it again'
+    
+    def __init__(self, job_ttl=3600, progress_interval=1.0, stale_after=600):
+        self.job_ttl = job_ttl
+        self.progress_interval = progress_interval
+        self.stale_after = stale_after
+        self.lock = threading.Lock()
+        # In-flight jobs of this process by cache key
+        self.running = {}
+        self.executor = None
+    
+    def cache_key(self, conn, database, report_type, report_format, start, end):
+        versions = data_versions(conn, REPORT_TYPES[report_type])
+        # The database path keeps tenants' identical requests apart
+        payload = json.dumps([os.path.abspath(database), report_type, report_format, start, end, versions])
+        return hashlib.sha1(payload.encode()).hexdigest()[:24]
+    
+    def artifact_path(self, key, report_format):
+        return os.path.join(app.config['REPORTS_DIR'], f'{key}.{REPORT_FORMATS[report_format][0]}')
+    
+    def submit(self, conn, report_type, report_format, start, end):
+        """Queue a report, or return the finished/in-flight job for the same request"""
+        database = current_db_path()
+        key = self.cache_key(conn, database, report_type, report_format, start, end)
+        path = self.artifact_path(key, report_format)
+        now = time.time()
+        job = {
+            'id': uuid.uuid4().hex,
+            'type': report_type,
+            'format': report_format,
+            'start': start,
+            'end': end,
+            'status': 'queued',
+            'rows': 0,
+            'cached': False,
+            'error': None,
+            'path': path
+        }
+        cached = os.path.exists(path)
+        # The lock only guards the in-memory bookkeeping; claiming the key
+        # here stops a concurrent identical request from queueing a second job
+        with self.lock:
+            in_flight = self.running.get(key)
+            if in_flight is None and not cached:
+                self.running[key] = job
+        if in_flight is not None:
+            return self.get(conn, in_flight['id']) or dict(in_flight)
+        
+        if cached:
+            os.utime(path)
+            job.update(status='done', cached=True)
+        try:
+            conn.execute('DELETE FROM report_jobs WHERE finished_at < ?', (now - self.job_ttl,))
+            conn.execute('''
+                INSERT INTO report_jobs (id, type, format, start_date, end_date, status, rows, cached,
+                                         path, created_at, finished_at, pid, heartbeat_at)
+                VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?, ?, ?, ?, ?)
+            ''', (job['id'], report_type, report_format, start, end, job['status'], job['cached'],
+                  path, now, now if cached else None, os.getpid(), now))
+            conn.commit()
+        except Exception:
+            if not cached:
+                with self.lock:
+                    self.running.pop(key, None)
+            raise
+        if cached:
+            return job
+        
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=app.config['REPORT_WORKERS'],
+                                                   thread_name_prefix='report')
+            executor = self.executor
+        executor.submit(self._run, job, key, database)
+        return job
+    
+    def get(self, conn, job_id):
+        row = conn.execute(
+            'SELECT id, type, format, start_date, end_date, status, rows, cached, error, path, '
+            'pid, heartbeat_at FROM report_jobs WHERE id = ?', (job_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(('id', 'type', 'format', 'start', 'end', 'status', 'rows', 'cached',
+                        'error', 'path'), row), cached=bool(row[7]))
+        if job['status'] in ('queued', 'running') and self._abandoned(job, row[10], row[11]):
+            cursor = conn.execute(
+                "UPDATE report_jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE id = ? AND status IN ('queued', 'running')", (self.ABANDONED, time.time(), job_id)
+            )
+            conn.commit()
+            if cursor.rowcount:
+                job.update(status='failed', error=self.ABANDONED)
+            else:
+                # Finished (or was failed by another poll) meanwhile
+                return self.get(conn, job_id)
+        return job
+    
+    def _abandoned(self, job, pid, heartbeat_at):
+        """Whether an unfinished job's worker has gone away"""
+        if pid == os.getpid():
+            with self.lock:
+                return all(running['id'] != job['id'] for running in self.running.values())
+        alive = process_alive(pid) if pid else None
+        if alive is False:
+            return True
+        # A live worker's queued job may simply be waiting for a free thread
+        if job['status'] == 'queued' and alive:
+            return False
+        return heartbeat_at is None or time.time() - heartbeat_at > self.stale_after
+    
+    def _run(self, job, key, database):
+        conn = connect_db(database)
+        # Status updates go through their own connection: conn holds a read snapshot
+        status_conn = connect_db(database)
+        tmp_path = f"{job['path']}.{job['id']}.tmp"
+        progress_state = {'rows': 0, 'written_at': 0.0}
+        
+        def update(**fields):
+            fields['heartbeat_at'] = time.time()
+            assignments = ', '.join(f'{name} = ?' for name in fields)
+            status_conn.execute(f'UPDATE report_jobs SET {assignments} WHERE id = ?',
+                                (*fields.values(), job['id']))
+            status_conn.commit()
+        
+        def progress(count):
+            progress_state['rows'] += count
+            now = time.monotonic()
+            if now - progress_state['written_at'] >= self.progress_interval:
+                progress_state['written_at'] = now
+                update(rows=progress_state['rows'])
+        
+        try:
+            started = status_conn.execute(
+                "UPDATE report_jobs SET status = 'running', heartbeat_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job['id'])
+            ).rowcount
+            status_conn.commit()
+            if not started:
+                # Given up on by a poll while it waited in the queue
+                return
+            os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+            # One read transaction: every section sees the same snapshot
+            conn.execute('BEGIN')
+            path = self.artifact_path(
+                self.cache_key(conn, database, job['type'], job['format'], job['start'], job['end']), job['format']
+            )
+            sections = report_sections(job['type'], job['start'], job['end'])
+            REPORT_WRITERS[job['format']](tmp_path, conn, sections, progress)
+            conn.rollback()
+            os.replace(tmp_path, path)
+            update(status='done', rows=progress_state['rows'], path=path, finished_at=time.time())
+        except Exception as e:
+            print(f"Report {job['id']} failed: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            try:
+                update(status='failed', error=str(e), finished_at=time.time())
+            except sqlite3.Error as status_error:
+                print(f"Could not record failure of report {job['id']}: {status_error}")
+        finally:
+            conn.close()
+            status_conn.close()
+            with self.lock:
+                self.running.pop(key, None)
+            self._prune_artifacts()
+    
+    def _prune_artifacts(self):
+        """Keep only the most recently used REPORT_CACHE_SIZE finished files"""
+        directory = app.config['REPORTS_DIR']
+        try:
+            artifacts = [entry for entry in os.scandir(directory)
+                         if entry.is_file() and not entry.name.endswith('.tmp')]
+        except FileNotFoundError:
+            return
+        artifacts.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in artifacts[app.config['REPORT_CACHE_SIZE']:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+report_queue = ReportQueue()
+
+def report_job_to_dict(job):
+    result = {key: job[key] for key in ('id', 'type', 'format', 'start', 'end', 'status',
+                                        'rows', 'cached', 'error')}
+    if job['status'] == 'done':
+        result['download_url'] = url_for('download_report_api', job_id=job['id'])
+    return result
+
+@app.route('/api/reports', methods=['POST'])
+def reports_api():
+    """Queue a report ({type, period, format, from, to}); poll the returned job"""
+    data = request.get_json(silent=True) or {}
+    report_type = data.get('type', 'monthly')
+    report_format = data.get('format', 'csv')
+    if report_type not in REPORT_TYPES:
+        return jsonify({'success': False, 'error': f'type must be one of {", ".join(REPORT_TYPES)}'}), 400
+    if report_format not in REPORT_FORMATS:
+        return jsonify({'success': False, 'error': f'format must be one of {", ".join(REPORT_FORMATS)}'}), 400
+    try:
+        start, end = report_period(data.get('period', 'current-month'), data.get('from'), data.get('to'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    try:
+        job = report_queue.submit(get_db(), report_type, report_format, start, end)
+    except Exception as e:
+        print(f"Error queueing report: {e}")
+        return jsonify({'success': False, 'error': 'Failed to queue report'}), 500
+    return jsonify({'success': True, 'job': report_job_to_dict(job)}), 200 if job['status'] == 'done' else 202
+
+@app.route('/api/reports/<job_id>')
+def report_status_api(job_id):
+    """Poll a report job"""
+    job = report_queue.get(get_db(), job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Report not found'}), 404
+    return jsonify({'success': True, 'job': report_job_to_dict(job)})
+
+@app.route('/api/reports/<job_id>/download')
+def download_report_api(job_id):
+    """Download a finished report"""
+    job = report_queue.get(get_db(), job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Report not found'}), 404
+    if job['status'] != 'done':
+        return jsonify({'success': False, 'error': f"Report is {job['status']}"}), 409
+    if not os.path.exists(job['path']):
+        return jsonify({'success': False, 'error': 'Report has expired; please generate it again'}), 410
+    extension, mimetype = REPORT_FORMATS[job['format']]
+    return send_file(job['path'], mimetype=mimetype, as_attachment=True,
+                     download_name=f"{job['type']}_report_{job['start']}_{job['end']}.{extension}")
 
 @app.route('/api/dashboard/stats')
+@cached_response('transactions', 'customers')
 def dashboard_stats():
     """Get dashboard statistics"""
-    conn = sqlite3.connect('database.db')
+    conn = get_db()
     cursor = conn.cursor()
     
-    # Personal finance stats
-    cursor.execute('''
-        SELECT 
-            SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) as total_income,
-            SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) as total_expenses,
-            COUNT(*) as total_transactions
-        FROM transactions
-    ''')
-    personal_stats = cursor.fetchone()
-    
-    # Business stats
-    cursor.execute('SELECT COUNT(*) FROM customers')
-    total_customers = cursor.fetchone()[0]
+    # Personal finance stats from the daily rollups
+    cursor.execute('SELECT type, SUM(total), SUM(count) FROM daily_rollups GROUP BY type')
+    totals_by_type = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    total_income = totals_by_type.get('income', (0, 0))[0]
+    total_expenses = totals_by_type.get('expense', (0, 0))[0]
+    total_transactions = sum(count for _, count in totals_by_type.values())
     
-    cursor.execute('''
-        SELECT 
-            SUM(CASE WHEN balance > 0 THEN balance ELSE 0 END) as total_receivables,
-            SUM(CASE WHEN balance < 0 THEN ABS(balance) ELSE 0 END) as total_payables
-        FROM customers
-    ''')
-    business_stats = cursor.fetchone()
-    
-    conn.close()
+    # Business stats from the counters row the customers triggers maintain
+    cursor.execute('SELECT customer_count, total_receivables, total_payables FROM customer_stats WHERE id = 1')
+    total_customers, total_receivables, total_payables = cursor.fetchone()
     
     return jsonify({
         'personal': {
-            'total_income': personal_stats[0] or 0,
-            'total_expenses': personal_stats[1] or 0,
-            'current_balance': (personal_stats[0] or 0) - (personal_stats[1] or 0),
-            'total_transactions': personal_stats[2] or 0
+            'total_income': total_income or 0,
+            'total_expenses': total_expenses or 0,
+            'current_balance': (total_income or 0) - (total_expenses or 0),
+            'total_transactions': total_transactions
         },
         'business': {
             'total_customers': total_customers,
-            'total_receivables': business_stats[0] or 0,
-            'total_payables': business_stats[1] or 0
+            # Incremental float sums; round away the accumulated error
+            'total_receivables': round(total_receivables, 2) or 0,
+            'total_payables': round(total_payables, 2) or 0
         }
     })
 
@@ -0,0 +1,211 @@
+# ASGI entry point for My Money
+#
+#   uvicorn asgi:application --host 0.0.0.0 --port 5000 --workers 4
+#
+# Connection I/O stays on the event loop: request bodies are received and
+# responses sent asynchronously, and idle keep-alive connections hold no
+# thread. Only the Flask call itself, where the SQLite work happens, runs on
+# a bounded pool of MY_MONEY_DB_THREADS threads, each keeping its own
+# connection, so slow uploads and slow readers never tie one up. Streamed
+# bodies (NDJSON listings, import progress) read from their thread's cursor,
+# so they are produced on the pool and handed to the loop through a small
+# buffer. Every request goes through the same Flask app, so JSON contracts
+# are unchanged.
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app, init_db
+
+# Request bodies up to this size stay in memory; larger uploads spill to a temporary file
+BODY_SPOOL_BYTES = 1024 * 1024
+# Chunks of a streamed response produced ahead of a slow client
+STREAM_BUFFER_CHUNKS = 16
+
+
+def wsgi_environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope, with the already received body as input"""
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        # The whole body has been received, so reading to EOF is safe
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name, value = name.decode('latin-1'), value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class AsyncDispatch:
+    """Serve a WSGI app over ASGI, running only the app call on a bounded thread pool.
+
+    The body is received on the event loop before a thread is taken, and the
+    response is handed back through an asyncio queue and sent from the loop,
+    so a thread is held only while the app builds (or streams) its response.
+    """
+
+    def __init__(self, wsgi_app, threads):
+        self.wsgi_app = wsgi_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='db')
+        # Keeps the tasks that unblock abandoned responses alive until they finish
+        self._discarding = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            body = await self.read_body(receive)
+            if body is not None:
+                await self.respond(scope, body, send)
+
+    async def lifespan(self, receive, send):
+        """Create tables and apply migrations on startup"""
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await loop.run_in_executor(self.executor, init_db)
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    @staticmethod
+    async def read_body(receive):
+        """Receive the whole request body; None if the client went away first"""
+        body = tempfile.SpooledTemporaryFile(max_size=BODY_SPOOL_BYTES)
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                body.close()
+                return None
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        return body
+
+    async def respond(self, scope, body, send):
+        loop = asyncio.get_running_loop()
+        # Unbounded for the loop; the thread takes a slot before each put, so at most
+        # STREAM_BUFFER_CHUNKS are waiting and handing one over never waits for the loop
+        chunks = asyncio.Queue()
+        slots = threading.BoundedSemaphore(STREAM_BUFFER_CHUNKS)
+        stop = threading.Event()
+
+        async def next_item():
+            item = await chunks.get()
+            slots.release()
+            return item
+
+        call = loop.run_in_executor(self.executor, self.call_app, wsgi_environ(scope, body), loop, chunks, slots, stop)
+        try:
+            # (status, headers) first, then body chunks, then None; an exception ends it early
+            item = await next_item()
+            if isinstance(item, BaseException):
+                raise item
+            status, headers = item
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            while True:
+                item = await next_item()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+                await send({'type': 'http.response.body', 'body': item, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            if not call.done():
+                # The client is gone (or send failed): let the thread see stop and close the response
+                stop.set()
+                task = asyncio.ensure_future(self._discard(call, next_item))
+                self._discarding.add(task)
+                task.add_done_callback(self._discarding.discard)
+
+    @staticmethod
+    async def _discard(call, next_item):
+        """Drain the queue so a thread blocked on a full buffer can finish"""
+        while not call.done():
+            getter = asyncio.ensure_future(next_item())
+            await asyncio.wait({call, getter}, return_when=asyncio.FIRST_COMPLETED)
+            getter.cancel()
+
+    def call_app(self, environ, loop, chunks, slots, stop):
+        """Run the WSGI app on a pool thread, passing its response to the loop"""
+        def put(item):
+            slots.acquire()
+            loop.call_soon_threadsafe(chunks.put_nowait, item)
+
+        response = []
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response[:] = [(int(status.split(' ', 1)[0]),
+                            [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                             for name, value in headers])]
+            return write
+
+        def write(data):
+            nonlocal started
+            if not started:
+                put(response[0])
+                started = True
+            put(bytes(data))
+
+        result = None
+        try:
+            result = self.wsgi_app(environ, start_response)
+            for data in result:
+                if stop.is_set():
+                    return
+                if data:
+                    write(data)
+            if not started:
+                put(response[0])
+            put(None)
+        except Exception as e:
+            if not stop.is_set():
+                put(e)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+            environ['wsgi.input'].close()
+
+
+application = AsyncDispatch(app, int(os.environ.get('MY_MONEY_DB_THREADS', 16)))
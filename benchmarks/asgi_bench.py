@@ -0,0 +1,175 @@
+# Benchmark for the ASGI entry point under slow clients
+#
+#   python benchmarks/asgi_bench.py
+#   python benchmarks/asgi_bench.py --threads 8 --slow-clients 64 --duration 5
+#
+# Fast clients categorize transactions and poll dashboard stats while slow
+# clients trickle request bodies in (uploads) or take their time reading
+# responses. The app is driven in-process through its ASGI interface, once
+# with asgi.AsyncDispatch and once with a thread-per-request reference that
+# receives and sends on its pool thread (what a WSGI adapter or a threaded
+# WSGI server does), both with the same number of threads. Reports fast
+# request throughput and p50/p99 latency for each.
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+os.environ.setdefault('MY_MONEY_DATABASE', os.path.join(tempfile.mkdtemp(prefix='my-money-asgi-bench-'), 'database.db'))
+
+import app as app_module  # noqa: E402
+from asgi import AsyncDispatch, wsgi_environ  # noqa: E402
+from bench import EXPENSE_MERCHANTS, percentile  # noqa: E402
+
+FAST_REQUESTS = [
+    ('POST', '/api/ai/categorize-transaction', b'{"description": "Swiggy order Mumbai", "amount": 250}'),
+    ('GET', '/api/dashboard/stats', b''),
+]
+
+
+class ThreadPerRequest(AsyncDispatch):
+    """Reference: the request holds a pool thread while its body arrives and its response is sent"""
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await super().__call__(scope, receive, send)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.serve, scope, receive, send, loop)
+
+    def serve(self, scope, receive, send, loop):
+        def wait(coroutine):
+            return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+        body = wait(self.read_body(receive))
+        chunks = []
+
+        def start_response(status, headers, exc_info=None):
+            chunks.append({'type': 'http.response.start', 'status': int(status.split(' ', 1)[0]),
+                           'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+
+        result = self.wsgi_app(wsgi_environ(scope, body), start_response)
+        try:
+            for data in result:
+                if chunks:
+                    wait(send(chunks.pop()))
+                wait(send({'type': 'http.response.body', 'body': data, 'more_body': True}))
+            if chunks:
+                wait(send(chunks.pop()))
+            wait(send({'type': 'http.response.body', 'body': b''}))
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def http_scope(method, path, body_length):
+    return {'type': 'http', 'method': method, 'path': path, 'root_path': '', 'query_string': b'',
+            'http_version': '1.1', 'scheme': 'http', 'server': ('bench', 80), 'client': ('127.0.0.1', 0),
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(body_length).encode())]}
+
+
+async def call(application, method, path, body, pieces=1, upload_s=0.0, read_delay_s=0.0):
+    """One request; the body arrives in `pieces` over `upload_s`, the client reads after `read_delay_s`"""
+    size = max(1, -(-len(body) // pieces))
+    parts = [body[i:i + size] for i in range(0, len(body), size)] or [b'']
+    status = []
+
+    async def receive():
+        if not parts:
+            await asyncio.Event().wait()  # no disconnect during the benchmark
+        part = parts.pop(0)
+        if upload_s:
+            await asyncio.sleep(upload_s / pieces)
+        return {'type': 'http.request', 'body': part, 'more_body': bool(parts)}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+            if read_delay_s:
+                await asyncio.sleep(read_delay_s)
+
+    await application(http_scope(method, path, len(body)), receive, send)
+    return status[0]
+
+
+async def run_scenario(application, slow_clients, upload_s, duration_s, fast_clients):
+    stop = time.perf_counter() + duration_s
+    timings = []
+    errors = 0
+
+    async def slow_client(n):
+        while time.perf_counter() < stop:
+            if n % 2:
+                body = json.dumps({'date': '2025-12-31', 'amount': 99, 'description': f'slow upload {n}',
+                                   'category': 'Other', 'type': 'expense'}).encode()
+                await call(application, 'POST', '/api/transactions', body, pieces=10, upload_s=upload_s)
+            else:
+                await call(application, 'GET', '/api/customers', b'', read_delay_s=upload_s)
+
+    async def fast_client(n):
+        nonlocal errors
+        while time.perf_counter() < stop:
+            method, path, body = FAST_REQUESTS[n % len(FAST_REQUESTS)]
+            started = time.perf_counter_ns()
+            if await call(application, method, path, body) != 200:
+                errors += 1
+            timings.append(time.perf_counter_ns() - started)
+
+    slow = [asyncio.ensure_future(slow_client(n)) for n in range(slow_clients)]
+    await asyncio.sleep(min(upload_s / 2, duration_s / 4))
+    await asyncio.gather(*(fast_client(n) for n in range(fast_clients)))
+    await asyncio.gather(*slow)
+    timings.sort()
+    return {
+        'fast_requests': len(timings),
+        'errors': errors,
+        'p50_ms': round(percentile(timings, 0.50) / 1e6, 2),
+        'p99_ms': round(percentile(timings, 0.99) / 1e6, 2),
+        'max_ms': round(timings[-1] / 1e6, 2),
+    }
+
+
+def seed(db_path, rows):
+    app_module.init_db(db_path)
+    conn = app_module.connect_db(db_path)
+    rng = random.Random(20240101)
+    merchants = list(EXPENSE_MERCHANTS.items())
+    conn.executemany(
+        'INSERT INTO transactions (date, amount, description, category, type) VALUES (?, ?, ?, ?, ?)',
+        [(f'2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}', rng.randint(10, 5000), *merchants[i % len(merchants)],
+          'expense') for i in range(rows)]
+    )
+    conn.commit()
+    conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the ASGI entry point under slow clients')
+    parser.add_argument('--threads', type=int, default=8, help='pool threads (MY_MONEY_DB_THREADS)')
+    parser.add_argument('--slow-clients', type=int, default=32, help='clients uploading or reading slowly')
+    parser.add_argument('--upload-seconds', type=float, default=1.0, help='time a slow client takes per request')
+    parser.add_argument('--fast-clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per mode')
+    parser.add_argument('--rows', type=int, default=10_000, help='transactions in the database')
+    args = parser.parse_args(argv)
+
+    seed(app_module.app.config['DATABASE'], args.rows)
+    results = {}
+    for name, dispatch in (('thread-per-request', ThreadPerRequest), ('async-dispatch', AsyncDispatch)):
+        application = dispatch(app_module.app, args.threads)
+        results[name] = asyncio.run(run_scenario(
+            application, args.slow_clients, args.upload_seconds, args.duration, args.fast_clients
+        ))
+        application.executor.shutdown()
+        print(f"{name:>20}: {json.dumps(results[name])}", flush=True)
+    return results
+
+
+if __name__ == '__main__':
+    main()
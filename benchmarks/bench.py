@@ -0,0 +1,339 @@
+# Benchmarks for the My Money API hot paths
+#
+#   python benchmarks/bench.py --size 10k
+#   python benchmarks/bench.py --size 1m --output after.json --baseline before.json
+#
+# Datasets are generated from a fixed seed and dated back from a fixed anchor
+# day, and kept in benchmarks/data/<size>.db, so repeated runs and runs on
+# different commits measure exactly the same data. The dataset only uses the
+# original schema and the benchmarks only the original HTTP endpoints, so an
+# older checkout can be measured with the same data:
+#
+#   git worktree add /tmp/my-money-base <commit>
+#   python benchmarks/bench.py --app-dir /tmp/my-money-base --output before.json
+#
+# Each run works on a fresh copy of the dataset (the app may add tables and
+# indexes to it). Repeated GETs are timed as a client sees them, so a commit
+# that caches responses is measured serving from its cache. Results are written as JSON with throughput and p50/p99
+# latency per benchmark; --baseline compares against an earlier run.
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+SIZES = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+SEED = 20240101
+# Transactions are dated over the DAYS_OF_HISTORY days up to ANCHOR_DATE
+ANCHOR_DATE = date(2025, 12, 31)
+DAYS_OF_HISTORY = 730
+INSERT_BATCH = 100_000
+
+# Stored categories are fixed per merchant, not taken from the categorizer under test
+EXPENSE_MERCHANTS = {
+    'Swiggy order': 'Food & Dining', 'Zomato dinner': 'Food & Dining', 'Uber ride': 'Transportation',
+    'Ola cab': 'Transportation', 'Amazon purchase': 'Shopping', 'Flipkart order': 'Shopping',
+    'Electricity bill': 'Bills & Utilities', 'Airtel recharge': 'Bills & Utilities',
+    'Apollo pharmacy': 'Health & Medical', 'Netflix subscription': 'Entertainment',
+    'Petrol pump': 'Transportation', 'Big Bazaar grocery': 'Food & Dining', 'Rent payment': 'Bills & Utilities',
+    'SIP mutual fund': 'Investment', 'Movie tickets': 'Entertainment', 'Gym membership': 'Entertainment',
+    'Hotel booking': 'Travel', 'Salon haircut': 'Personal Care', 'UPI transfer': 'Other',
+    'ATM withdrawal': 'Other', 'Office supplies': 'Shopping', 'Course fees': 'Education',
+}
+INCOME_SOURCES = ['Salary credit', 'Freelance payment', 'Interest credit', 'Refund received']
+SUFFIXES = ['Mumbai', 'Delhi', 'Bengaluru', 'Pune', 'online', 'card', 'cash'] + \
+    [f'UPI/{n:04d}' for n in range(2000)]
+
+# The original schema, so that every commit can open the dataset
+SCHEMA = [
+    '''
+    CREATE TABLE transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        date TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT NOT NULL,
+        category TEXT NOT NULL,
+        type TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT,
+        business TEXT,
+        email TEXT,
+        balance REAL DEFAULT 0.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    '''
+    CREATE TABLE customer_transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        customer_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        amount REAL NOT NULL,
+        description TEXT NOT NULL,
+        type TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES customers (id)
+    )
+    ''',
+]
+
+
+def dataset_sizes(rows):
+    """Rows per table for a dataset of `rows` personal transactions"""
+    return {
+        'transactions': rows,
+        'customers': max(100, rows // 100),
+        'customer_transactions': rows // 2,
+    }
+
+
+def generate_dataset(path, rows):
+    """Create a database with `rows` transactions plus customers and their ledgers"""
+    counts = dataset_sizes(rows)
+    rng = random.Random(SEED)
+    days = [(ANCHOR_DATE - timedelta(days=offset)).isoformat() for offset in range(DAYS_OF_HISTORY)]
+    merchants = list(EXPENSE_MERCHANTS)
+    balances = [0.0] * (counts['customers'] + 1)
+
+    def transactions():
+        for _ in range(counts['transactions']):
+            if rng.random() < 0.1:
+                type_, source, category = 'income', rng.choice(INCOME_SOURCES), 'Salary & Income'
+                amount = round(rng.uniform(1000, 90000), 2)
+            else:
+                type_, source = 'expense', rng.choice(merchants)
+                category = EXPENSE_MERCHANTS[source]
+                amount = round(rng.lognormvariate(6, 1.2), 2)
+            yield rng.choice(days), amount, f'{source} {rng.choice(SUFFIXES)}', category, type_
+
+    def customer_transactions():
+        for _ in range(counts['customer_transactions']):
+            type_ = 'credit' if rng.random() < 0.6 else 'payment'
+            customer_id = rng.randint(1, counts['customers'])
+            amount = round(rng.uniform(50, 5000), 2)
+            balances[customer_id] += amount if type_ == 'credit' else -amount
+            yield (customer_id, rng.choice(days), amount,
+                   'Goods on credit' if type_ == 'credit' else 'Payment received', type_)
+
+    def customers():
+        for i in range(1, counts['customers'] + 1):
+            yield (f'Customer {i:06d}', f'98{i:08d}', rng.choice(['', 'Kirana', 'Hardware', 'Textiles']), '',
+                   round(balances[i], 2))
+
+    def insert(conn, sql, rows_iter):
+        while True:
+            batch = [row for _, row in zip(range(INSERT_BATCH), rows_iter)]
+            if not batch:
+                break
+            conn.executemany(sql, batch)
+
+    partial = path + '.partial'
+    if os.path.exists(partial):
+        os.remove(partial)
+    conn = sqlite3.connect(partial)
+    conn.execute('PRAGMA synchronous=OFF')
+    started = time.perf_counter()
+    with conn:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        insert(conn, 'INSERT INTO transactions (date, amount, description, category, type) '
+                     'VALUES (?, ?, ?, ?, ?)', transactions())
+        # Ledgers first, so each customer is written with its final balance
+        insert(conn, 'INSERT INTO customer_transactions (customer_id, date, amount, description, type) '
+                     'VALUES (?, ?, ?, ?, ?)', customer_transactions())
+        insert(conn, 'INSERT INTO customers (name, phone, business, email, balance) '
+                     'VALUES (?, ?, ?, ?, ?)', customers())
+    conn.close()
+    os.replace(partial, path)
+    print(f"Generated {path}: {counts} in {time.perf_counter() - started:.1f}s", flush=True)
+
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def measure(fn, iterations, items_per_call=1, warmup=None):
+    """Time each call of fn; returns throughput and latency percentiles in ms"""
+    for _ in range(warmup if warmup is not None else max(1, iterations // 10)):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter_ns()
+        fn()
+        timings.append(time.perf_counter_ns() - started)
+    timings.sort()
+    total_s = sum(timings) / 1e9
+    return {
+        'iterations': iterations,
+        'items_per_call': items_per_call,
+        'throughput_per_s': round(iterations * items_per_call / total_s, 1) if total_s else None,
+        'mean_ms': round(total_s * 1000 / iterations, 4),
+        'p50_ms': round(percentile(timings, 0.50) / 1e6, 4),
+        'p99_ms': round(percentile(timings, 0.99) / 1e6, 4),
+        'max_ms': round(timings[-1] / 1e6, 4),
+    }
+
+
+def run_benchmarks(app_module, db_path, scale=1.0, only=None):
+    """Run every benchmark through the Flask test client against db_path"""
+    client = app_module.app.test_client()
+    rng = random.Random(SEED + 1)
+
+    def n(iterations):
+        return max(5, int(iterations * scale))
+
+    def check(response, url):
+        if response.status_code != 200:
+            raise RuntimeError(f'{url} returned {response.status_code}')
+        response.close()
+
+    def get(url):
+        return lambda: check(client.get(url), url)
+
+    descriptions = [f'{rng.choice(list(EXPENSE_MERCHANTS) + INCOME_SOURCES)} {rng.choice(SUFFIXES)}'
+                    for _ in range(5000)]
+    description_cycle = iter(descriptions * 1000)
+
+    def categorize():
+        url = '/api/ai/categorize-transaction'
+        check(client.post(url, json={'description': next(description_cycle), 'amount': 250.0}), url)
+
+    conn = sqlite3.connect(db_path)
+    busiest_customer = conn.execute(
+        'SELECT customer_id FROM customer_transactions GROUP BY customer_id ORDER BY COUNT(*) DESC LIMIT 1'
+    ).fetchone()[0]
+    conn.close()
+
+    benchmarks = {
+        'api_categorize_transaction': lambda: measure(categorize, n(5000)),
+        'api_spending_insights': lambda: measure(get('/api/ai/spending-insights'), n(20)),
+        # The API dates these windows back from today, not from ANCHOR_DATE
+        'api_analytics_personal_30d': lambda: measure(get('/api/analytics/personal?period=30d'), n(200)),
+        'api_analytics_personal_1y': lambda: measure(get('/api/analytics/personal?period=1y'), n(50)),
+        'api_dashboard_stats': lambda: measure(get('/api/dashboard/stats'), n(500)),
+        'api_transactions': lambda: measure(get('/api/transactions'), n(20)),
+        'api_customers': lambda: measure(get('/api/customers'), n(100)),
+        'api_customer_transactions': lambda: measure(
+            get(f'/api/customers/{busiest_customer}/transactions'), n(500)),
+    }
+    results = {}
+    for name, bench in benchmarks.items():
+        if only and name not in only:
+            continue
+        results[name] = bench()
+        print(f"  {name:<34} p50 {results[name]['p50_ms']:>9.3f} ms  p99 {results[name]['p99_ms']:>9.3f} ms  "
+              f"{results[name]['throughput_per_s']:>12,.1f}/s", flush=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print p50 changes against a baseline run; returns the regressed benchmark names"""
+    regressions = []
+    print(f"\nCompared with baseline (regression threshold {threshold:.0%}):")
+    for name, result in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            print(f"  {name:<34} (new)")
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1 if before['p50_ms'] else 0.0
+        regressed = change > threshold
+        if regressed:
+            regressions.append(name)
+        print(f"  {name:<34} p50 {before['p50_ms']:>9.3f} -> {result['p50_ms']:>9.3f} ms  "
+              f"{change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def git_revision(app_dir):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=app_dir,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the My Money API hot paths')
+    parser.add_argument('--size', default='10k', help='dataset size: 10k, 1m, 10m or a row count')
+    parser.add_argument('--db', help='dataset file (default benchmarks/data/<size>.db, generated if missing)')
+    parser.add_argument('--app-dir', default=REPO_DIR, help='checkout whose app.py is benchmarked')
+    parser.add_argument('--output', help='write results JSON here (default benchmarks/results/<size>-<time>.json)')
+    parser.add_argument('--baseline', help='earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.20, help='p50 slowdown counted as a regression')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply iteration counts (e.g. 0.1 for a smoke run)')
+    parser.add_argument('--only', nargs='*', help='run only these benchmarks')
+    args = parser.parse_args(argv)
+
+    rows = SIZES.get(args.size.lower()) or int(args.size)
+    # Paths are resolved before the run changes directory
+    output = os.path.abspath(args.output or os.path.join(
+        BENCH_DIR, 'results', f"{args.size.lower()}-{time.strftime('%Y%m%d-%H%M%S')}.json"))
+    baseline_path = args.baseline and os.path.abspath(args.baseline)
+    dataset = os.path.abspath(args.db or os.path.join(BENCH_DIR, 'data', f'{args.size.lower()}.db'))
+    os.makedirs(os.path.dirname(dataset), exist_ok=True)
+    if not os.path.exists(dataset):
+        generate_dataset(dataset, rows)
+
+    # Older checkouts open ./database.db, so the run happens in a directory holding a copy
+    app_dir = os.path.abspath(args.app_dir)
+    run_dir = os.path.join(os.path.dirname(dataset), f'run-{args.size.lower()}')
+    shutil.rmtree(run_dir, ignore_errors=True)
+    os.makedirs(run_dir)
+    db_path = os.path.join(run_dir, 'database.db')
+    shutil.copyfile(dataset, db_path)
+    os.chdir(run_dir)
+    os.environ['MY_MONEY_DATABASE'] = db_path
+    sys.path.insert(0, app_dir)
+    import app as app_module
+    app_module.init_db()
+
+    print(f"Benchmarking {app_dir} on {dataset} ({rows:,} transactions)", flush=True)
+    results = run_benchmarks(app_module, db_path, args.scale, set(args.only or ()))
+    report = {
+        'meta': {
+            'size': args.size,
+            'rows': dataset_sizes(rows),
+            'database': dataset,
+            'seed': SEED,
+            'anchor_date': ANCHOR_DATE.isoformat(),
+            'app_dir': app_dir,
+            'git_revision': git_revision(app_dir),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'scale': args.scale,
+        },
+        'results': results,
+    }
+
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
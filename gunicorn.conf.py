@@ -0,0 +1,52 @@
+# Production server settings:
+#
+#   gunicorn -c gunicorn.conf.py app:app
+#   gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+#
+# The app is imported once in the master (preload_app), so the categorizer's
+# compiled rule tables, learned rules and category model are built before the workers fork and
+# shared copy-on-write. The database is initialized once, here, not per worker.
+# Corrections learned by one worker reach the others through the
+# user_corrections table, which each worker re-checks at most once a second.
+import gc
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('MY_MONEY_WORKERS', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('MY_MONEY_THREADS', 4))
+worker_class = os.environ.get('MY_MONEY_WORKER_CLASS', 'gthread')
+timeout = int(os.environ.get('MY_MONEY_TIMEOUT', 60))
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded and before any worker forks"""
+    from app import AnalyticsSnapshot, analytics_snapshots, app, connect_db, init_db, transaction_categorizer
+
+    init_db()
+    # Train the category model once here so the workers share it, then load
+    # the learned corrections (nothing touches the database at import time)
+    transaction_categorizer.train_model()
+    transaction_categorizer.load_user_learning()
+    if app.config['ANALYTICS_SNAPSHOT']:
+        # Load the analytics columns once; workers share the pages until they write
+        conn = connect_db()
+        analytics_snapshots.setdefault(app.config['DATABASE'], AnalyticsSnapshot()).refresh(conn)
+        conn.close()
+    # SQLite connections must not cross a fork; each worker reopens its own
+    transaction_categorizer.close_learning_connection()
+    # Keep the preloaded objects out of the collector so workers' GC passes
+    # do not dirty (and un-share) the pages they live on
+    gc.collect()
+    gc.freeze()
+    server.log.info('Database ready at %s; categorizer rules preloaded', app.config['DATABASE'])
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live metric files (PROMETHEUS_MULTIPROC_DIR mode)"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,46 @@
+# Command-line bank statement import (CSV / OFX)
+#
+#   python import_statement.py statement.csv
+#   python import_statement.py january.ofx --user-id demo_user --batch-size 5000
+import argparse
+import sys
+
+from app import app, connect_db, init_db, import_transactions, open_statement, transaction_categorizer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import a CSV or OFX bank statement into My Money')
+    parser.add_argument('path', help='statement file to import')
+    parser.add_argument('--format', choices=['csv', 'ofx'], help='override format detection')
+    parser.add_argument('--user-id', default='default', help='whose learned categories to apply')
+    parser.add_argument('--batch-size', type=int, default=2000, help='rows per insert transaction')
+    parser.add_argument('--db', help='database file (default: MY_MONEY_DATABASE or database.db)')
+    args = parser.parse_args(argv)
+
+    if args.db:
+        app.config['DATABASE'] = args.db
+    init_db()
+    conn = connect_db()
+
+    def report(stats):
+        print(f"  {stats['rows_read']:>10,} read  {stats['inserted']:>10,} inserted  "
+              f"{stats['duplicates']:>8,} duplicates  {stats['invalid']:>6,} invalid  "
+              f"({stats['elapsed']:.1f}s)", flush=True)
+
+    with open(args.path, 'rb') as f:
+        statement_format, records = open_statement(f, args.path, args.format)
+        print(f"📥 Importing {args.path} as {statement_format.upper()}...")
+        summary = import_transactions(conn, records, args.user_id, args.batch_size, progress=report,
+                                      categorizer=transaction_categorizer)
+    conn.close()
+
+    print(f"✅ Imported {summary['inserted']:,} of {summary['rows_read']:,} rows "
+          f"({summary['duplicates']:,} duplicates, {summary['invalid']:,} invalid) "
+          f"in {summary['elapsed']:.2f}s - {summary['rows_per_second'] or 0:,.0f} rows/s")
+    for error in summary['errors']:
+        print(f"   ⚠️ {error}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Shared fixtures: every test runs against its own database file."""
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Importing app must never point at the working copy's database.db
+os.environ.setdefault('MY_MONEY_DATABASE', os.path.join(tempfile.mkdtemp(prefix='my-money-tests-'), 'database.db'))
+
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A migrated database of its own, with a fresh categorizer and insights cache"""
+    path = str(tmp_path / 'database.db')
+    monkeypatch.setitem(app_module.app.config, 'DATABASE', path)
+    monkeypatch.setitem(app_module.app.config, 'REPORTS_DIR', str(tmp_path / 'reports'))
+    categorizer = app_module.TransactionCategorizer(
+        legacy_learning_path=None, rule_engine=app_module.transaction_categorizer.rule_engine
+    )
+    monkeypatch.setattr(app_module, 'transaction_categorizer', categorizer)
+    monkeypatch.setattr(app_module, 'spending_insights_cache', app_module.SpendingInsightsCache(categorizer))
+    app_module.init_db(path)
+    yield path
+    categorizer.close_learning_connection()
+
+
+@pytest.fixture
+def client(db_path):
+    return app_module.app.test_client()
+
+
+@pytest.fixture
+def conn(db_path):
+    conn = app_module.connect_db(db_path)
+    yield conn
+    conn.close()
+
+
+def add_transaction(client, description, amount, category, type='expense', date='2026-10-01'):
+    response = client.post('/api/transactions', json={
+        'date': date, 'amount': amount, 'description': description,
+        'category': category, 'type': type
+    })
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['transaction']
@@ -0,0 +1,64 @@
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+CATEGORIES = ['Food & Dining', 'Shopping', 'Transportation', 'Salary & Income']
+
+
+def bucket(day, granularity):
+    if granularity == 'week':
+        value = date.fromisoformat(day)
+        return (value - timedelta(days=value.weekday())).isoformat()
+    return day[:7] if granularity == 'month' else day
+
+
+def expected_summary(rows, start, end, granularity):
+    """Aggregate the way the original endpoint did, row by row in Python"""
+    rows = [row for row in rows if row['date'] >= start and (end is None or row['date'] <= end)]
+    income = sum(row['amount'] for row in rows if row['type'] == 'income')
+    expense = sum(row['amount'] for row in rows if row['type'] == 'expense')
+    trend, categories = defaultdict(float), defaultdict(float)
+    for row in rows:
+        if row['type'] == 'expense':
+            trend[bucket(row['date'], granularity)] += row['amount']
+            categories[row['category']] += row['amount']
+    return income, expense, dict(trend), dict(categories), len(rows)
+
+
+@pytest.fixture
+def rows(client):
+    rng = random.Random(8)
+    for _ in range(120):
+        type_ = 'income' if rng.random() < 0.2 else 'expense'
+        add_transaction(client, 'entry', round(rng.uniform(1, 500), 2),
+                        'Salary & Income' if type_ == 'income' else rng.choice(CATEGORIES[:3]),
+                        type=type_, date=f'2026-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}')
+    return client.get('/api/transactions').get_json()['transactions']
+
+
+@pytest.mark.parametrize('snapshot', [False, True])
+@pytest.mark.parametrize('granularity', ['day', 'week', 'month'])
+@pytest.mark.parametrize('start, end', [('2026-01-01', None), ('2026-01-15', '2026-02-20'), ('2027-01-01', None)])
+def test_summary_matches_row_by_row_totals(client, rows, monkeypatch, snapshot, granularity, start, end):
+    monkeypatch.setitem(app_module.app.config, 'ANALYTICS_SNAPSHOT', snapshot)
+    query = f'/api/analytics/personal?start={start}&granularity={granularity}' + (f'&end={end}' if end else '')
+    data = client.get(query).get_json()['data']
+
+    income, expense, trend, categories, count = expected_summary(rows, start, end, granularity)
+    assert data['income_total'] == pytest.approx(income)
+    assert data['expense_total'] == pytest.approx(expense)
+    assert data['balance'] == pytest.approx(income - expense)
+    assert data['transaction_count'] == count
+    assert data['daily_spending'] == pytest.approx(trend)
+    assert data['category_spending'] == pytest.approx(categories)
+    assert [name for name, _ in data['top_categories']] == sorted(categories, key=categories.get, reverse=True)[:5]
+
+
+def test_bad_arguments_are_rejected(client):
+    assert client.get('/api/analytics/personal?granularity=year').status_code == 400
+    assert client.get('/api/analytics/personal?start=01/02/2026').status_code == 400
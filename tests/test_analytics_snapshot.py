@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import app as app_module
+from test_analytics import expected_summary
+
+START = '2026-01-01'
+
+
+def insert(conn, rows):
+    conn.executemany('INSERT INTO transactions (date, description, amount, category, type) VALUES (?, ?, ?, ?, ?)',
+                     rows)
+    conn.commit()
+
+
+def assert_matches_table(snapshot, conn):
+    data = snapshot.summary(conn, START, granularity='month')
+    rows = [dict(zip(('date', 'amount', 'category', 'type'), row))
+            for row in conn.execute('SELECT date, amount, category, type FROM transactions')]
+    income, expense, trend, categories, count = expected_summary(rows, START, None, 'month')
+    assert (data['income_total'], data['expense_total']) == pytest.approx((income, expense))
+    assert data['transaction_count'] == count
+    assert data['daily_spending'] == pytest.approx(trend)
+    assert data['category_spending'] == pytest.approx(categories)
+
+
+@pytest.fixture
+def seeded(conn):
+    insert(conn, [(f'2026-0{1 + n % 3}-{1 + n % 28:02d}', f'entry {n}', 10 + n, ['Food', 'Rent'][n % 2],
+                   'income' if n % 10 == 0 else 'expense') for n in range(200)])
+    return conn
+
+
+def test_snapshot_follows_edits_and_deletes(seeded):
+    conn = seeded
+    snapshot = app_module.AnalyticsSnapshot()
+    assert_matches_table(snapshot, conn)
+
+    conn.execute("UPDATE transactions SET category = 'Travel', date = '2026-04-02' WHERE id % 7 = 0")
+    conn.execute("UPDATE transactions SET type = 'income', amount = amount * 2 WHERE id % 11 = 0")
+    conn.execute('DELETE FROM transactions WHERE id % 5 = 0')
+    insert(conn, [('2026-05-01', 'late entry', 99.5, 'Gifts', 'expense')])
+    assert_matches_table(snapshot, conn)
+
+
+def test_many_deletes_compact_the_columns(seeded):
+    conn = seeded
+    insert(conn, [('2026-02-01', f'bulk {n}', 1, 'Food', 'expense') for n in range(1500)])
+    snapshot = app_module.AnalyticsSnapshot()
+    snapshot.refresh(conn)
+    conn.execute("DELETE FROM transactions WHERE description LIKE 'bulk %'")
+    conn.commit()
+    assert_matches_table(snapshot, conn)
+    assert snapshot.dead == 0 and snapshot.size == 200
+
+
+def test_change_log_is_pruned_and_lagging_snapshots_reload(seeded):
+    conn = seeded
+    current, lagging = app_module.AnalyticsSnapshot(), app_module.AnalyticsSnapshot()
+    current.refresh(conn)
+    lagging.refresh(conn)
+
+    for n in range(20):
+        conn.execute("UPDATE transactions SET amount = ? WHERE id = 3", (n,))
+        conn.commit()
+        current.refresh(conn)
+    assert app_module.prune_change_log(conn, 'transaction_changes', current.change_id, keep=4) > 0
+    assert conn.execute('SELECT COUNT(*) FROM transaction_changes').fetchone()[0] == 4
+
+    # The lagging copy missed pruned edits, so it reloads the table instead
+    assert_matches_table(lagging, conn)
+    assert_matches_table(current, conn)
+
+
+@pytest.mark.parametrize('granularity', ['day', 'week', 'month'])
+@pytest.mark.parametrize('start, end', [(START, None), ('2026-02-01', '2026-02-04'), ('2026-02-04', None)])
+def test_odd_dates_are_counted_as_the_rollups_count_them(seeded, granularity, start, end):
+    conn = seeded
+    insert(conn, [('2026-02-04 18:30', 'with a time', 40, 'Food', 'expense'),
+                  ('2026-2-4', 'unpadded', 15, 'Rent', 'expense'),
+                  ('04/02/2026', 'day first', 25, 'Food', 'expense'),
+                  ('Feb 4 2026', 'spelled out', 35, 'Food', 'income'),
+                  (20260204, 'a number', 45, 'Rent', 'expense')])
+    app_module.rebuild_rollups(conn)
+    data = app_module.AnalyticsSnapshot().summary(conn, start, end, granularity)
+    expected = app_module.personal_analytics_summary(conn, start, end, granularity)
+    assert data.keys() == expected.keys()
+    for key in ('income_total', 'expense_total', 'daily_spending', 'category_spending'):
+        assert data[key] == pytest.approx(expected[key]), key
+    assert data['transaction_count'] == expected['transaction_count']
+
+
+def test_tables_over_the_cap_are_left_to_the_rollups(client, seeded, monkeypatch):
+    snapshot = app_module.AnalyticsSnapshot(max_rows=150)
+    assert snapshot.summary(seeded, START) is None
+    assert snapshot.too_large and snapshot.size == 0
+
+    monkeypatch.setitem(app_module.app.config, 'ANALYTICS_SNAPSHOT', True)
+    monkeypatch.setitem(app_module.app.config, 'ANALYTICS_SNAPSHOT_MAX_ROWS', 150)
+    monkeypatch.setattr(app_module, 'analytics_snapshots', {})
+    app_module.rebuild_rollups(seeded)
+    data = client.get(f'/api/analytics/personal?start={START}').get_json()['data']
+    assert data['transaction_count'] == 200
+
+
+def test_readers_do_not_wait_for_a_refresh(seeded):
+    conn = seeded
+    snapshot = app_module.AnalyticsSnapshot()
+    before = snapshot.summary(conn, START)
+    published = snapshot.published
+    totals = published[5].copy()
+
+    with snapshot.refresh_lock:
+        # Another request is refreshing: a current cube still answers, a stale one doesn't
+        assert snapshot.summary(conn, START) == before
+        insert(conn, [('2026-01-05', 'new', 500, 'Food', 'expense')])
+        assert snapshot.summary(conn, START) is None
+
+    assert snapshot.summary(conn, START)['expense_total'] == pytest.approx(before['expense_total'] + 500)
+    # The refresh changed a copy; the cube published before is untouched
+    assert snapshot.published is not published
+    assert np.array_equal(published[5], totals)
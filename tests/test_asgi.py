@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+
+import httpx
+
+import app as app_module
+from asgi import AsyncDispatch, application, wsgi_environ
+
+
+def http_client(asgi_app=application):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi_app), base_url='http://testserver')
+
+
+def request(method, url, **kwargs):
+    async def send():
+        async with http_client() as client:
+            return await client.request(method, url, **kwargs)
+    return asyncio.run(send())
+
+
+def http_scope(path, query_string=b''):
+    return {'type': 'http', 'method': 'GET', 'path': path, 'root_path': '', 'query_string': query_string,
+            'headers': [], 'http_version': '1.1', 'scheme': 'http', 'server': ('testserver', 80)}
+
+
+def test_responses_match_wsgi(client):
+    created = request('POST', '/api/transactions', json={
+        'date': '2026-10-01', 'amount': 120.5, 'description': 'Swiggy dinner',
+        'category': 'Food & Dining', 'type': 'expense'
+    })
+    assert created.status_code == 200
+    assert created.json()['transaction']['description'] == 'Swiggy dinner'
+
+    for url in ('/api/transactions', '/api/dashboard/stats', '/api/customers'):
+        assert request('GET', url).json() == client.get(url).get_json()
+
+
+def test_streamed_listing(client):
+    for i in range(3):
+        request('POST', '/api/transactions', json={
+            'date': f'2026-10-0{i + 1}', 'amount': 10, 'description': f'item {i}',
+            'category': 'Other', 'type': 'expense'
+        })
+    response = request('GET', '/api/transactions?format=ndjson')
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(line['description'] for line in lines) == ['item 0', 'item 1', 'item 2']
+
+
+def test_lifespan_startup_creates_the_schema(tmp_path, monkeypatch):
+    path = str(tmp_path / 'fresh.db')
+    monkeypatch.setitem(app_module.app.config, 'DATABASE', path)
+    messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+
+    asyncio.run(application({'type': 'lifespan'}, receive, send))
+    assert sent == ['lifespan.startup.complete', 'lifespan.shutdown.complete']
+    assert os.path.exists(path)
+
+
+def test_environ_follows_pep_3333():
+    scope = dict(http_scope('/app/api/transactions', b'limit=1'), root_path='/app', headers=[
+        (b'content-type', b'application/json'), (b'content-length', b'2'),
+        (b'x-tenant', b'acme'), (b'accept', b'text/html'), (b'accept', b'application/json'),
+    ])
+    environ = wsgi_environ(scope, None)
+    assert (environ['SCRIPT_NAME'], environ['PATH_INFO'], environ['QUERY_STRING']) == \
+        ('/app', '/api/transactions', 'limit=1')
+    assert (environ['CONTENT_TYPE'], environ['CONTENT_LENGTH']) == ('application/json', '2')
+    assert environ['HTTP_X_TENANT'] == 'acme'
+    assert environ['HTTP_ACCEPT'] == 'text/html,application/json'
+
+
+def test_slow_upload_holds_no_db_thread(client):
+    dispatch = AsyncDispatch(app_module.app, 1)
+
+    async def run():
+        arrived = asyncio.Event()
+
+        async def body():
+            yield b'{"date": "2026-10-01", "amount": 50, '
+            await arrived.wait()
+            yield b'"description": "Late upload", "category": "Other", "type": "expense"}'
+
+        async with http_client(dispatch) as http:
+            upload = asyncio.ensure_future(http.post(
+                '/api/transactions', content=body(), headers={'content-type': 'application/json'}
+            ))
+            await asyncio.sleep(0.05)
+            # The only thread is free while the upload is still arriving
+            stats = await asyncio.wait_for(http.get('/api/dashboard/stats'), 5)
+            arrived.set()
+            return stats, await upload
+
+    stats, upload = asyncio.run(run())
+    assert stats.status_code == 200
+    assert upload.json()['transaction']['description'] == 'Late upload'
+
+
+def test_slow_reader_holds_no_db_thread(client):
+    dispatch = AsyncDispatch(app_module.app, 1)
+
+    async def run():
+        read = asyncio.Event()
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                await read.wait()
+            sent.append(message)
+
+        reader = asyncio.ensure_future(dispatch(http_scope('/api/customers'), receive, send))
+        await asyncio.sleep(0.05)
+        async with http_client(dispatch) as http:
+            stats = await asyncio.wait_for(http.get('/api/dashboard/stats'), 5)
+        read.set()
+        await reader
+        return stats, sent
+
+    stats, sent = asyncio.run(run())
+    assert stats.status_code == 200
+    assert sent[0]['status'] == 200
+    assert json.loads(b''.join(m.get('body', b'') for m in sent[1:])) == {'customers': []}
+
+
+def test_disconnect_mid_stream_frees_the_thread(client, conn):
+    conn.executemany(
+        'INSERT INTO transactions (date, amount, description, category, type) VALUES (?, ?, ?, ?, ?)',
+        [('2026-10-01', 1, f'row {i}', 'Other', 'expense') for i in range(12000)]
+    )
+    conn.commit()
+    dispatch = AsyncDispatch(app_module.app, 1)
+
+    async def run():
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            if message['type'] == 'http.response.body':
+                raise OSError('client went away')
+
+        try:
+            await dispatch(http_scope('/api/transactions', b'format=ndjson'), receive, send)
+        except OSError:
+            pass
+        # The producer was blocked on a full buffer; it must stop and give the thread back
+        async with http_client(dispatch) as http:
+            return await asyncio.wait_for(http.get('/api/dashboard/stats'), 5)
+
+    assert asyncio.run(run()).status_code == 200
+
+
+def test_app_errors_before_the_response_propagate():
+    def broken(environ, start_response):
+        raise RuntimeError('boom')
+
+    async def receive():
+        return {'type': 'http.request', 'body': b''}
+
+    async def send(message):
+        raise AssertionError('nothing should be sent')
+
+    try:
+        asyncio.run(AsyncDispatch(broken, 1)(http_scope('/'), receive, send))
+    except RuntimeError as e:
+        assert str(e) == 'boom'
+    else:
+        raise AssertionError('error was swallowed')
@@ -0,0 +1,33 @@
+import app as app_module
+from test_rule_engine import corpus
+
+
+def test_batch_equals_one_at_a_time(db_path):
+    categorizer = app_module.transaction_categorizer
+    categorizer.learn_from_user_correction('demo', 'Sharma kirana store', 'Groceries')
+    descriptions = corpus(categorizer.category_patterns, 500) + ['Sharma kirana store'] * 3
+    amounts = [float(i % 3) * 100 or None for i in range(len(descriptions))]
+
+    batch = categorizer.categorize_many(descriptions, amounts, 'demo')
+    assert batch == [categorizer.categorize_transaction(description, amount, 'demo')
+                     for description, amount in zip(descriptions, amounts)]
+    assert batch[-1]['source'] == 'user_learned'
+    # Results are independent copies even for repeated descriptions
+    batch[0]['alternatives'].append('mutated')
+    assert categorizer.categorize_many(descriptions[:1])[0] == categorizer.categorize_transaction(descriptions[0])
+
+
+def test_batch_api(client):
+    response = client.post('/api/ai/categorize-batch', json={
+        'descriptions': ['Swiggy dinner', 'Uber ride', ''], 'amounts': [300, 150, 10]
+    })
+    assert response.status_code == 200
+    suggestions = response.get_json()['suggestions']
+    assert [s['suggested_category'] for s in suggestions] == ['Food & Dining', 'Transportation', 'Other']
+
+
+def test_batch_api_rejects_bad_input(client):
+    assert client.post('/api/ai/categorize-batch', json={'descriptions': 'Swiggy'}).status_code == 400
+    response = client.post('/api/ai/categorize-batch', json={'descriptions': ['a', 'b'], 'amounts': [1]})
+    assert response.status_code == 400
+    assert 'one entry per description' in response.get_json()['error']
@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+
+import app as app_module
+
+# Made-up merchants no rule matches, so only the model can place them
+MERCHANTS = {'quorvex': 'Groceries', 'blintal': 'Rent', 'marvosh': 'Education'}
+
+
+def seed(conn, per_merchant):
+    conn.executemany(
+        "INSERT INTO transactions (date, description, amount, category, type) VALUES ('2026-10-01', ?, 10, ?, 'expense')",
+        [(f'{merchant} {n}', category) for merchant, category in MERCHANTS.items() for n in range(per_merchant)],
+    )
+    conn.commit()
+
+
+def counts(model):
+    """The model's counts keyed by (token, category), independent of id order"""
+    return {
+        (token, category): model.counts[token_id, category_id]
+        for token, token_id in model.tokens.items()
+        for category, category_id in model.category_ids.items()
+        if model.counts[token_id, category_id]
+    }
+
+
+def wait_for_model(categorizer):
+    thread = categorizer._training_thread
+    if thread is not None:
+        thread.join()
+
+
+def test_model_is_silent_below_the_calibration_threshold(db_path, conn):
+    seed(conn, 50)
+    categorizer = app_module.transaction_categorizer
+    summary = categorizer.train_model()
+    assert summary['held_out_accuracy'] is None and not categorizer.model.calibrated
+    assert categorizer.categorize_transaction('quorvex weekly')['source'] == 'default'
+
+
+def test_calibrated_model_places_unknown_merchants(db_path, conn):
+    seed(conn, 100)
+    categorizer = app_module.transaction_categorizer
+    summary = categorizer.train_model()
+    assert summary['held_out_accuracy'] == 1.0 and categorizer.model.calibrated
+
+    result = categorizer.categorize_transaction('Quorvex weekly')
+    assert result['source'] == 'model' and result['suggested_category'] == 'Groceries'
+    assert 0.5 < result['confidence'] <= 1
+    batch = categorizer.categorize_many(['blintal october', 'unheard of'])
+    assert [r['suggested_category'] for r in batch] == ['Rent', 'Other']
+
+
+def test_rules_win_over_the_model_unless_tied(db_path, conn):
+    conn.executemany(
+        "INSERT INTO transactions (date, description, amount, category, type) VALUES ('2026-10-01', ?, 10, 'Shopping', 'expense')",
+        [(f'uber ride {n}',) for n in range(300)],
+    )
+    conn.commit()
+    categorizer = app_module.transaction_categorizer
+    categorizer.train_model()
+    assert categorizer.model.calibrated
+    result = categorizer.categorize_transaction('uber ride weekly')
+    assert (result['source'], result['suggested_category']) == ('rule_based', 'Transportation')
+    # 'home' ties Transportation with Bills & Utilities, so the model breaks the tie
+    result = categorizer.categorize_transaction('uber ride home')
+    assert (result['source'], result['suggested_category']) == ('model', 'Shopping')
+
+
+def test_incremental_updates_match_a_retrain(db_path, conn):
+    seed(conn, 100)
+    categorizer = app_module.transaction_categorizer
+    categorizer.train_model()
+
+    seed(conn, 5)
+    conn.execute("UPDATE transactions SET category = 'Rent' WHERE description = 'quorvex 7'")
+    conn.execute("UPDATE transactions SET description = 'marvosh fees' WHERE description = 'marvosh 8'")
+    conn.execute("DELETE FROM transactions WHERE description LIKE 'blintal 1_'")
+    conn.commit()
+    assert categorizer._sync_category_model(conn) is False
+
+    retrained = app_module.TransactionCategorizer(legacy_learning_path=None, rule_engine=categorizer.rule_engine)
+    retrained.train_model()
+    assert categorizer.model.documents == retrained.model.documents
+    incremental, expected = counts(categorizer.model), counts(retrained.model)
+    assert incremental.keys() == expected.keys()
+    assert np.allclose([incremental[key] for key in expected], list(expected.values()))
+
+
+def test_change_log_is_pruned_and_lagging_models_retrain(db_path, conn):
+    seed(conn, 100)
+    categorizer = app_module.transaction_categorizer
+    categorizer.train_model()
+    lagging = app_module.TransactionCategorizer(legacy_learning_path=None, rule_engine=categorizer.rule_engine)
+    lagging.train_model()
+
+    for n in range(30):
+        conn.execute("UPDATE transactions SET category = ? WHERE description = 'quorvex 1'",
+                     ('Rent' if n % 2 else 'Groceries',))
+    conn.commit()
+    categorizer._sync_category_model(conn)
+    applied = categorizer._model_log_id
+    assert app_module.prune_change_log(conn, 'category_model_log', applied, keep=5) == applied - 5
+    assert conn.execute('SELECT COUNT(*) FROM category_model_log').fetchone()[0] == 5
+
+    # The other worker never saw the pruned edits, so it starts afresh
+    assert lagging._sync_category_model(conn) is True
+    lagging.sync_model_in_background()
+    wait_for_model(lagging)
+    assert counts(lagging.model) == counts(categorizer.model)
+
+
+def test_categorizing_leaves_the_model_to_its_thread(db_path, conn, monkeypatch):
+    seed(conn, 100)
+    categorizer = app_module.transaction_categorizer
+    categorizer.learning_refresh_interval = 0
+    synced = []
+    sync = categorizer._sync_category_model
+    monkeypatch.setattr(categorizer, '_sync_category_model',
+                        lambda conn: synced.append(threading.current_thread().name) or sync(conn))
+
+    # The first call answers from the rules and trains in the background
+    assert categorizer.categorize_transaction('quorvex weekly')['source'] == 'default'
+    wait_for_model(categorizer)
+    assert categorizer.model.calibrated
+    assert categorizer.categorize_transaction('quorvex weekly')['source'] == 'model'
+
+    seed(conn, 100)
+    categorizer.categorize_transaction('quorvex weekly')
+    wait_for_model(categorizer)
+    assert synced and set(synced) == {'category-model'}
+    assert categorizer._model_transaction_id == conn.execute('SELECT MAX(id) FROM transactions').fetchone()[0]
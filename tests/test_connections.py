@@ -0,0 +1,56 @@
+import sqlite3
+import threading
+
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+
+def test_requests_on_a_thread_reuse_one_connection(client):
+    seen = []
+    with app_module.app.test_request_context():
+        seen.append(app_module.get_db())
+        assert app_module.get_db() is seen[0]
+    with app_module.app.test_request_context():
+        seen.append(app_module.get_db())
+    assert seen[0] is seen[1]
+    assert seen[0].execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    other = []
+
+    def on_another_thread():
+        with app_module.app.test_request_context():
+            other.append(app_module.get_db())
+
+    thread = threading.Thread(target=on_another_thread)
+    thread.start()
+    thread.join()
+    assert other[0] is not seen[0]
+
+
+def test_failed_request_leaves_no_open_transaction(client):
+    with app_module.app.test_request_context():
+        conn = app_module.get_db()
+        conn.execute("INSERT INTO transactions (date, amount, description, category, type) "
+                     "VALUES ('2026-10-01', 1, 'half done', 'Other', 'expense')")
+        assert conn.in_transaction
+    assert not conn.in_transaction
+    assert client.get('/api/dashboard/stats').get_json()['personal']['total_transactions'] == 0
+
+
+def test_connections_per_thread_are_bounded(tmp_path, monkeypatch, client):
+    monkeypatch.setitem(app_module.app.config, 'SHARD_CONNECTIONS', 2)
+    opened = []
+    for i in range(3):
+        path = str(tmp_path / f'shard{i}.db')
+        app_module.init_db(path)
+        with app_module.app.test_request_context():
+            app_module.g.db_path = path
+            opened.append(app_module.get_db())
+    assert list(app_module._thread_connections.by_path)[-2:] == [str(tmp_path / 'shard1.db'),
+                                                                 str(tmp_path / 'shard2.db')]
+    assert len(app_module._thread_connections.by_path) == 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute('SELECT 1')
+    add_transaction(client, 'still works', 1, 'Other')
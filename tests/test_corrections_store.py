@@ -0,0 +1,47 @@
+import json
+import os
+
+import app as app_module
+from app import TransactionCategorizer
+
+
+def new_categorizer(**kwargs):
+    kwargs.setdefault('legacy_learning_path', None)
+    return TransactionCategorizer(rule_engine=app_module.transaction_categorizer.rule_engine, **kwargs)
+
+
+def test_corrections_survive_a_restart(db_path, conn):
+    first = new_categorizer()
+    first.learn_from_user_correction('asha', 'Sharma kirana store', 'Groceries')
+    first.close_learning_connection()
+
+    assert conn.execute('SELECT user_id, keywords, category FROM user_corrections').fetchall() == [
+        ('asha', 'sharma|kirana|store', 'Groceries')
+    ]
+    restarted = new_categorizer()
+    assert restarted.categorize_transaction('sharma', None, 'asha')['suggested_category'] == 'Groceries'
+    restarted.close_learning_connection()
+
+
+def test_other_workers_corrections_are_picked_up(db_path):
+    worker_a = new_categorizer(learning_refresh_interval=0)
+    worker_b = new_categorizer(learning_refresh_interval=0)
+    assert worker_b.categorize_transaction('sharma', None, 'asha')['source'] != 'user_learned'
+
+    worker_a.learn_from_user_correction('asha', 'Sharma kirana store', 'Groceries')
+    assert worker_b.categorize_transaction('sharma', None, 'asha')['suggested_category'] == 'Groceries'
+    worker_a.close_learning_connection()
+    worker_b.close_learning_connection()
+
+
+def test_legacy_json_is_imported_once(db_path, conn, tmp_path):
+    legacy = tmp_path / 'user_learning.json'
+    legacy.write_text(json.dumps({'asha': {'sharma|kirana|store': 'Groceries'}}))
+
+    for _ in range(2):
+        categorizer = new_categorizer(legacy_learning_path=str(legacy))
+        assert categorizer.categorize_transaction('kirana', None, 'asha')['suggested_category'] == 'Groceries'
+        categorizer.close_learning_connection()
+
+    assert conn.execute('SELECT COUNT(*) FROM user_corrections').fetchone()[0] == 1
+    assert not legacy.exists() and os.path.exists(f'{legacy}.migrated')
@@ -0,0 +1,73 @@
+import pytest
+
+
+def add_customer(client, name, phone='', balance=0):
+    customer = client.post('/api/customers', json={'name': name, 'phone': phone}).get_json()['customer']
+    if balance:
+        client.post(f"/api/customers/{customer['id']}/transactions", json={
+            'type': 'credit' if balance > 0 else 'payment', 'amount': abs(balance),
+            'description': 'Opening balance', 'date': '2026-10-01'
+        })
+    return customer['id']
+
+
+def names(client, url):
+    response = client.get(url)
+    assert response.status_code == 200, response.get_json()
+    return [customer['name'] for customer in response.get_json()['customers']]
+
+
+def test_typeahead_by_name_and_phone(client):
+    add_customer(client, 'Ravi Kumar', '9810012345')
+    add_customer(client, 'ravindra Singh', '9810077777')
+    add_customer(client, 'Asha_Traders', '+919900011111')
+    add_customer(client, 'Ashok', '9900022222')
+
+    assert names(client, '/api/customers?q=RAV') == ['Ravi Kumar', 'ravindra Singh']
+    assert names(client, '/api/customers?q=ravi&limit=1') == ['Ravi Kumar']
+    # _ is a literal underscore, not a LIKE wildcard
+    assert names(client, '/api/customers?q=asha_') == ['Asha_Traders']
+    assert names(client, '/api/customers?q=99000') == ['Ashok']
+    assert names(client, '/api/customers?q=%2B9199') == ['Asha_Traders']
+    # Spaces and dashes in the typed number are ignored
+    assert names(client, '/api/customers?q=98100-77') == ['ravindra Singh']
+    assert names(client, '/api/customers?q=98100') == ['Ravi Kumar', 'ravindra Singh']
+    assert client.get('/api/customers?q=ra&limit=0').status_code == 400
+
+
+def test_top_debtors_and_creditors_page_by_balance(client):
+    for name, balance in (('A', 500), ('B', 1500), ('C', 500), ('D', -300), ('E', -900), ('F', 0)):
+        add_customer(client, name, balance=balance)
+
+    first = client.get('/api/customers/top?limit=2').get_json()
+    assert [c['name'] for c in first['customers']] == ['B', 'C']
+    rest = client.get(f"/api/customers/top?limit=2&after={first['next_cursor']}").get_json()
+    assert [c['name'] for c in rest['customers']] == ['A'] and rest['next_cursor'] is None
+
+    assert names(client, '/api/customers/top?side=creditors') == ['E', 'D']
+    assert client.get('/api/customers/top?side=everyone').status_code == 400
+    assert client.get('/api/customers/top?after=oops').status_code == 400
+
+
+def business_stats(client):
+    return client.get('/api/dashboard/stats').get_json()['business']
+
+
+def test_dashboard_counters_follow_every_balance_change(client, conn):
+    ravi = add_customer(client, 'Ravi', balance=1000)
+    asha = add_customer(client, 'Asha', balance=-250)
+    assert business_stats(client) == {'total_customers': 2, 'total_receivables': 1000, 'total_payables': 250}
+
+    # Ravi swings from owing you to being owed
+    client.post(f'/api/customers/{ravi}/transactions', json={
+        'type': 'payment', 'amount': 1400, 'description': 'Advance', 'date': '2026-10-02'
+    })
+    assert business_stats(client) == {'total_customers': 2, 'total_receivables': 0, 'total_payables': 650}
+
+    conn.execute('DELETE FROM customers WHERE id = ?', (asha,))
+    conn.commit()
+    expected = conn.execute(
+        'SELECT COUNT(*), SUM(MAX(balance, 0)), SUM(MAX(-balance, 0)) FROM customers'
+    ).fetchone()
+    stats = business_stats(client)
+    assert (stats['total_customers'], stats['total_receivables'], stats['total_payables']) == pytest.approx(expected)
@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+
+@pytest.fixture
+def group_commit(monkeypatch, db_path):
+    monkeypatch.setitem(app_module.app.config, 'GROUP_COMMIT', True)
+    yield
+    app_module.close_group_writer(db_path)
+
+
+def test_concurrent_posts_keep_rollups_and_balances(client, conn, group_commit):
+    customer_id = client.post('/api/customers', json={'name': 'Ravi', 'phone': '999'}).get_json()['customer']['id']
+    errors = []
+
+    def post(i):
+        try:
+            local = app_module.app.test_client()
+            add_transaction(local, f'Swiggy order {i}', 10 + i, 'Food & Dining', date=f'2026-10-{1 + i % 5:02d}')
+            response = local.post(f'/api/customers/{customer_id}/transactions', json={
+                'date': '2026-10-01', 'amount': 100, 'description': f'rice {i}',
+                'type': 'credit' if i % 4 else 'payment'
+            })
+            assert response.status_code == 200, response.get_json()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=post, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    assert conn.execute('SELECT COUNT(*), SUM(amount) FROM transactions').fetchone() == (40, sum(10 + i for i in range(40)))
+    rollups = conn.execute('SELECT date, SUM(total), SUM(count) FROM daily_rollups GROUP BY date ORDER BY date').fetchall()
+    assert rollups == conn.execute('''
+        SELECT date, SUM(amount), COUNT(*) FROM transactions GROUP BY date ORDER BY date
+    ''').fetchall()
+    # 30 credits and 10 payments of 100
+    assert conn.execute('SELECT balance FROM customers WHERE id = ?', (customer_id,)).fetchone()[0] == 2000
+
+
+def test_failed_item_does_not_undo_its_batch(db_path):
+    writer = app_module.GroupCommitWriter(db_path, max_delay=0.05)
+
+    def insert(conn, description):
+        if description == 'bad':
+            raise ValueError('rejected')
+        conn.execute("INSERT INTO transactions (date, amount, description, category, type) "
+                     "VALUES ('2026-10-01', 1, ?, 'Other', 'expense')", (description,))
+        return description
+
+    results = {}
+
+    def submit(description):
+        try:
+            results[description] = writer.submit(insert, description)
+        except ValueError as e:
+            results[description] = str(e)
+
+    threads = [threading.Thread(target=submit, args=(d,)) for d in ('a', 'bad', 'b')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writer.close()
+    writer.thread.join(5)
+
+    assert results == {'a': 'a', 'bad': 'rejected', 'b': 'b'}
+    assert not writer.thread.is_alive()
+    with pytest.raises(app_module.GroupCommitWriter.WriterClosed):
+        writer.submit(insert, 'c')
+
+
+def test_stuck_writer_times_out_without_writing(db_path, conn):
+    writer = app_module.GroupCommitWriter(db_path, timeout=0.2)
+    started, release = threading.Event(), threading.Event()
+
+    def block(conn):
+        started.set()
+        release.wait(5)
+
+    blocker = threading.Thread(target=writer.submit, args=(block,))
+    blocker.start()
+    started.wait(5)
+
+    def insert(conn):
+        conn.execute("INSERT INTO transactions (date, amount, description, category, type) "
+                     "VALUES ('2026-10-01', 1, 'late', 'Other', 'expense')")
+
+    with pytest.raises(TimeoutError):
+        # Queued behind the blocked batch, and withdrawn once the wait runs out
+        writer.submit(insert)
+    release.set()
+    blocker.join()
+    writer.close()
+    writer.thread.join(5)
+    assert conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0] == 0
+
+
+def test_evicted_shard_stops_its_writer(tmp_path, monkeypatch, db_path):
+    router = app_module.ShardRouter(str(tmp_path / 'shards'), max_tenants=1)
+    first, second = router.path_for('a'), router.path_for('b')
+    router.ensure_schema(first)
+    router.ensure_schema(second)
+    writer = app_module.group_writers[first] = app_module.GroupCommitWriter(first)
+    writer.submit(lambda conn: None)
+
+    router.tenant_state(first)
+    router.tenant_state(second)
+    writer.thread.join(5)
+    assert first not in app_module.group_writers
+    assert writer.closed and not writer.thread.is_alive()
@@ -0,0 +1,54 @@
+import gc
+import logging
+import os
+import runpy
+import sqlite3
+import subprocess
+import sys
+
+import app as app_module
+from conftest import ROOT
+
+CONFIG = os.path.join(ROOT, 'gunicorn.conf.py')
+
+
+class FakeServer:
+    log = logging.getLogger('gunicorn-test')
+
+
+def test_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv('MY_MONEY_WORKERS', '3')
+    monkeypatch.setenv('PORT', '8123')
+    settings = runpy.run_path(CONFIG)
+    assert settings['workers'] == 3 and settings['bind'] == '0.0.0.0:8123'
+    assert settings['preload_app'] is True
+
+
+def test_importing_the_app_touches_no_database(tmp_path):
+    path = tmp_path / 'never-created.db'
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=ROOT, check=True,
+                   env={**os.environ, 'MY_MONEY_DATABASE': str(path)})
+    assert not path.exists()
+
+
+def test_when_ready_prepares_shared_state(tmp_path, monkeypatch):
+    path = str(tmp_path / 'database.db')
+    monkeypatch.setitem(app_module.app.config, 'DATABASE', path)
+    monkeypatch.setitem(app_module.app.config, 'ANALYTICS_SNAPSHOT', True)
+    monkeypatch.setattr(app_module, 'analytics_snapshots', {})
+    categorizer = app_module.TransactionCategorizer(
+        legacy_learning_path=None, rule_engine=app_module.transaction_categorizer.rule_engine
+    )
+    monkeypatch.setattr(app_module, 'transaction_categorizer', categorizer)
+
+    try:
+        runpy.run_path(CONFIG)['when_ready'](FakeServer())
+    finally:
+        gc.unfreeze()
+
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == app_module.MIGRATIONS[-1][0]
+    conn.close()
+    assert categorizer._model_transaction_id is not None
+    assert categorizer._learning_loaded and categorizer._learning_conn is None
+    assert path in app_module.analytics_snapshots
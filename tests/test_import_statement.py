@@ -0,0 +1,45 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from conftest import ROOT
+
+STATEMENT = '''Date,Narration,Debit,Credit
+01/10/2026,SWIGGY ORDER 1234,250.00,
+02/10/2026,SALARY OCT,,50000.00
+03/10/2026,UBER TRIP,180.50,
+03/10/2026,UBER TRIP,180.50,
+'''
+
+
+def run_cli(*args, cwd):
+    env = {key: value for key, value in os.environ.items() if not key.startswith('MY_MONEY_')}
+    return subprocess.run([sys.executable, os.path.join(ROOT, 'import_statement.py'), *args],
+                          cwd=cwd, env=env, capture_output=True, text=True, timeout=120)
+
+
+def test_cli_imports_into_the_given_database(tmp_path):
+    statement = tmp_path / 'statement.csv'
+    statement.write_text(STATEMENT)
+    db = tmp_path / 'shop.db'
+
+    result = run_cli(str(statement), '--db', str(db), cwd=tmp_path)
+    assert result.returncode == 0, result.stderr
+    assert 'Imported 4 of 4 rows' in result.stdout
+
+    conn = sqlite3.connect(db)
+    rows = conn.execute('SELECT date, amount, category, type FROM transactions ORDER BY id').fetchall()
+    conn.close()
+    assert rows == [
+        ('2026-10-01', 250.0, 'Food & Dining', 'expense'),
+        ('2026-10-02', 50000.0, 'Salary & Income', 'income'),
+        ('2026-10-03', 180.5, 'Transportation', 'expense'),
+        ('2026-10-03', 180.5, 'Transportation', 'expense'),
+    ]
+    # Only the database asked for is created
+    assert not (tmp_path / 'database.db').exists()
+
+    again = run_cli(str(statement), '--db', str(db), cwd=tmp_path)
+    assert again.returncode == 0, again.stderr
+    assert 'Imported 0 of 4 rows (4 duplicates' in again.stdout
@@ -0,0 +1,89 @@
+import threading
+
+import app as app_module
+
+
+def add_customer(client, name='Ravi'):
+    return client.post('/api/customers', json={'name': name}).get_json()['customer']['id']
+
+
+def invoice(customer_id, day, rate=100, **fields):
+    return {'customer_id': customer_id, 'description': 'Cement bags', 'quantity': 2, 'rate': rate,
+            'date': day, **fields}
+
+
+def test_amounts_and_numbering(client):
+    customer = add_customer(client)
+    first = client.post('/api/invoices', json=invoice(customer, '2026-03-01', gst_rate=5)).get_json()['invoice']
+    assert (first['subtotal'], first['gst_amount'], first['total']) == (200, 10, 210)
+    assert first['number'] == 'INV-2026-001' and first['status'] == 'pending'
+
+    batch = client.post('/api/invoices/batch', json={'invoices': [
+        invoice(customer, '2026-04-01'), invoice(customer, '2025-12-31'), invoice(customer, '2026-04-02'),
+    ]}).get_json()['invoices']
+    assert [i['number'] for i in batch] == ['INV-2026-002', 'INV-2025-001', 'INV-2026-003']
+
+
+def test_concurrent_creation_leaves_no_gaps(client):
+    customer = add_customer(client)
+
+    def create():
+        local = app_module.app.test_client()
+        for _ in range(5):
+            assert local.post('/api/invoices', json=invoice(customer, '2026-05-01')).status_code == 200
+
+    threads = [threading.Thread(target=create) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    numbers = [i['number'] for i in client.get('/api/invoices').get_json()['invoices']]
+    assert sorted(numbers) == [f'INV-2026-{n:03d}' for n in range(1, 21)]
+
+
+def test_validation(client):
+    customer = add_customer(client)
+    assert client.post('/api/invoices', json=invoice(customer, '2026-03-01', gst_rate=7)).status_code == 400
+    assert client.post('/api/invoices', json=invoice(customer, '2026-03-01', rate=0)).status_code == 400
+    assert client.post('/api/invoices', json=invoice(4242, '2026-03-01')).status_code == 404
+    response = client.post('/api/invoices/batch', json={'invoices': [invoice(customer, '2026-03-01'), {}]})
+    assert response.status_code == 400
+    assert client.get('/api/invoices').get_json()['invoices'] == []
+
+
+def test_non_finite_amounts_are_rejected(client):
+    customer = add_customer(client)
+    for fields in ({'quantity': 'nan'}, {'rate': 'inf'}, {'rate': '1e309'}, {'quantity': 1e200, 'rate': 1e200}):
+        response = client.post('/api/invoices', json={**invoice(customer, '2026-03-01'), **fields})
+        assert response.status_code == 400
+        assert response.get_json()['error'] == 'quantity and rate must be finite numbers'
+    # No number was used up by the rejected requests
+    created = client.post('/api/invoices', json=invoice(customer, '2026-03-01')).get_json()['invoice']
+    assert created['number'] == 'INV-2026-001'
+
+
+def test_aging_buckets_and_status(client):
+    ravi, asha = add_customer(client, 'Ravi'), add_customer(client, 'Asha')
+    created = client.post('/api/invoices/batch', json={'invoices': [
+        invoice(ravi, '2026-06-25'),   # 6 days old: 0-30
+        invoice(ravi, '2026-05-15'),   # 47 days: 31-60
+        invoice(asha, '2026-04-10'),   # 82 days: 61-90
+        invoice(asha, '2026-01-01'),   # 90+
+        invoice(asha, '2026-06-30'),   # paid below
+        invoice(asha, '2026-07-05'),   # after as_of
+    ]}).get_json()['invoices']
+    assert client.put(f"/api/invoices/{created[4]['id']}/status", json={'status': 'paid'}).status_code == 200
+    assert client.put(f"/api/invoices/{created[4]['id']}/status", json={'status': 'lost'}).status_code == 400
+    assert client.put('/api/invoices/4242/status', json={'status': 'paid'}).status_code == 404
+
+    aging = client.get('/api/invoices/aging?as_of=2026-07-01').get_json()['aging']
+    assert {name: bucket['count'] for name, bucket in aging['buckets'].items()} == \
+        {'0-30': 1, '31-60': 1, '61-90': 1, '90+': 1}
+    assert aging['total_outstanding'] == 4 * 236
+
+    per_customer = client.get('/api/invoices/aging?as_of=2026-07-01&by_customer=1').get_json()['aging']
+    assert per_customer['customers'][str(asha)]['90+'] == {'count': 1, 'total': 236}
+    assert per_customer['customers'][str(ravi)]['90+'] == {'count': 0, 'total': 0}
+
+    paid = client.get(f'/api/invoices?status=paid&customer_id={asha}').get_json()['invoices']
+    assert [i['id'] for i in paid] == [created[4]['id']]
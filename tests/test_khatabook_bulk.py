@@ -0,0 +1,68 @@
+def add_customer(client, name):
+    return client.post('/api/customers', json={'name': name, 'phone': '999'}).get_json()['customer']['id']
+
+
+def balances(conn):
+    return dict(conn.execute('SELECT id, balance FROM customers'))
+
+
+def test_bulk_posting_updates_every_balance(client, conn):
+    ravi, asha = add_customer(client, 'Ravi'), add_customer(client, 'Asha')
+    entries = [
+        {'customer_id': ravi, 'date': '2026-10-01', 'amount': 500, 'type': 'credit', 'description': 'rice'},
+        {'customer_id': ravi, 'date': '2026-10-02', 'amount': 200, 'type': 'payment'},
+        {'customer_id': asha, 'date': '2026-10-02', 'amount': 75.5, 'type': 'payment'},
+    ]
+    response = client.post('/api/customers/transactions/bulk', json={'entries': entries})
+    assert response.get_json() == {'success': True, 'entries_posted': 3, 'customers_updated': 2}
+    assert balances(conn) == {ravi: 300, asha: -75.5}
+    assert conn.execute('SELECT COUNT(*) FROM customer_transactions').fetchone()[0] == 3
+
+
+def test_invalid_batch_posts_nothing(client, conn):
+    ravi = add_customer(client, 'Ravi')
+    entries = [
+        {'customer_id': ravi, 'date': '2026-10-01', 'amount': 500, 'type': 'credit'},
+        {'customer_id': ravi, 'date': '2026-10-01', 'amount': -5, 'type': 'credit'},
+        {'customer_id': ravi, 'date': '2026-10-01', 'amount': 5, 'type': 'gift'},
+        {'customer_id': ravi, 'amount': 5, 'type': 'payment'},
+        {'customer_id': 4242, 'date': '2026-10-01', 'amount': 5, 'type': 'payment'},
+    ]
+    response = client.post('/api/customers/transactions/bulk', json={'entries': entries})
+    assert response.status_code == 400
+    assert response.get_json()['details'] == [
+        {'index': 1, 'error': 'amount must be positive'},
+        {'index': 2, 'error': 'type must be credit or payment'},
+        {'index': 3, 'error': 'missing field date'},
+        {'error': 'unknown customer ids', 'customer_ids': [4242]},
+    ]
+    assert balances(conn) == {ravi: 0}
+    assert conn.execute('SELECT COUNT(*) FROM customer_transactions').fetchone()[0] == 0
+    assert client.post('/api/customers/transactions/bulk', json={'entries': []}).status_code == 400
+
+
+def test_non_finite_amounts_are_rejected(client, conn):
+    ravi = add_customer(client, 'Ravi')
+    entries = [{'customer_id': ravi, 'date': '2026-10-01', 'amount': amount, 'type': 'credit'}
+               for amount in ('nan', 'inf', '1e309', 10)]
+    response = client.post('/api/customers/transactions/bulk', json={'entries': entries})
+    assert response.status_code == 400
+    assert response.get_json()['details'] == [
+        {'index': index, 'error': 'amount must be a finite number'} for index in range(3)
+    ]
+    assert balances(conn) == {ravi: 0}
+    stats = client.get('/api/dashboard/stats').get_json()['business']
+    assert (stats['total_receivables'], stats['total_payables']) == (0, 0)
+
+
+def test_reconcile_fixes_drifted_balances(client, conn):
+    ravi, asha = add_customer(client, 'Ravi'), add_customer(client, 'Asha')
+    client.post(f'/api/customers/{ravi}/transactions', json={
+        'date': '2026-10-01', 'amount': 300, 'description': 'rice', 'type': 'credit'})
+    conn.execute('UPDATE customers SET balance = 1 WHERE id IN (?, ?)', (ravi, asha))
+    conn.commit()
+
+    response = client.post('/api/customers/reconcile').get_json()
+    assert response['customers_fixed'] == 2
+    assert balances(conn) == {ravi: 300, asha: 0}
+    assert client.post('/api/customers/reconcile').get_json()['customers_fixed'] == 0
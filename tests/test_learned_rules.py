@@ -0,0 +1,45 @@
+import app as app_module
+from app import LearnedRuleStore
+
+
+def test_keywords_are_the_first_three_significant_words():
+    assert LearnedRuleStore.keywords_for('To Sharma Kirana Store, Sector 15') == ('sharma', 'kirana', 'store')
+    assert LearnedRuleStore.keywords_for('ATM at 12') == ()
+    assert LearnedRuleStore.keywords_from_pattern('sharma|kirana|store') == ('sharma', 'kirana', 'store')
+
+
+def test_lookup_is_per_user_and_most_recent_wins():
+    store = LearnedRuleStore()
+    store.add('asha', ('sharma', 'kirana'), 'Groceries')
+    store.add('ravi', ('sharma',), 'Rent')
+    store.add('asha', ('kirana', 'store'), 'Household')
+
+    assert store.lookup('asha', 'sharma kirana') == 'Household'
+    assert store.lookup('asha', 'paid sharma') == 'Groceries'
+    assert store.lookup('ravi', 'paid sharma') == 'Rent'
+    assert store.lookup('asha', 'sharmaji') is None
+    assert store.lookup('nobody', 'sharma') is None
+    assert store.rule_count('asha') == 2
+    assert store.version('asha') > store.version('ravi') > store.version('nobody') == 0
+
+
+def test_learned_rules_take_precedence_over_keyword_rules(client):
+    response = client.post('/api/ai/learn-correction', json={
+        'description': 'Swiggy instamart order', 'correct_category': 'Groceries', 'user_id': 'asha'
+    })
+    assert response.get_json()['success']
+
+    def suggest(user_id):
+        response = client.post('/api/ai/categorize-transaction', json={
+            'description': 'swiggy dinner', 'user_id': user_id
+        })
+        return response.get_json()['suggestion']
+
+    assert suggest('asha')['suggested_category'] == 'Groceries'
+    assert suggest('asha')['source'] == 'user_learned'
+    assert suggest('ravi')['suggested_category'] == 'Food & Dining'
+
+    response = client.post('/api/ai/learn-correction', json={
+        'description': 'to a b', 'correct_category': 'Other', 'user_id': 'asha'
+    })
+    assert response.status_code == 400
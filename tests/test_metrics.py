@@ -0,0 +1,56 @@
+import pstats
+
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+
+def sample(name, **labels):
+    return app_module.metrics_registry.get_sample_value(name, labels) or 0
+
+
+@pytest.fixture
+def metrics_on(db_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'METRICS_ENABLED', True)
+    monkeypatch.setattr(app_module.transaction_categorizer, 'observer', app_module.observe_categorization)
+
+
+def test_disabled_by_default(client):
+    assert client.get('/metrics').status_code == 404
+
+
+def test_request_sql_and_categorizer_metrics(client, metrics_on):
+    posts = sample('my_money_requests_total', method='POST', endpoint='transactions_api', status='200')
+    queries = sample('my_money_sql_queries_per_request_sum', endpoint='transactions_api')
+    rules = sample('my_money_categorizations_total', source='rule_based')
+
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    client.post('/api/ai/categorize-transaction', json={'description': 'Uber ride to office'})
+
+    assert sample('my_money_requests_total', method='POST', endpoint='transactions_api', status='200') == posts + 1
+    assert sample('my_money_sql_queries_per_request_sum', endpoint='transactions_api') > queries
+    assert sample('my_money_categorizations_total', source='rule_based') > rules
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'my_money_request_duration_seconds_bucket{endpoint="transactions_api"' in body
+    assert 'my_money_sql_statement_seconds_count{statement="INSERT"}' in body
+
+
+def test_unrouted_paths_share_one_label(client, metrics_on):
+    before = sample('my_money_requests_total', method='GET', endpoint='unmatched', status='404')
+    client.get('/no/such/page')
+    client.get('/another/probe')
+    assert sample('my_money_requests_total', method='GET', endpoint='unmatched', status='404') == before + 2
+
+
+def test_slow_sampled_requests_are_profiled(client, tmp_path, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_SAMPLE_RATE', 1.0)
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_SLOW_MS', 0)
+    monkeypatch.setitem(app_module.app.config, 'PROFILE_DIR', str(tmp_path))
+    client.get('/api/dashboard/stats')
+
+    [profile] = tmp_path.glob('*-dashboard_stats-*.pstats')
+    assert pstats.Stats(str(profile)).total_calls > 0
+    # The profiler lock was released for the next sampled request
+    assert not app_module._profiler_lock.locked()
@@ -0,0 +1,21 @@
+import pytest
+
+import app as app_module
+
+
+def test_fresh_database_reaches_the_latest_version(conn):
+    assert conn.execute('PRAGMA user_version').fetchone()[0] == app_module.MIGRATIONS[-1][0]
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_invoices_date' in indexes
+
+
+def test_migrating_again_is_a_no_op(db_path, conn):
+    schema = conn.execute('SELECT type, name, sql FROM sqlite_master ORDER BY name').fetchall()
+    app_module.init_db(db_path)
+    assert conn.execute('SELECT type, name, sql FROM sqlite_master ORDER BY name').fetchall() == schema
+
+
+def test_out_of_order_versions_are_rejected(conn, monkeypatch):
+    monkeypatch.setattr(app_module, 'MIGRATIONS', [(2, 'b', []), (1, 'a', [])])
+    with pytest.raises(AssertionError, match='strictly increase'):
+        app_module.migrate_db(conn)
@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+from conftest import add_transaction
+
+
+@pytest.fixture
+def listed(client):
+    # Several rows per date, so ties on date are broken by id
+    for i in range(25):
+        add_transaction(client, f'item {i}', i + 1, 'Other', date=f'2026-10-{1 + i % 4:02d}')
+    return client.get('/api/transactions').get_json()['transactions']
+
+
+def test_pages_walk_the_full_listing_in_order(client, listed):
+    pages, after = [], None
+    while True:
+        response = client.get('/api/transactions?limit=7' + (f'&after={after}' if after else ''))
+        assert response.status_code == 200
+        body = response.get_json()
+        pages.append(body['transactions'])
+        after = body['next_cursor']
+        if after is None:
+            break
+    assert [len(page) for page in pages] == [7, 7, 7, 4]
+    assert [row for page in pages for row in page] == listed
+    assert [(row['date'], row['id']) for row in listed] == sorted(
+        ((row['date'], row['id']) for row in listed), reverse=True)
+
+
+def test_cursor_is_stable_across_inserts(client, listed):
+    first = client.get('/api/transactions?limit=10').get_json()
+    add_transaction(client, 'newest', 1, 'Other', date='2026-12-31')
+    second = client.get(f"/api/transactions?limit=10&after={first['next_cursor']}").get_json()
+    assert second['transactions'] == listed[10:20]
+
+
+def test_ndjson_streams_every_row(client, listed):
+    response = client.get('/api/transactions?format=ndjson&limit=100')
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line) for line in response.get_data(as_text=True).splitlines()] == listed
+
+
+@pytest.mark.parametrize('query', ['after=2026-10-01', 'after=2026-10-01,x', 'after=,5',
+                                   'limit=0', 'limit=-3', 'limit=ten', 'format=xml'])
+def test_bad_listing_arguments_are_rejected(client, query):
+    response = client.get(f'/api/transactions?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
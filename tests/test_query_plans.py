@@ -0,0 +1,43 @@
+import random
+
+import app as app_module
+
+
+def scans(conn):
+    return {name: plan for name, (uses_index, plan) in app_module.check_query_plans(conn).items()
+            if not uses_index}
+
+
+def test_hot_queries_use_indexes_on_a_fresh_database(conn):
+    assert scans(conn) == {}
+
+
+def test_hot_queries_use_indexes_once_analyzed(conn):
+    random.seed(6)
+    conn.executemany('INSERT INTO customers (name, phone, balance) VALUES (?, ?, ?)',
+                     [(f'Customer {i}', f'98{i:08d}', random.randint(-500, 500)) for i in range(300)])
+    conn.executemany('''
+        INSERT INTO transactions (date, amount, description, category, type) VALUES (?, ?, ?, ?, ?)
+    ''', [(f'2026-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}', random.randint(1, 900),
+           f'purchase {i}', random.choice(['Food & Dining', 'Shopping', 'Other']),
+           random.choice(['income', 'expense'])) for i in range(3000)])
+    conn.executemany('''
+        INSERT INTO customer_transactions (customer_id, date, amount, description, type)
+        VALUES (?, ?, ?, ?, ?)
+    ''', [(random.randint(1, 300), f'2026-10-{random.randint(1, 28):02d}', 100, 'rice',
+           random.choice(['credit', 'payment'])) for _ in range(3000)])
+    conn.commit()
+    conn.execute('ANALYZE')
+    assert scans(conn) == {}
+
+
+def test_a_table_scan_is_reported(conn, monkeypatch):
+    monkeypatch.setattr(app_module, 'HOT_QUERIES', {
+        'by_description': ('SELECT * FROM transactions WHERE description = ?', ('rent',)),
+        'unindexed_sort': ('SELECT * FROM transactions ORDER BY amount LIMIT ?', (10,)),
+    })
+    assert set(scans(conn)) == {'by_description', 'unindexed_sort'}
+
+    result = app_module.app.test_cli_runner().invoke(args=['check-query-plans'])
+    assert result.exit_code == 1
+    assert 'SCAN by_description' in result.output
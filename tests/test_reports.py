@@ -0,0 +1,140 @@
+import csv
+import os
+import io
+import re
+import subprocess
+import sys
+import time
+import zipfile
+import zlib
+
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+PERIOD = {'type': 'monthly', 'period': 'custom', 'from': '2026-10-01', 'to': '2026-10-31'}
+
+
+def run_report(client, **fields):
+    response = client.post('/api/reports', json={**PERIOD, **fields})
+    assert response.status_code in (200, 202)
+    job = response.get_json()['job']
+    deadline = time.monotonic() + 10
+    while job['status'] in ('queued', 'running'):
+        assert time.monotonic() < deadline, 'report did not finish'
+        time.sleep(0.02)
+        job = client.get(f"/api/reports/{job['id']}").get_json()['job']
+    assert job['status'] == 'done', job['error']
+    return job
+
+
+def download(client, job):
+    response = client.get(job['download_url'])
+    assert response.status_code == 200
+    return response.data
+
+
+def parse_pdf(data):
+    """Check the xref offsets and return (page count, decoded page contents)"""
+    assert data.startswith(b'%PDF-1.4') and data.rstrip().endswith(b'%%EOF')
+    xref = int(re.search(rb'startxref\n(\d+)\n%%EOF', data).group(1))
+    table = data[xref:].split(b'trailer')[0].split(b'\n')[2:-1]
+    for number, entry in enumerate(table[1:], start=1):
+        offset = int(entry[:10])
+        assert data[offset:].startswith(f'{number} 0 obj'.encode())
+    count = int(re.search(rb'/Type /Pages /Count (\d+)', data).group(1))
+    assert len(re.findall(rb'/Type /Page /Parent', data)) == count
+    streams = re.findall(rb'stream\n(.*?)\nendstream', data, re.S)
+    return count, [zlib.decompress(stream).decode('latin-1') for stream in streams]
+
+
+def test_csv_and_xlsx_downloads(client):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    add_transaction(client, 'Salary', 50000, 'Salary', type='income')
+
+    job = run_report(client, format='csv')
+    assert job['rows'] == 4 and not job['cached']
+    rows = list(csv.reader(io.StringIO(download(client, job).decode())))
+    assert rows[0] == ['Category Summary'] and ['Transactions'] in rows
+    assert ['2026-10-01', 'Swiggy order', 'Food', 'expense', '250.0'] in rows
+
+    job = run_report(client, format='excel')
+    with zipfile.ZipFile(io.BytesIO(download(client, job))) as archive:
+        assert 'xl/worksheets/sheet2.xml' in archive.namelist()
+        sheet = archive.read('xl/worksheets/sheet2.xml').decode()
+    assert 'Swiggy order' in sheet and '<v>50000.0</v>' in sheet
+
+
+def test_pdf_is_well_formed_across_pages(client, conn):
+    conn.executemany(
+        "INSERT INTO transactions (date, description, amount, category, type) VALUES (?, ?, ?, ?, 'expense')",
+        [('2026-10-02', f'Auto rickshaw ({n})', 40 + n, 'Transport') for n in range(150)],
+    )
+    conn.commit()
+    count, pages = parse_pdf(download(client, run_report(client, format='pdf')))
+    assert count >= 3
+    assert '(Auto rickshaw \\(149\\))' in pages[-1]
+    # Each page repeats the table header
+    assert all('(Description)' in page for page in pages[1:])
+
+
+def test_identical_request_reuses_artifact_until_data_changes(client):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    first = run_report(client, format='csv')
+    again = client.post('/api/reports', json={**PERIOD, 'format': 'csv'})
+    assert again.status_code == 200 and again.get_json()['job']['cached']
+
+    add_transaction(client, 'Zomato order', 300, 'Food')
+    rebuilt = run_report(client, format='csv')
+    assert not rebuilt['cached'] and rebuilt['id'] != first['id']
+    assert b'Zomato order' in download(client, rebuilt)
+
+
+@pytest.mark.parametrize('fields', [
+    {'format': 'docx'},
+    {'type': 'weekly'},
+    {'period': 'fortnight'},
+    {'period': 'custom', 'from': '2026-10-31', 'to': '2026-10-01'},
+])
+def test_bad_requests(client, fields):
+    assert client.post('/api/reports', json={**PERIOD, **fields}).status_code == 400
+
+
+def test_unknown_and_expired_jobs(client):
+    assert client.get('/api/reports/nope').status_code == 404
+    job = run_report(client, format='csv')
+    for entry in os.scandir(app_module.app.config['REPORTS_DIR']):
+        os.remove(entry.path)
+    assert client.get(job['download_url']).status_code == 410
+
+
+def insert_job(conn, job_id, status, pid, heartbeat_at):
+    conn.execute('''
+        INSERT INTO report_jobs (id, type, format, start_date, end_date, status, path, created_at, pid, heartbeat_at)
+        VALUES (?, 'monthly', 'csv', '2026-10-01', '2026-10-31', ?, 'unused.csv', ?, ?, ?)
+    ''', (job_id, status, heartbeat_at, pid, heartbeat_at))
+    conn.commit()
+
+
+def status(client, job_id):
+    return client.get(f'/api/reports/{job_id}').get_json()['job']
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='worker processes are not probed on Windows')
+def test_jobs_of_dead_workers_are_marked_failed(client, conn):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    now = time.time()
+    insert_job(conn, 'dead-worker', 'running', exited.pid, now)
+    # This process's jobs are known in memory; one that is not was lost
+    insert_job(conn, 'lost-here', 'queued', os.getpid(), now)
+    insert_job(conn, 'hung', 'running', os.getppid(), now - 3600)
+    insert_job(conn, 'waiting', 'queued', os.getppid(), now - 3600)
+
+    for job_id in ('dead-worker', 'lost-here', 'hung'):
+        job = status(client, job_id)
+        assert job['status'] == 'failed' and 'stopped before finishing' in job['error']
+        assert client.get(f'/api/reports/{job_id}/download').status_code == 409
+    # A live worker's queued job is only waiting for a thread
+    assert status(client, 'waiting')['status'] == 'queued'
@@ -0,0 +1,88 @@
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+
+def get(client, url, etag=None):
+    """GET and read the body, so streamed responses close their cursor"""
+    response = client.get(url, headers={'If-None-Match': etag} if etag else {})
+    response.get_data()
+    return response
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = app_module.ResponseCache()
+    monkeypatch.setattr(app_module, 'response_cache', cache)
+    return cache
+
+
+def test_conditional_get_answers_304(client, cache):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    first = get(client, '/api/transactions?limit=10')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+
+    again = get(client, '/api/transactions?limit=10', etag)
+    assert again.status_code == 304 and again.data == b''
+    assert again.headers['ETag'] == etag
+    assert len(cache.entries) == 1
+
+
+def test_streamed_listings_get_an_etag_but_are_not_stored(client, cache):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    etag = get(client, '/api/transactions').headers['ETag']
+    assert get(client, '/api/transactions', etag).status_code == 304
+    assert not cache.entries
+
+
+def test_query_strings_are_cached_separately(client, cache):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    add_transaction(client, 'Uber ride', 180, 'Transport')
+    first = get(client, '/api/transactions?limit=1')
+    second = get(client, '/api/transactions?limit=2')
+    assert first.headers['ETag'] != second.headers['ETag']
+    assert get(client, '/api/transactions?limit=1').data == first.data
+    assert len(cache.entries) == 2
+
+
+def test_writes_invalidate(client, cache, conn):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    etag = get(client, '/api/transactions').headers['ETag']
+
+    add_transaction(client, 'Zomato order', 300, 'Food')
+    response = get(client, '/api/transactions', etag)
+    assert response.status_code == 200 and b'Zomato order' in response.data
+    etag = response.headers['ETag']
+
+    # Writes that bypass the API bump the version through the triggers too
+    conn.execute("UPDATE transactions SET description = 'Blinkit order' WHERE description = 'Zomato order'")
+    conn.commit()
+    response = get(client, '/api/transactions', etag)
+    assert response.status_code == 200 and b'Blinkit order' in response.data
+
+
+def test_unrelated_writes_keep_the_etag(client, cache):
+    add_transaction(client, 'Swiggy order', 250, 'Food')
+    etag = get(client, '/api/transactions').headers['ETag']
+    client.post('/api/customers', json={'name': 'Ravi'})
+    assert get(client, '/api/transactions', etag).status_code == 304
+    assert get(client, '/api/customers').headers['ETag'] != etag
+
+
+def test_errors_and_writes_are_not_cached(client, cache):
+    assert client.get('/api/transactions?limit=abc').status_code == 400
+    assert 'ETag' not in client.post('/api/transactions', json={}).headers
+    assert not cache.entries
+
+
+def test_lru_bound():
+    cache = app_module.ResponseCache(max_entries=2, max_body_bytes=4)
+    cache.put('a', 'e1', b'aa', 'text/plain')
+    cache.put('b', 'e1', b'bb', 'text/plain')
+    assert cache.get('a', 'e1') is not None
+    cache.put('c', 'e1', b'cc', 'text/plain')
+    cache.put('d', 'e1', b'too long', 'text/plain')
+    assert list(cache.entries) == ['a', 'c']
+    assert cache.get('a', 'stale') is None
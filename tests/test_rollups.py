@@ -0,0 +1,69 @@
+import threading
+import time
+
+import app as app_module
+from conftest import add_transaction
+
+ROLLUPS = 'SELECT date, type, category, ROUND(total, 6), count FROM daily_rollups ORDER BY 1, 2, 3'
+GROUPED = '''
+    SELECT date, type, category, ROUND(SUM(amount), 6), COUNT(*) FROM transactions
+    GROUP BY date, type, category ORDER BY 1, 2, 3
+'''
+
+
+def test_rollups_follow_inserts_updates_and_deletes(client, conn):
+    rows = [add_transaction(client, f'entry {i}', 10 * (i + 1), ['Food & Dining', 'Shopping'][i % 2],
+                            type='income' if i == 3 else 'expense', date=f'2026-10-0{1 + i % 3}')
+            for i in range(8)]
+    assert conn.execute(ROLLUPS).fetchall() == conn.execute(GROUPED).fetchall()
+
+    moved = rows[0]
+    response = client.put(f"/api/transactions/{moved['id']}", json={
+        'date': '2026-11-15', 'amount': 999, 'description': 'moved', 'category': 'Travel', 'type': 'expense'
+    })
+    assert response.status_code == 200
+    for row in rows[1:4]:
+        assert client.delete(f"/api/transactions/{row['id']}").status_code == 200
+    assert conn.execute(ROLLUPS).fetchall() == conn.execute(GROUPED).fetchall()
+    # Emptied groups are removed, not left at zero
+    assert conn.execute('SELECT COUNT(*) FROM daily_rollups WHERE count <= 0').fetchone()[0] == 0
+
+    stats = client.get('/api/dashboard/stats').get_json()['personal']
+    income, expense, count = conn.execute('''
+        SELECT SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+               SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), COUNT(*) FROM transactions
+    ''').fetchone()
+    assert stats == {'total_income': income or 0, 'total_expenses': expense, 'total_transactions': count,
+                     'current_balance': (income or 0) - expense}
+
+
+def test_rebuild_command_repairs_drift(client, conn):
+    add_transaction(client, 'entry', 50, 'Other')
+    conn.execute('UPDATE daily_rollups SET total = 0')
+    conn.commit()
+
+    result = app_module.app.test_cli_runner().invoke(args=['rebuild-rollups'])
+    assert result.exit_code == 0, result.output
+    assert conn.execute(ROLLUPS).fetchall() == conn.execute(GROUPED).fetchall()
+
+
+def test_edit_racing_another_writer_keeps_rollups_exact(client, conn):
+    row = add_transaction(client, 'entry', 100, 'Food & Dining')
+
+    # Another worker is part-way through its own edit of the same row
+    conn.execute('BEGIN IMMEDIATE')
+    conn.execute("UPDATE transactions SET amount = 250, category = 'Travel' WHERE id = ?", (row['id'],))
+    app_module.apply_rollup_delta(conn.cursor(), row['date'], 'expense', 'Food & Dining', -100, -1)
+    app_module.apply_rollup_delta(conn.cursor(), row['date'], 'expense', 'Travel', 250, 1)
+
+    results = []
+    edit = threading.Thread(target=lambda: results.append(client.put(f"/api/transactions/{row['id']}", json={
+        'date': row['date'], 'amount': 40, 'description': 'entry', 'category': 'Shopping', 'type': 'expense'
+    }).status_code))
+    edit.start()
+    time.sleep(0.2)
+    conn.commit()
+    edit.join()
+
+    assert results == [200]
+    assert conn.execute(ROLLUPS).fetchall() == conn.execute(GROUPED).fetchall()
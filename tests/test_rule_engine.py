@@ -0,0 +1,76 @@
+import random
+import re
+
+import pytest
+
+import app as app_module
+
+
+def baseline_categorize(patterns, description, amount=None):
+    """The regex-per-pattern scoring the compiled engine replaced"""
+    description_lower = description.lower()
+    category_scores = {}
+    for category, category_patterns in patterns.items():
+        score = 0
+        for pattern in category_patterns:
+            if re.search(pattern, description_lower):
+                if any(word in description_lower.split() for word in pattern.split('|')):
+                    score += 2
+                else:
+                    score += 1
+        if score:
+            category_scores[category] = score
+    if category_scores:
+        best = max(category_scores.items(), key=lambda x: x[1])
+        return {
+            'suggested_category': best[0],
+            'confidence': min(0.9, best[1] * 0.15),
+            'source': 'rule_based',
+            'alternatives': [cat for cat, _ in sorted(category_scores.items(), key=lambda x: x[1], reverse=True)[:3]]
+        }
+    income = any(word in description_lower for word in
+                 ['salary', 'income', 'bonus', 'payment received', 'credit', 'refund', 'cashback', 'dividend'])
+    return {
+        'suggested_category': 'Income' if amount and amount > 0 and income else 'Other',
+        'confidence': 0.3,
+        'source': 'default',
+        'alternatives': ['Food & Dining', 'Shopping', 'Transportation']
+    }
+
+
+def corpus(patterns, size=3000):
+    rng = random.Random(1)
+    keywords = sorted({keyword for category_patterns in patterns.values()
+                       for pattern in category_patterns for keyword in pattern.split('|')})
+    noise = ['to', 'ref', 'upi', 'xx1234', 'mumbai', 'neft', 'paid', 'txn', '#42', 'A/C']
+    descriptions = ['', 'Payment received from Ravi', 'AMAZON PRIME renewal', 'mutual fund SIP',
+                    'gasoline', 'Rickshaw', 'cafeteria', 'Bonus credited']
+    for _ in range(size):
+        words = []
+        for _ in range(rng.randint(1, 4)):
+            word = rng.choice(keywords) if rng.random() < 0.6 else rng.choice(noise)
+            if rng.random() < 0.2:
+                word = rng.choice(['', 'x', 'pre']) + word + rng.choice(['s', 'ing', ''])
+            words.append(word.upper() if rng.random() < 0.2 else word)
+        descriptions.append(' '.join(words))
+    return descriptions
+
+
+@pytest.fixture
+def categorizer(db_path):
+    return app_module.transaction_categorizer
+
+
+def test_matches_the_regex_categorizer(categorizer):
+    patterns = categorizer.category_patterns
+    for description in corpus(patterns):
+        for amount in (None, 250.0):
+            expected = baseline_categorize(patterns, description, amount)
+            assert categorizer.categorize_transaction(description, amount) == expected, description
+
+
+def test_whole_words_weigh_more_than_substrings(categorizer):
+    engine = categorizer.rule_engine
+    assert engine.score('uber ride') == {'Transportation': 2}
+    assert engine.score('uberx') == {'Transportation': 1}
+    assert engine.score('nothing here') == {}
@@ -0,0 +1,78 @@
+import pytest
+
+from conftest import add_transaction
+
+
+def search(client, query):
+    response = client.get(f'/api/search?{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def descriptions(client, query):
+    return sorted(result['description'] for result in search(client, query)['results'])
+
+
+@pytest.fixture
+def ledger(client):
+    add_transaction(client, 'Swiggy dinner with team', 450, 'Food', date='2026-09-10')
+    add_transaction(client, 'Swiggy Instamart groceries', 900, 'Groceries', date='2026-10-02')
+    add_transaction(client, 'Café Coffee Day', 180, 'Food', date='2026-10-05')
+    add_transaction(client, 'Swiggy refund', 120, 'Refund', type='income', date='2026-10-06')
+    customer = client.post('/api/customers', json={'name': 'Sharma Traders'}).get_json()['customer']['id']
+    for entry_type, description in (('credit', 'Cement bags'), ('payment', 'UPI for cement')):
+        client.post(f'/api/customers/{customer}/transactions', json={
+            'type': entry_type, 'amount': 500, 'description': description, 'date': '2026-10-03'
+        })
+    return customer
+
+
+def test_prefix_words_and_accents(client, ledger):
+    assert descriptions(client, 'q=swig') == ['Swiggy Instamart groceries', 'Swiggy dinner with team', 'Swiggy refund']
+    assert descriptions(client, 'q=swiggy+gro') == ['Swiggy Instamart groceries']
+    assert descriptions(client, 'q=cafe') == ['Café Coffee Day']
+    # FTS5 syntax in the input is searched as plain words
+    assert descriptions(client, 'q=swiggy+OR+"cement') == []
+
+
+def test_khatabook_entries_match_by_customer_name(client, ledger):
+    results = search(client, 'q=sharma')['results']
+    assert {result['description'] for result in results} == {'Cement bags', 'UPI for cement'}
+    assert all(result['source'] == 'khatabook' and result['customer_id'] == ledger for result in results)
+
+
+def test_type_and_date_filters(client, ledger):
+    assert descriptions(client, 'q=swiggy&type=income') == ['Swiggy refund']
+    assert descriptions(client, 'q=swiggy&type=expense&from=2026-10-01') == ['Swiggy Instamart groceries']
+    assert descriptions(client, 'q=cement&type=payment') == ['UPI for cement']
+    assert descriptions(client, 'q=cement&type=personal') == []
+
+
+def test_paging(client, ledger):
+    first = search(client, 'q=swiggy&limit=2')
+    assert len(first['results']) == 2 and first['next_offset'] == 2
+    rest = search(client, 'q=swiggy&limit=2&offset=2')
+    assert len(rest['results']) == 1 and rest['next_offset'] is None
+
+
+def test_index_follows_updates_deletes_and_renames(client, ledger, conn):
+    dinner = search(client, 'q=dinner')['results'][0]
+    client.put(f"/api/transactions/{dinner['id']}", json={
+        'date': dinner['date'], 'amount': dinner['amount'], 'description': 'Zomato lunch',
+        'category': 'Food', 'type': 'expense'
+    })
+    assert descriptions(client, 'q=dinner') == []
+    assert descriptions(client, 'q=zomato') == ['Zomato lunch']
+
+    client.delete(f"/api/transactions/{dinner['id']}")
+    assert descriptions(client, 'q=zomato') == []
+
+    conn.execute("UPDATE customers SET name = 'Gupta Hardware' WHERE id = ?", (ledger,))
+    conn.commit()
+    assert descriptions(client, 'q=sharma') == []
+    assert descriptions(client, 'q=gupta+hard') == ['Cement bags', 'UPI for cement']
+
+
+@pytest.mark.parametrize('query', ['q=', 'q=%21%21', 'q=a&type=transfer', 'q=a&from=10/01/2026', 'q=a&limit=0'])
+def test_bad_requests(client, query):
+    assert client.get(f'/api/search?{query}').status_code == 400
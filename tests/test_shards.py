@@ -0,0 +1,51 @@
+import pytest
+
+import app as app_module
+from conftest import add_transaction
+
+
+@pytest.fixture
+def shard_dir(tmp_path, monkeypatch, db_path):
+    shards = tmp_path / 'shards'
+    monkeypatch.setitem(app_module.app.config, 'SHARD_DIR', str(shards))
+    monkeypatch.setattr(app_module, 'shard_router', app_module.ShardRouter(str(shards), max_tenants=2))
+    return shards
+
+
+def create_tenant(tenant):
+    result = app_module.app.test_cli_runner().invoke(args=['create-tenant', tenant])
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_unknown_tenants_are_not_created(client, shard_dir):
+    response = client.get('/api/transactions', headers={'X-Tenant-ID': 'intruder'})
+    assert response.status_code == 404
+    assert not (shard_dir / 'intruder.db').exists()
+
+    assert client.get('/api/transactions', headers={'X-Tenant-ID': '../etc'}).status_code == 400
+    # The default tenant needs no provisioning
+    assert client.get('/api/transactions').status_code == 200
+    assert (shard_dir / 'default.db').exists()
+
+
+def test_created_tenants_are_isolated(client, shard_dir):
+    assert 'Created tenant shop_a' in create_tenant('shop_a').output
+    create_tenant('shop_b')
+    client.set_cookie('tenant', 'shop_a')
+    add_transaction(client, 'Swiggy dinner', 300, 'Food & Dining')
+    client.delete_cookie('tenant')
+
+    def descriptions(tenant):
+        response = client.get('/api/transactions', headers={'X-Tenant-ID': tenant})
+        return [t['description'] for t in response.get_json()['transactions']]
+
+    assert descriptions('shop_a') == ['Swiggy dinner']
+    assert descriptions('shop_b') == []
+    assert descriptions('default') == []
+
+
+def test_auto_create_for_development(client, shard_dir, monkeypatch):
+    monkeypatch.setitem(app_module.app.config, 'SHARD_AUTO_CREATE', True)
+    assert client.get('/api/transactions', headers={'X-Tenant-ID': 'new_shop'}).status_code == 200
+    assert (shard_dir / 'new_shop.db').exists()
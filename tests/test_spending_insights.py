@@ -0,0 +1,53 @@
+import app as app_module
+from conftest import add_transaction
+
+
+def breakdown(client):
+    response = client.get('/api/ai/spending-insights?user_id=demo')
+    assert response.status_code == 200
+    return response.get_json()['insights']['category_breakdown']
+
+
+def test_insights_use_suggested_categories(client):
+    add_transaction(client, 'Swiggy dinner', 300, 'Travel')
+    add_transaction(client, 'Qwzx', 80, 'Gifts')
+    add_transaction(client, 'Salary', 5000, 'Salary & Income', type='income')
+
+    # Without any rule or learned match the saved category is kept
+    assert breakdown(client) == {'Food & Dining': 300, 'Gifts': 80}
+
+
+def test_corrections_change_the_insights(client):
+    add_transaction(client, 'Swiggy dinner', 300, 'Other')
+    assert set(breakdown(client)) == {'Food & Dining'}
+
+    response = client.post('/api/ai/learn-correction', json={
+        'description': 'Swiggy dinner', 'correct_category': 'Entertainment', 'user_id': 'demo'
+    })
+    assert response.status_code == 200
+    assert set(breakdown(client)) == {'Entertainment'}
+
+
+def test_recategorized_totals_follow_writes(client, conn):
+    add_transaction(client, 'Swiggy dinner', 300, 'Other')
+    first = add_transaction(client, 'Uber ride', 200, 'Other')
+    assert breakdown(client).keys() == {'Food & Dining', 'Transportation'}
+
+    add_transaction(client, 'Apollo pharmacy', 150, 'Other')
+    client.delete(f"/api/transactions/{first['id']}")
+    totals = app_module.spending_insights_cache.category_totals(conn, 'demo')
+    assert totals == {'Food & Dining': 300, 'Health & Medical': 150}
+
+
+def test_model_generation_is_part_of_the_cache_key(db_path):
+    categorizer = app_module.transaction_categorizer
+    cache = app_module.spending_insights_cache
+    before = cache.current_versions('demo')
+
+    # Incremental updates keep the generation; a calibrated retrain changes it
+    categorizer.model = categorizer.model.updated([(['swiggy'], 'Food & Dining', 1.0)])
+    assert cache.current_versions('demo') == before
+    retrained = app_module.CategoryModel()
+    retrained.calibrated = True
+    categorizer.model = retrained
+    assert cache.current_versions('demo') != before
@@ -0,0 +1,81 @@
+import io
+import json
+import sqlite3
+
+import app as app_module
+from app import parse_statement_amount
+
+CSV = b'''Txn Date,Description,Amount,Category
+01/10/2026,SWIGGY ORDER,-250.00,
+02/10/2026,SALARY OCT,"50,000.00",Salary & Income
+not a date,BROKEN ROW,-10,
+03/10/2026,UBER TRIP,-180.50,
+'''
+
+OFX = b'''OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20261005120000<TRNAMT>-99.00<NAME>NETFLIX<MEMO>subscription</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20261006<TRNAMT>1500.00<NAME>REFUND</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+'''
+
+
+def upload(client, content, filename, query=''):
+    return client.post(f'/api/transactions/import{query}',
+                       data={'file': (io.BytesIO(content), filename)},
+                       content_type='multipart/form-data')
+
+
+def test_parse_amounts():
+    assert parse_statement_amount('1,234.50') == 1234.5
+    assert parse_statement_amount('₹ 99') == 99
+    assert parse_statement_amount('(12.00)') == -12
+    assert parse_statement_amount('45.00 Dr') == -45
+    assert parse_statement_amount('45.00 Cr') == 45
+
+
+def test_csv_import_categorizes_and_reports_bad_rows(client, conn):
+    response = upload(client, CSV, 'statement.csv')
+    summary = response.get_json()['summary']
+    assert response.status_code == 200
+    assert (summary['rows_read'], summary['inserted'], summary['invalid']) == (4, 3, 1)
+    assert summary['errors'] == ["line 4: unrecognised date 'not a date'"]
+    assert conn.execute('SELECT date, amount, category, type FROM transactions ORDER BY id').fetchall() == [
+        ('2026-10-01', 250.0, 'Food & Dining', 'expense'),
+        ('2026-10-02', 50000.0, 'Salary & Income', 'income'),
+        ('2026-10-03', 180.5, 'Transportation', 'expense'),
+    ]
+    # Imported rows land in the rollups like any other write
+    assert conn.execute("SELECT SUM(total) FROM daily_rollups WHERE type = 'expense'").fetchone()[0] == 430.5
+
+    again = upload(client, CSV, 'statement.csv').get_json()['summary']
+    assert (again['inserted'], again['duplicates']) == (0, 3)
+
+
+def test_ofx_import_with_streamed_progress(client, conn):
+    response = upload(client, OFX, 'bank.qfx', '?progress=ndjson')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[-1]['success'] and lines[-1]['format'] == 'ofx'
+    assert lines[-1]['summary']['inserted'] == 2
+    assert conn.execute('SELECT description, amount, type FROM transactions ORDER BY id').fetchall() == [
+        ('NETFLIX subscription', 99.0, 'expense'),
+        ('REFUND', 1500.0, 'income'),
+    ]
+
+
+def test_import_rejects_unusable_files(client):
+    assert client.post('/api/transactions/import').status_code == 400
+    response = upload(client, b'foo,bar\n1,2\n', 'x.csv')
+    assert response.status_code == 400
+    assert 'date and description' in response.get_json()['error']
+
+
+def test_streamed_import_ends_with_an_error_line_on_failure(client, conn, monkeypatch):
+    def locked(*args):
+        raise sqlite3.OperationalError('database is locked')
+    monkeypatch.setattr(app_module, 'apply_rollup_delta', locked)
+
+    response = upload(client, CSV, 'statement.csv', '?progress=ndjson')
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert lines[-1] == {'success': False, 'error': 'Failed to import statement'}
+    assert conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0] == 0